@@ -0,0 +1,161 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple
+from config import ARCHIVE_CONFIG
+import throttle
+
+# 压缩包成员的路径写作 "压缩包路径!/成员路径"，如 D:/资料/标准.zip!/GB/GB 50016-2014.pdf
+MEMBER_SEPARATOR = "!/"
+_MEMBER_PATTERN = re.compile(r'^(.*?\.zip)!/(.+)$', re.IGNORECASE)
+
+# 每个线程保留最近打开的一个压缩包（扫描顺序中同一压缩包的成员相邻，连续读取时不必重新解析中央目录）
+_local = threading.local()
+
+
+def member_path(archive_path: str, member: str) -> str:
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+
+def split_member_path(path: str) -> Optional[Tuple[str, str]]:
+    """拆分为 (压缩包路径, 成员路径)；不是压缩包成员时返回None"""
+    match = _MEMBER_PATTERN.match(path)
+    if match is None:
+        return None
+    return match.group(1), match.group(2)
+
+
+def is_member_path(path: str) -> bool:
+    return _MEMBER_PATTERN.match(path) is not None
+
+
+def container_path(path: str) -> str:
+    """文件实际所在的磁盘文件：压缩包成员为压缩包本身，其他文件为其自身"""
+    parts = split_member_path(path)
+    return parts[0] if parts else path
+
+
+def list_zip_members(archive_path: str, include: Iterable[str] = ()) -> List[List[Any]]:
+    """列出压缩包中匹配 include（按成员文件名，已转为小写的通配符）的成员：[[成员路径, 解压后大小], ...]
+
+    只读取中央目录，不解压任何内容；目录、加密的成员和无法打开的压缩包跳过。
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as zf:
+            infos = zf.infolist()
+    except (OSError, zipfile.BadZipFile):
+        return []
+    members = []
+    for info in infos:
+        if info.is_dir() or info.flag_bits & 0x1:
+            continue
+        name = info.filename.rsplit("/", 1)[-1].lower()
+        if any(fnmatchcase(name, pattern) for pattern in include):
+            members.append([info.filename, info.file_size])
+    return members
+
+
+def _zip_file(archive_path: str) -> zipfile.ZipFile:
+    """当前线程打开的压缩包（压缩包大小或修改时间变化、或在子进程中时重新打开）"""
+    stat = os.stat(archive_path)
+    key = (os.getpid(), archive_path, stat.st_size, stat.st_mtime_ns)
+    cached = getattr(_local, "archive", None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    zf = zipfile.ZipFile(archive_path)
+    if cached is not None and cached[0][0] == key[0]:
+        cached[1].close()
+    _local.archive = (key, zf)
+    return zf
+
+
+def _member_info(path: str) -> Tuple[zipfile.ZipFile, zipfile.ZipInfo]:
+    parts = split_member_path(path)
+    if parts is None:
+        raise ValueError(f"不是压缩包成员: {path}")
+    zf = _zip_file(parts[0])
+    try:
+        return zf, zf.getinfo(parts[1])
+    except KeyError:
+        raise FileNotFoundError(f"压缩包中没有该成员: {path}")
+
+
+def open_member(path: str) -> BinaryIO:
+    """打开压缩包成员供解析器随机读取
+
+    解压后不超过 max_member_memory 的成员解压到内存；更大的成员解压到临时文件（关闭时自动删除），
+    避免解析器在压缩流中来回定位时反复解压。
+    """
+    zf, info = _member_info(path)
+    with zf.open(info) as src:
+        if info.file_size <= ARCHIVE_CONFIG["max_member_memory"]:
+            return io.BytesIO(src.read())
+        spill = tempfile.TemporaryFile(dir=ARCHIVE_CONFIG["spill_dir"])
+        try:
+            shutil.copyfileobj(src, spill, 1024 * 1024)
+            spill.seek(0)
+        except BaseException:
+            spill.close()
+            raise
+        return spill
+
+
+def read_member(path: str) -> bytes:
+    """成员的全部内容"""
+    zf, info = _member_info(path)
+    with zf.open(info) as src:
+        return src.read()
+
+
+def extract_member(path: str, target: str) -> int:
+    """只解压这一个成员到 target（保留成员的修改时间），返回写入的字节数"""
+    zf, info = _member_info(path)
+    with zf.open(info) as src, open(target, 'wb') as dst:
+        throttle.copy_stream(src, dst)
+    mtime = _zip_mtime(info)
+    if mtime is not None:
+        os.utime(target, (mtime, mtime))
+    return info.file_size
+
+
+def _zip_mtime(info: zipfile.ZipInfo) -> Optional[float]:
+    try:
+        return time.mktime(info.date_time + (0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+def member_identity(path: str) -> Dict[str, Any]:
+    """文本缓存使用的文件身份：压缩包的真实路径、修改时间加上成员路径、大小和CRC"""
+    archive_path, member = split_member_path(path)
+    stat = os.stat(archive_path)
+    info = _member_info(path)[1]
+    return {
+        "path": member_path(os.path.realpath(archive_path), member),
+        "size": info.file_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "crc": info.CRC
+    }
+
+
+@contextmanager
+def materialize(path: str) -> Iterator[str]:
+    """需要真实文件路径的处理（如OCR插件）：压缩包成员临时解压到磁盘，退出时删除；普通文件原样返回"""
+    if not is_member_path(path):
+        yield path
+        return
+    suffix = os.path.splitext(path)[1]
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=ARCHIVE_CONFIG["spill_dir"])
+    os.close(fd)
+    try:
+        extract_member(path, temp_path)
+        yield temp_path
+    finally:
+        os.remove(temp_path)
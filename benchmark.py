@@ -0,0 +1,760 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF标准文档识别系统 - 性能基准脚本
+用于比较各项性能优化开启前后的耗时、内存和磁盘占用
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import MODEL_DIR, LEGACY_FEATURES_FILE, MODEL_CONFIG
+from feature_store import FeatureStore
+from trainer import StandardModelTrainer
+
+def _time_repeat(func, repeat: int) -> float:
+    """多次运行取最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_feature_store(json_path: str, repeat: int = 5, scale: int = 1):
+    """比较JSON特征文件与列式特征存储的加载时间和大小（scale 将样本复制多份以模拟大语料）"""
+    print("=" * 60)
+    print("特征存储: JSON vs 列式存储")
+    print("=" * 60)
+
+    if not os.path.exists(json_path):
+        print(f"错误: 特征文件不存在: {json_path}")
+        return False
+
+    trainer = StandardModelTrainer()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if scale > 1:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                features = json.load(f)
+            json_path = os.path.join(temp_dir, "standard_features.json")
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(features * scale, f, ensure_ascii=False, indent=2)
+            print(f"样本复制 {scale} 份: {len(features) * scale} 个文件")
+
+        store_path = os.path.join(temp_dir, "standard_features.npz")
+        store = FeatureStore.convert_json(json_path, store_path)
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                features = json.load(f)
+            trainer.extract_training_features(features)
+
+        def load_store():
+            trainer.extract_training_features(FeatureStore(store_path).load())
+
+        def load_store_with_sections():
+            for feature in FeatureStore(store_path).load():
+                list(feature["content_features"].get("standard_sections", []))
+
+        json_time = _time_repeat(load_json, repeat)
+        store_time = _time_repeat(load_store, repeat)
+        sections_time = _time_repeat(load_store_with_sections, repeat)
+
+        json_size = os.path.getsize(json_path)
+        numeric_size = os.path.getsize(store.store_path)
+        sections_size = os.path.getsize(store.sections_path)
+
+        print(f"\n{'格式':<24}{'大小(KB)':>12}{'加载+向量化(ms)':>18}")
+        print(f"{'JSON (indent=2)':<24}{json_size / 1024:>12.1f}{json_time * 1000:>18.2f}")
+        print(f"{'列式存储 (数值)':<24}{numeric_size / 1024:>12.1f}{store_time * 1000:>18.2f}")
+        print(f"{'列式存储 (含段落)':<24}{(numeric_size + sections_size) / 1024:>12.1f}{sections_time * 1000:>18.2f}")
+        print(f"\n体积缩小: {json_size / max(numeric_size + sections_size, 1):.1f}x, "
+              f"加载加速: {json_time / max(store_time, 1e-9):.1f}x")
+
+    return True
+
+def write_test_pdf(path: str, n_pages: int, lines_per_page: int = 40, scanned: bool = False):
+    """生成多页测试PDF（scanned 为真时每页只有一张图像，没有文本层）"""
+    objects = []
+    resource_id = 3
+    first_page_id = 4
+    page_ids = [first_page_id + 2 * i for i in range(n_pages)]
+
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>")
+    if scanned:
+        pixels = "00ff" * 8
+        objects.append(f"<< /Type /XObject /Subtype /Image /Width 4 /Height 4 /ColorSpace /DeviceGray "
+                       f"/BitsPerComponent 8 /Filter /ASCIIHexDecode /Length {len(pixels) + 1} >>"
+                       f"\nstream\n{pixels}>\nendstream")
+        resources = f"<< /XObject << /Im1 {resource_id} 0 R >> >>"
+    else:
+        objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        resources = f"<< /Font << /F1 {resource_id} 0 R >> >>"
+
+    for i, pid in enumerate(page_ids):
+        if scanned:
+            body = "q 595 0 0 842 0 0 cm /Im1 Do Q"
+        else:
+            lines = [f"Page {i + 1} line {j}: GB/T 27930 standard requirement text" for j in range(lines_per_page)]
+            body = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources {resources} /Contents {pid + 1} 0 R >>")
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, obj in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n{obj}\nendobj\n".encode('latin-1'))
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1'))
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB），不支持时返回-1"""
+    try:
+        import resource
+    except ImportError:
+        return -1.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def _lazy_pages_child(mode: str, pdf_path: str):
+    """子进程：按指定模式提取一个PDF并输出耗时和峰值内存"""
+    from extractor import StandardFeatureExtractor
+
+    MODEL_CONFIG["large_document_pages"] = 0 if mode == "lazy" else sys.maxsize
+    extractor = StandardFeatureExtractor(use_metadata=False)
+    baseline_rss = _peak_rss_mb()
+
+    start = time.perf_counter()
+    extractor.extract_pdf_features(pdf_path)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": _peak_rss_mb() - baseline_rss}))
+
+def bench_lazy_pages(page_counts, repeat: int = 3):
+    """比较大文档的全量页面列表与惰性读取的延迟和峰值内存"""
+    print("=" * 60)
+    print(f"大文档模式: 提取前 {MODEL_CONFIG['max_pages_to_extract']} 页")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print("RSS 为提取过程中峰值常驻内存相对导入后的增量")
+        print(f"\n{'页数':>8}{'全量(ms)':>12}{'惰性(ms)':>12}{'全量ΔRSS(MB)':>15}{'惰性ΔRSS(MB)':>15}")
+        for n_pages in page_counts:
+            pdf_path = os.path.join(temp_dir, f"test_{n_pages}.pdf")
+            write_test_pdf(pdf_path, n_pages)
+
+            row = {}
+            for mode in ("eager", "lazy"):
+                runs = []
+                for _ in range(repeat):
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "lazy-pages", "--child", mode, pdf_path],
+                        capture_output=True, text=True, check=True
+                    ).stdout
+                    runs.append(json.loads(output.strip().splitlines()[-1]))
+                row[mode] = (min(r["seconds"] for r in runs), max(r["peak_rss_mb"] for r in runs))
+
+            print(f"{n_pages:>8}{row['eager'][0] * 1000:>12.1f}{row['lazy'][0] * 1000:>12.1f}"
+                  f"{row['eager'][1]:>15.1f}{row['lazy'][1]:>15.1f}")
+
+    return True
+
+def bench_schedule(n_small: int, n_large: int, workers: int, repeat: int = 1):
+    """比较按扫描顺序提交与按开销从大到小调度的总耗时和尾部延迟（大文件排在扫描顺序末尾）"""
+    from config import PARALLEL_CONFIG
+    from predictor import StandardPredictor
+
+    print("=" * 60)
+    print(f"并行调度: {n_small} 个小文件 + {n_large} 个大文件, {workers} 个进程")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = []
+        for i in range(n_small):
+            path = os.path.join(temp_dir, f"small_{i:04d}.pdf")
+            write_test_pdf(path, 2, lines_per_page=5)
+            pdf_files.append(path)
+        for i in range(n_large):
+            path = os.path.join(temp_dir, f"large_{i:02d}.pdf")
+            write_test_pdf(path, 40, lines_per_page=600)
+            pdf_files.append(path)
+
+        predictor = StandardPredictor(MODEL_DIR)
+        predictor.load_model()
+
+        rows = []
+        for label, size_aware in (("扫描顺序", False), ("大文件优先", True)):
+            PARALLEL_CONFIG["size_aware"] = size_aware
+            best = None
+            for _ in range(repeat):
+                with open(os.devnull, 'w') as devnull:
+                    stdout, sys.stdout = sys.stdout, devnull
+                    try:
+                        predictor.predict_batch_files(pdf_files, workers=workers)
+                    finally:
+                        sys.stdout = stdout
+                metrics = predictor.last_run_metrics
+                if best is None or metrics["wall_seconds"] < best["wall_seconds"]:
+                    best = metrics
+            rows.append((label, best))
+
+        print(f"\n{'调度方式':<12}{'总耗时(s)':>12}{'95%完成(s)':>14}{'尾部(s)':>10}{'p95单文件(s)':>16}")
+        for label, metrics in rows:
+            print(f"{label:<12}{metrics['wall_seconds']:>12.2f}{metrics['p95_finish_seconds']:>14.2f}"
+                  f"{metrics['tail_seconds']:>10.2f}{metrics['latency_p95']:>16.2f}")
+
+    return True
+
+def _memory_mb() -> dict:
+    """当前进程的 RSS/PSS/USS（MB，读取 /proc/self/smaps_rollup；不支持时为-1）
+
+    PSS 把共享页按共享进程数均摊，各进程 PSS 之和即实际占用的物理内存；USS 为进程独占的内存。
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup", 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {"rss": _peak_rss_mb(), "pss": -1.0, "uss": -1.0}
+    return {"rss": fields.get("Rss", -1.0), "pss": fields.get("Pss", -1.0),
+            "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)}
+
+def _model_load_child(mode: str, model_dir: str):
+    """子进程：加载模型并预测一次，报告就绪；收到测量指令后报告内存（此时所有子进程都已加载完毕）"""
+    import numpy as np
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    trainer = StandardModelTrainer()
+    trainer.load_model(model_dir, mmap=(mode == "mmap"))
+    X = np.random.default_rng(0).normal(size=(256, len(trainer.scaler.mean_)))
+    trainer.model.predict_proba(trainer.scaler.transform(X))
+    sys.stdout = stdout
+    print(json.dumps({"ready_time": time.time()}), flush=True)
+
+    sys.stdin.readline()
+    print(json.dumps(_memory_mb()), flush=True)
+
+def bench_model_load(worker_counts, n_trees: int, n_samples: int):
+    """比较多个预测进程各自反序列化 .pkl 模型与共享内存映射扁平化模型的启动时间和内存"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    print("=" * 60)
+    print(f"模型加载: {n_trees} 棵树, {n_samples} 个训练样本")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(n_samples, 15))
+        y = (X[:, 0] + rng.normal(size=n_samples) > 0).astype(int)
+        trainer = StandardModelTrainer()
+        trainer.scaler = StandardScaler().fit(X)
+        trainer.model = RandomForestClassifier(n_estimators=n_trees, random_state=42, n_jobs=-1)
+        trainer.model.fit(trainer.scaler.transform(X), y)
+        trainer.feature_names = trainer.get_feature_names()
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                trainer.save_model(temp_dir)
+            finally:
+                sys.stdout = stdout
+
+        pkl_mb = os.path.getsize(os.path.join(temp_dir, "standard_classifier.pkl")) / 1024 / 1024
+        n_nodes = sum(estimator.tree_.node_count for estimator in trainer.model.estimators_)
+        print(f".pkl 模型 {pkl_mb:.1f} MB, 共 {n_nodes} 个节点")
+        print("启动时间为进程启动到加载模型并完成一次预测；PSS合计为所有进程实际占用的物理内存\n")
+        print(f"{'进程数':>6}{'方式':>8}{'启动(s)':>10}{'RSS/进程(MB)':>15}{'USS/进程(MB)':>15}{'PSS合计(MB)':>14}")
+
+        for workers in worker_counts:
+            for mode in ("pickle", "mmap"):
+                launched = time.time()
+                children = [subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), "model-load", "--child", mode, temp_dir],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+                ) for _ in range(workers)]
+                ready = [json.loads(child.stdout.readline())["ready_time"] - launched for child in children]
+                results = []
+                for child in children:
+                    child.stdin.write("measure\n")
+                    child.stdin.flush()
+                    results.append(json.loads(child.stdout.readline()))
+                for child in children:
+                    child.stdin.close()
+                    child.wait()
+
+                load = sum(ready) / workers
+                rss = sum(r["rss"] for r in results) / workers
+                uss = sum(r["uss"] for r in results) / workers
+                pss = sum(r["pss"] for r in results)
+                print(f"{workers:>6}{mode:>8}{load:>10.2f}{rss:>15.1f}{uss:>15.1f}{pss:>14.1f}")
+
+    return True
+
+class _SlowFile:
+    """模拟慢速设备（U盘、网络共享）：每次读取有固定往返延迟，另按带宽计算传输时间"""
+
+    def __init__(self, path: str, call_latency: float, bandwidth: float):
+        self._raw = open(path, 'rb')
+        self._call_latency = call_latency
+        self._bandwidth = bandwidth
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        time.sleep(self._call_latency + len(data) / self._bandwidth)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+def bench_prefetch(n_files: int, open_ms: float, read_ms: float, bandwidth_mb: float):
+    """在模拟的慢速设备上比较开启和关闭预读时的总耗时和I/O阻塞时间"""
+    import prefetch
+    from config import PREFETCH_CONFIG
+    from predictor import StandardPredictor
+
+    print("=" * 60)
+    print(f"预读: {n_files} 个文件, 打开延迟 {open_ms} ms, 每次读取延迟 {read_ms} ms, 带宽 {bandwidth_mb} MB/s")
+    print("=" * 60)
+
+    def slow_open(path):
+        time.sleep(open_ms / 1000)
+        return _SlowFile(path, read_ms / 1000, bandwidth_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = []
+        for i in range(n_files):
+            path = os.path.join(temp_dir, f"doc_{i:03d}.pdf")
+            write_test_pdf(path, 2 + (i * 7) % 40)
+            pdf_files.append(path)
+
+        predictor = StandardPredictor(MODEL_DIR)
+        predictor.load_model()
+        prefetch._open_file = slow_open
+
+        rows = []
+        for label, enabled in (("关闭预读", False), ("开启预读", True)):
+            PREFETCH_CONFIG["enabled"] = enabled
+            with open(os.devnull, 'w') as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    predictor.predict_batch_files(pdf_files, workers=1)
+                finally:
+                    sys.stdout = stdout
+            rows.append((label, predictor.last_run_metrics))
+
+        print(f"\n{'方式':<10}{'总耗时(s)':>12}{'I/O阻塞(s)':>14}{'I/O占比':>10}{'文件/秒':>10}")
+        for label, metrics in rows:
+            print(f"{label:<10}{metrics['wall_seconds']:>12.2f}{metrics['io_wait_seconds']:>14.2f}"
+                  f"{metrics['io_wait_ratio']:>10.1%}{metrics['files_per_second']:>10.1f}")
+
+    return True
+
+def bench_autotune(n_files: int, capacity: int, io_ms: float, contention: float, interval: float):
+    """模拟网络共享上的读取，比较固定并发数和自适应并发的吞吐量
+
+    共享最多同时服务 capacity 个请求，超过时各请求平分带宽，并且每多一个请求整体再慢 contention 倍
+    （争用、重传），因此吞吐量在 capacity 个并发时最高。任务为线程中的等待，不消耗CPU。
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrency import ConcurrencyController, iter_windowed
+    from config import AUTOTUNE_CONFIG
+
+    print("=" * 60)
+    print(f"自适应并发: {n_files} 个文件, 共享容量 {capacity} 个并发, 单次读取 {io_ms} ms, 争用系数 {contention}")
+    print("=" * 60)
+
+    lock = threading.Lock()
+    inflight = [0]
+
+    def read_from_share(_):
+        with lock:
+            inflight[0] += 1
+            k = inflight[0]
+        time.sleep(io_ms / 1000 * max(1.0, k / capacity) * (1 + contention * max(0, k - capacity)))
+        with lock:
+            inflight[0] -= 1
+
+    AUTOTUNE_CONFIG["interval"] = interval
+    max_threads = 4 * capacity
+    rows = []
+    for label in ("1", str(capacity), str(max_threads), "auto"):
+        controller = None
+        if label == "auto":
+            controller = ConcurrencyController("读取线程", 1, 1, max_threads)
+            window = lambda: controller.value
+        else:
+            window = lambda n=int(label): n
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+            for _ in iter_windowed(executor, read_from_share, range(n_files), window):
+                if controller is not None:
+                    controller.update(1)
+        elapsed = time.perf_counter() - start
+        final = controller.value if controller is not None else int(label)
+        changes = sum(1 for d in controller.decisions if d["from"] != d["to"]) if controller is not None else 0
+        rows.append((label, elapsed, n_files / elapsed, final, changes))
+
+    print(f"\n{'并发数':<8}{'耗时(s)':>10}{'文件/秒':>10}{'最终并发':>10}{'调整次数':>10}")
+    for label, elapsed, rate, final, changes in rows:
+        print(f"{label:<8}{elapsed:>10.2f}{rate:>10.1f}{final:>10}{changes:>10}")
+
+    return True
+
+def _evict_file(path: str):
+    """把文件从页缓存中清除（先写回再 POSIX_FADV_DONTNEED）"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def _head_travel(paths, offsets: dict, sizes: dict) -> float:
+    """按给定顺序读取时磁头在文件之间移动的总距离（MB，由每个文件的物理起始位置估算）"""
+    travel = 0
+    position = None
+    for path in paths:
+        offset = offsets.get(path)
+        if offset is None:
+            continue
+        if position is not None:
+            travel += abs(offset - position)
+        position = offset + sizes[path]
+    return travel / 1024 / 1024
+
+def bench_read_order(n_files: int, size_kb: int, directory: str = None, use_loop: bool = None):
+    """比较按目录遍历顺序、inode顺序、物理位置顺序和随机顺序冷读取全部文件的耗时
+
+    默认以 root 运行时在回环挂载的 ext4 镜像上测试，每轮前重新挂载并清除镜像文件的页缓存，保证冷读取；
+    否则在 directory（默认临时目录）中测试，每轮前用 posix_fadvise 清除各文件的页缓存。
+    磁头移动距离由 FIEMAP 得到的物理位置估算，与设备类型无关；耗时差异在机械硬盘上才明显。
+    """
+    import random
+    import shutil
+    from scanner import PDFScanner, physical_offset
+
+    if use_loop is None:
+        use_loop = directory is None and hasattr(os, "geteuid") and os.geteuid() == 0 and shutil.which("mkfs.ext4")
+
+    print("=" * 60)
+    print(f"读取顺序: {n_files} 个文件, 每个 {size_kb} KB, {'回环挂载的 ext4 镜像' if use_loop else (directory or '临时目录')}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image = os.path.join(temp_dir, "disk.img")
+        root = os.path.join(temp_dir, "mnt") if use_loop else (directory or temp_dir)
+        data_dir = os.path.join(root, "read_order_bench")
+
+        def mount():
+            subprocess.run(["mount", "-o", "loop", image, root], check=True)
+
+        def unmount():
+            subprocess.run(["umount", root], check=True)
+
+        if use_loop:
+            os.makedirs(root)
+            with open(image, 'wb') as f:
+                f.truncate(n_files * size_kb * 1024 * 2 + 64 * 1024 * 1024)
+            subprocess.run(["mkfs.ext4", "-q", "-F", image], check=True)
+            mount()
+
+        try:
+            # 文件按创建顺序分配inode和数据块，分散在多个目录中；目录遍历顺序（ext4 为文件名哈希顺序）与之无关
+            rng = random.Random(0)
+            payload = os.urandom(size_kb * 1024)
+            for i in range(n_files):
+                subdir = os.path.join(data_dir, f"dir_{rng.randrange(16):02d}")
+                os.makedirs(subdir, exist_ok=True)
+                with open(os.path.join(subdir, f"std_{rng.getrandbits(32):08x}.pdf"), 'wb') as f:
+                    f.write(payload)
+            # 写回磁盘后数据块位置才确定（ext4 延迟分配）
+            os.sync()
+
+            orders = {}
+            for mode in ("walk", "inode", "extent"):
+                scanner = PDFScanner(order=mode)
+                orders[mode] = scanner.scan(data_dir)
+            shuffled = list(orders["walk"])
+            rng.shuffle(shuffled)
+            orders["random"] = shuffled
+
+            sizes = {path: os.path.getsize(path) for path in orders["walk"]}
+            offsets = {path: physical_offset(path) for path in orders["walk"]}
+            if not any(offset is not None for offset in offsets.values()):
+                print("注意: 该文件系统不支持 FIEMAP，extent 顺序退化为 inode 顺序，磁头移动距离无法估算")
+
+            rows = []
+            for mode in ("walk", "inode", "extent", "random"):
+                if use_loop:
+                    unmount()
+                    _evict_file(image)
+                    mount()
+                else:
+                    for path in orders[mode]:
+                        _evict_file(path)
+
+                start = time.perf_counter()
+                for path in orders[mode]:
+                    with open(path, 'rb') as f:
+                        while f.read(1024 * 1024):
+                            pass
+                elapsed = time.perf_counter() - start
+                rows.append((mode, elapsed, _head_travel(orders[mode], offsets, sizes)))
+
+            total_mb = sum(sizes.values()) / 1024 / 1024
+            print(f"\n{'顺序':<10}{'耗时(s)':>10}{'MB/秒':>10}{'磁头移动(MB)':>16}")
+            for mode, elapsed, travel in rows:
+                print(f"{mode:<10}{elapsed:>10.2f}{total_mb / elapsed:>10.1f}{travel:>16.1f}")
+        finally:
+            if use_loop:
+                unmount()
+
+    return True
+
+def bench_output_modes(n_files: int, size_kb: int, output_root: str = None):
+    """比较各输出方式放置标准文档的耗时、写入字节数和磁盘占用增量
+
+    输出目录默认与源文件在同一文件系统；以 root 运行且未指定 output_root 时，另在回环挂载的 ext4 镜像上
+    测试一遍（跨文件系统时硬链接和克隆自动退回复制）。
+    """
+    import shutil
+    from predictor import StandardPredictor
+    from output_mode import OUTPUT_MODES
+
+    print("=" * 60)
+    print(f"输出方式: {n_files} 个标准文档, 每个 {size_kb} KB")
+    print("=" * 60)
+
+    predictor = StandardPredictor(MODEL_DIR)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source_dir = os.path.join(temp_dir, "source")
+        os.makedirs(source_dir)
+        results = []
+        for i in range(n_files):
+            path = os.path.join(source_dir, f"GB-T {10000 + i}-2024.pdf")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size_kb * 1024))
+            results.append({"file_path": path, "filename": os.path.basename(path), "is_standard": True})
+
+        targets = [("同一文件系统", output_root or os.path.join(temp_dir, "output"))]
+        mount_point = os.path.join(temp_dir, "mnt")
+        use_loop = output_root is None and hasattr(os, "geteuid") and os.geteuid() == 0 and shutil.which("mkfs.ext4")
+        if use_loop:
+            image = os.path.join(temp_dir, "disk.img")
+            with open(image, 'wb') as f:
+                f.truncate(n_files * size_kb * 1024 * 2 * len(OUTPUT_MODES) + 64 * 1024 * 1024)
+            subprocess.run(["mkfs.ext4", "-q", "-F", image], check=True)
+            os.makedirs(mount_point)
+            subprocess.run(["mount", "-o", "loop", image, mount_point], check=True)
+            targets.append(("另一个文件系统", mount_point))
+
+        try:
+            for label, root in targets:
+                print(f"\n{label}: {root}")
+                print(f"{'方式':<10}{'耗时(s)':>10}{'写入(MB)':>12}{'磁盘占用增加(MB)':>20}  实际方法")
+                for mode in OUTPUT_MODES:
+                    output_dir = os.path.join(root, f"output_{mode}")
+                    os.makedirs(output_dir, exist_ok=True)
+                    os.sync()
+                    before = os.statvfs(output_dir)
+                    start = time.perf_counter()
+                    summary = predictor.copy_standard_files(results, output_dir, dedup=False, threads=1, mode=mode)
+                    os.sync()
+                    elapsed = time.perf_counter() - start
+                    after = os.statvfs(output_dir)
+                    used = (before.f_bfree - after.f_bfree) * after.f_frsize / 1024 / 1024
+                    methods = ", ".join(f"{k} {v}" for k, v in summary["files"].items())
+                    print(f"{mode:<10}{elapsed:>10.2f}{summary['total_bytes_written'] / 1024 / 1024:>12.1f}"
+                          f"{used:>20.1f}  {methods}")
+        finally:
+            if use_loop:
+                subprocess.run(["umount", mount_point], check=True)
+
+    return True
+
+def _synthetic_text(path: str, n_chars: int) -> str:
+    """由路径确定的随机中文正文（标准文档含有标准的结构用语）"""
+    import zlib
+    import numpy as np
+
+    rng = np.random.RandomState(zlib.crc32(path.encode("utf-8")))
+    text = "".join(chr(c) for c in rng.randint(0x4E00, 0x4E00 + 3000, n_chars))
+    if "GB-T" in path:
+        text = "范围 规范性引用文件 术语和定义 " + text
+    return text
+
+def _text_training_child(mode: str, n_docs: str, n_chars: str):
+    """子进程：在合成语料上训练哈希文本模型并输出耗时和峰值内存"""
+    import numpy as np
+    from trainer import HashedTextModelTrainer
+
+    n_docs, n_chars = int(n_docs), int(n_chars)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        features_path = os.path.join(temp_dir, "features.json")
+        with open(features_path, "w", encoding="utf-8") as f:
+            json.dump([{"file_path": f"/corpus/{'GB-T ' if i % 2 else ''}{i}.pdf", "is_standard": bool(i % 2),
+                        "content_features": {}, "filename_features": {}} for i in range(n_docs)], f)
+
+        trainer = HashedTextModelTrainer(text_source=lambda path: _synthetic_text(path, n_chars))
+        baseline_rss = _peak_rss_mb()
+        start = time.perf_counter()
+        if mode == "stream":
+            trainer.train_model(features_path)
+        else:
+            # 对照：整个语料哈希成一个稀疏矩阵后一次 fit
+            from scipy.sparse import vstack
+            from sklearn.linear_model import SGDClassifier
+
+            records = trainer.load_labelled(features_path)
+            batches = list(trainer._iter_batches(records, n_docs, trainer.text_source, set()))
+            X = vstack([b[0] for b in batches])
+            y = np.concatenate([b[1] for b in batches])
+            SGDClassifier(loss="log_loss", random_state=42).fit(X, y)
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": _peak_rss_mb() - baseline_rss}))
+
+def bench_text_training(doc_counts, n_chars: int):
+    """比较哈希文本模型流式训练与全量训练在不同语料规模下的耗时和峰值内存"""
+    from config import TEXT_MODEL_CONFIG
+
+    print("=" * 60)
+    print(f"哈希维度 {TEXT_MODEL_CONFIG['n_features']}, 批次 {TEXT_MODEL_CONFIG['batch_size']}, "
+          f"{TEXT_MODEL_CONFIG['epochs']} 轮, 每个文档 {n_chars} 字")
+    print("=" * 60)
+    print("RSS 为训练过程中峰值常驻内存相对导入后的增量；全量训练只跑一轮")
+    print(f"\n{'文档数':>8}{'流式(秒)':>12}{'全量(秒)':>12}{'流式ΔRSS(MB)':>15}{'全量ΔRSS(MB)':>15}")
+    for n_docs in doc_counts:
+        row = {}
+        for mode in ("stream", "full"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "text-training", "--child", mode, str(n_docs), str(n_chars)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            row[mode] = json.loads(output.strip().splitlines()[-1])
+        print(f"{n_docs:>8}{row['stream']['seconds']:>12.1f}{row['full']['seconds']:>12.1f}"
+              f"{row['stream']['peak_rss_mb']:>15.1f}{row['full']['peak_rss_mb']:>15.1f}")
+
+    return True
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="PDF标准文档识别系统 - 性能基准")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    fs_parser = subparsers.add_parser("feature-store", help="特征存储加载时间和大小对比")
+    fs_parser.add_argument("--json", default=os.path.join(MODEL_DIR, LEGACY_FEATURES_FILE),
+                           help="JSON特征文件路径")
+    fs_parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    fs_parser.add_argument("--scale", type=int, default=1, help="将样本复制多份以模拟大语料")
+
+    lp_parser = subparsers.add_parser("lazy-pages", help="大文档惰性读取的延迟和峰值内存对比")
+    lp_parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 1500],
+                           help="测试PDF的页数")
+    lp_parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    lp_parser.add_argument("--child", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+
+    sc_parser = subparsers.add_parser("schedule", help="并行预测时按扫描顺序与大文件优先调度的尾部延迟对比")
+    sc_parser.add_argument("--small", type=int, default=400, help="小文件数量")
+    sc_parser.add_argument("--large", type=int, default=4, help="大文件数量（排在扫描顺序末尾）")
+    sc_parser.add_argument("--workers", type=int, default=4, help="进程数")
+    sc_parser.add_argument("--repeat", type=int, default=1, help="重复次数")
+
+    ml_parser = subparsers.add_parser("model-load", help="多进程加载 .pkl 模型与共享内存映射模型的启动时间和内存对比")
+    ml_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="进程数")
+    ml_parser.add_argument("--trees", type=int, default=300, help="测试模型的树数量")
+    ml_parser.add_argument("--samples", type=int, default=20000, help="测试模型的训练样本数（决定树的大小）")
+    ml_parser.add_argument("--child", nargs=2, metavar=("MODE", "MODEL_DIR"), help=argparse.SUPPRESS)
+
+    pf_parser = subparsers.add_parser("prefetch", help="模拟慢速设备上开启和关闭预读的耗时与I/O阻塞时间对比")
+    pf_parser.add_argument("--files", type=int, default=40, help="文件数量")
+    pf_parser.add_argument("--open-ms", type=float, default=20.0, help="打开文件的延迟（毫秒）")
+    pf_parser.add_argument("--read-ms", type=float, default=2.0, help="每次读取调用的往返延迟（毫秒）")
+    pf_parser.add_argument("--bandwidth", type=float, default=30.0, help="传输带宽（MB/s）")
+
+    ro_parser = subparsers.add_parser("read-order", help="按目录遍历、inode、物理位置和随机顺序冷读取文件的耗时对比")
+    ro_parser.add_argument("--files", type=int, default=400, help="文件数量")
+    ro_parser.add_argument("--size-kb", type=int, default=256, help="每个文件的大小（KB）")
+    ro_parser.add_argument("--dir", default=None,
+                           help="在该目录所在的文件系统上测试（如机械硬盘上的目录），默认使用回环挂载的 ext4 镜像（需要root）或临时目录")
+
+    at_parser = subparsers.add_parser("autotune", help="模拟网络共享上固定并发数与自适应并发的吞吐量对比")
+    at_parser.add_argument("--files", type=int, default=2000, help="文件数量")
+    at_parser.add_argument("--capacity", type=int, default=6, help="共享能同时服务的请求数")
+    at_parser.add_argument("--io-ms", type=float, default=10.0, help="单次读取耗时（毫秒）")
+    at_parser.add_argument("--contention", type=float, default=0.15, help="超过容量后每多一个请求增加的耗时比例")
+    at_parser.add_argument("--interval", type=float, default=0.5, help="自适应测量窗口（秒）")
+
+    om_parser = subparsers.add_parser("output-modes", help="复制、硬链接、克隆、符号链接和只写清单的耗时与写入量对比")
+    om_parser.add_argument("--files", type=int, default=200, help="标准文档数量")
+    om_parser.add_argument("--size-kb", type=int, default=1024, help="每个文件的大小（KB）")
+    om_parser.add_argument("--output-dir", default=None, help="在该目录下输出（如另一块磁盘上的目录）")
+
+    tt_parser = subparsers.add_parser("text-training", help="哈希文本模型流式训练与全量训练的耗时和峰值内存随语料规模的变化")
+    tt_parser.add_argument("--docs", type=int, nargs="+", default=[500, 2000, 8000], help="合成语料的文档数")
+    tt_parser.add_argument("--chars", type=int, default=5000, help="每个文档的字数")
+    tt_parser.add_argument("--child", nargs=3, metavar=("MODE", "DOCS", "CHARS"), help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.bench == "feature-store":
+        success = bench_feature_store(args.json, args.repeat, args.scale)
+    elif args.bench == "lazy-pages":
+        if args.child:
+            _lazy_pages_child(*args.child)
+            return
+        success = bench_lazy_pages(args.pages, args.repeat)
+    elif args.bench == "schedule":
+        success = bench_schedule(args.small, args.large, args.workers, args.repeat)
+    elif args.bench == "prefetch":
+        success = bench_prefetch(args.files, args.open_ms, args.read_ms, args.bandwidth)
+    elif args.bench == "autotune":
+        success = bench_autotune(args.files, args.capacity, args.io_ms, args.contention, args.interval)
+    elif args.bench == "read-order":
+        success = bench_read_order(args.files, args.size_kb, args.dir)
+    elif args.bench == "output-modes":
+        success = bench_output_modes(args.files, args.size_kb, args.output_dir)
+    elif args.bench == "text-training":
+        if args.child:
+            _text_training_child(*args.child)
+            return
+        success = bench_text_training(args.docs, args.chars)
+    elif args.bench == "model-load":
+        if args.child:
+            _model_load_child(*args.child)
+            return
+        success = bench_model_load(args.workers, args.trees, args.samples)
+
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    main()
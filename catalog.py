@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import argparse
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional
+from config import STANDARD_PDFS_DIR, CATALOG_CONFIG
+from scheduler import file_size
+
+# 全角和各种破折号统一为半角，文件名中常见 "GB-T 34657－2017"、"T/CSAE 123—2020" 这样的写法
+_SEPARATORS = str.maketrans({"－": "-", "—": "-", "–": "-", "／": "/", "＿": "_", "　": " "})
+
+# 标准编号：发布机构前缀（GB/T、GB-T、GBT、DB3401-T、DB13J_T、NBT、Q-GDW、T-CIDADS 等写法）+ 顺序号（可带部分号）+ 年份
+_CODE_PATTERN = re.compile(
+    r'(?<![A-Za-z])(?:'
+    r'(?P<national>GB)(?:\s*[/\-_]?\s*(?P<national_kind>[TZ]))?'
+    r'|(?P<industry>NB)\s*[/\-_]?\s*T'
+    r'|(?P<local>DB\s*\d{2,6}J?)(?:\s*[/\-_]?\s*(?P<local_kind>T))?'
+    r'|Q\s*[/\-_]\s*(?P<enterprise>GDW)'
+    r'|T\s*[/\-_]\s*(?P<group>[A-Z]{2,})'
+    r')(?![A-Za-z])[\s\-_]*(?P<number>\d+(?:\.\d+)*)'
+    r'(?:\s*[-_]\s*(?P<year>(?:19|20)\d{2})(?!\d))?'
+)
+
+# 字典树节点中保存标准条目的键（不会与编号中的字符冲突）
+_ENTRY = ""
+
+
+class StandardCode(NamedTuple):
+    """规范化的标准编号，如 GB/T 27930-2015：prefix 为 GB/T，number 为 27930，year 为 2015"""
+    prefix: str
+    number: str
+    year: Optional[str]
+    standard_type: str
+
+    @property
+    def key(self) -> str:
+        """不含年份的编号（同一标准的各个版本相同）"""
+        return f"{self.prefix} {self.number}"
+
+    def __str__(self) -> str:
+        return f"{self.key}-{self.year}" if self.year else self.key
+
+
+def parse_code(text: str) -> Optional[StandardCode]:
+    """从文件名、元数据或首页文本中找出第一个标准编号并规范化；没有时返回None"""
+    match = _CODE_PATTERN.search(text.translate(_SEPARATORS))
+    if match is None:
+        return None
+    if match.group("national"):
+        kind = match.group("national_kind")
+        prefix, standard_type = f"GB/{kind}" if kind else "GB", "GB"
+    elif match.group("industry"):
+        prefix, standard_type = "NB/T", "NB"
+    elif match.group("local"):
+        prefix = re.sub(r'\s+', '', match.group("local")) + ("/T" if match.group("local_kind") else "")
+        standard_type = "DB"
+    elif match.group("enterprise"):
+        prefix, standard_type = "Q/GDW", "QGDW"
+    else:
+        prefix, standard_type = f"T/{match.group('group')}", "T"
+    return StandardCode(prefix, match.group("number"), match.group("year"), standard_type)
+
+
+def result_code(result: Dict[str, Any]) -> Optional[StandardCode]:
+    """预测结果中的规范化编号（完整结果在 features 中，简化结果在顶层）"""
+    code = result.get("catalog_code") or result.get("features", {}).get("catalog_code")
+    return parse_code(code) if code else None
+
+
+class StandardCatalog:
+    """已知标准目录：规范化编号（不含年份）上的字典树，每个标准记录各版本（年份）的文件
+
+    查找时先规范化编号，再沿字典树逐字符向下，耗时与编号长度成正比，与目录中的标准数无关；
+    同一前缀下的标准（如 GB/T 18487 的各个部分）可用 with_prefix 列出。
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def _node(self, key: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        node = self._root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node[char] = {}
+            node = child
+        return node
+
+    def add(self, code: StandardCode, path: str):
+        """登记一个文件（同一版本可以有多个文件）"""
+        self._add(code.key, code.standard_type, code.year or "", path)
+
+    def _add(self, key: str, standard_type: str, year: str, path: str):
+        node = self._node(key, create=True)
+        entry = node.get(_ENTRY)
+        if entry is None:
+            entry = node[_ENTRY] = {"key": key, "standard_type": standard_type, "versions": {}}
+            self.size += 1
+        paths = entry["versions"].setdefault(year, [])
+        if path not in paths:
+            paths.append(path)
+
+    def add_path(self, path: str) -> Optional[StandardCode]:
+        """按文件名中的编号登记；文件名中没有编号时不登记"""
+        code = parse_code(os.path.basename(path))
+        if code is not None:
+            self.add(code, path)
+        return code
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """按规范化编号（不含年份）取条目"""
+        node = self._node(key)
+        return node.get(_ENTRY) if node is not None else None
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """由文件名或首页文本中的编号（任意常见写法）找到已知标准的条目"""
+        code = parse_code(text)
+        return self.get(code.key) if code is not None else None
+
+    def with_prefix(self, prefix: str) -> Iterator[Dict[str, Any]]:
+        """规范化编号以 prefix 开头的所有条目（按编号排序）"""
+        node = self._node(prefix)
+        if node is None:
+            return
+        stack = [node]
+        entries = []
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == _ENTRY:
+                    entries.append(child)
+                else:
+                    stack.append(child)
+        yield from sorted(entries, key=lambda entry: entry["key"])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.with_prefix("")
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def latest_year(entry: Dict[str, Any]) -> Optional[str]:
+        """条目中最新版本的年份（都没有年份时返回None）"""
+        years = [year for year in entry["versions"] if year]
+        return max(years) if years else None
+
+    def save(self, path: str):
+        """保存全部条目（下次运行用 load 恢复，再补充新发现的版本）"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": list(self)}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "StandardCatalog":
+        """读取 save 保存的目录（文件不存在或损坏时为空目录）"""
+        catalog = cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get("entries", [])
+        except (OSError, ValueError):
+            return catalog
+        for entry in entries:
+            for year, paths in entry["versions"].items():
+                for file_path in paths:
+                    catalog._add(entry["key"], entry["standard_type"], year, file_path)
+        return catalog
+
+    @classmethod
+    def build(cls, standard_dirs: Iterable[str] = None, results_paths: Iterable[str] = (),
+              catalog_file: Optional[str] = None) -> "StandardCatalog":
+        """由保存的目录文件、标准文件目录（默认 pdfs/标准）和以前的 prediction_results.json 中的标准文档建立目录"""
+        catalog = cls.load(catalog_file) if catalog_file else cls()
+        for directory in (CATALOG_CONFIG["reference_dirs"] if standard_dirs is None else standard_dirs):
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    if filename.lower().endswith(".pdf"):
+                        catalog.add_path(os.path.join(dirpath, filename))
+        for results_path in results_paths:
+            try:
+                with open(results_path, 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for result in results:
+                if not result.get("is_standard"):
+                    continue
+                code = result_code(result)
+                if code is not None:
+                    catalog.add(code, result["file_path"])
+                else:
+                    catalog.add_path(result["file_path"])
+        return catalog
+
+
+def superseded_versions(results: List[Dict[str, Any]], file_sizes: Dict[str, int] = None,
+                        known: Optional[StandardCatalog] = None) -> List[Dict[str, Any]]:
+    """找出同一标准有更新版本的文件，返回每个标准的报告（按可节省的字节数排序）
+
+    编号相同、年份较旧的文件视为已被替代；更新的版本可以在 results 中，也可以是已知标准目录 known 中已有的版本。
+    没有年份的文件无法比较，始终保留。
+    """
+    catalog = StandardCatalog()
+    for result in results:
+        code = result_code(result)
+        if code is not None:
+            catalog.add(code, result["file_path"])
+    file_sizes = file_sizes or {}
+
+    report = []
+    for entry in catalog:
+        latest = StandardCatalog.latest_year(entry)
+        latest_paths = entry["versions"].get(latest or "", [])
+        known_entry = known.get(entry["key"]) if known is not None else None
+        if known_entry is not None:
+            known_latest = StandardCatalog.latest_year(known_entry)
+            if known_latest and (latest is None or known_latest > latest):
+                latest, latest_paths = known_latest, known_entry["versions"][known_latest]
+        if latest is None:
+            continue
+        superseded = [{"file_path": path, "year": year, "size": file_size(path, file_sizes)}
+                      for year, paths in entry["versions"].items() if year and year < latest for path in paths]
+        if superseded:
+            report.append({
+                "code": f"{entry['key']}-{latest}",
+                "latest": latest_paths,
+                "superseded": superseded,
+                "bytes_saved": sum(s["size"] for s in superseded)
+            })
+
+    report.sort(key=lambda item: item["bytes_saved"], reverse=True)
+    return report
+
+
+def main():
+    """查询命令行：列出已知标准的各个版本"""
+    parser = argparse.ArgumentParser(description="PDF标准文档识别系统 - 已知标准目录")
+    parser.add_argument("code", nargs="?", help="标准编号（任意常见写法，如 GB-T 27930 或 GBT27930-2015）或编号前缀")
+    parser.add_argument("--dir", action="append", default=None, help=f"标准文件目录 (默认: {STANDARD_PDFS_DIR})")
+    parser.add_argument("--results", action="append", default=[], metavar="FILE",
+                        help="同时收录以前的 prediction_results.json 中的标准文档（可多次指定）")
+    args = parser.parse_args()
+
+    catalog = StandardCatalog.build(args.dir, args.results, CATALOG_CONFIG["catalog_file"])
+    if args.code:
+        text = args.code.upper()
+        code = parse_code(text)
+        entry = catalog.get(code.key) if code is not None else None
+        entries = [entry] if entry is not None else list(catalog.with_prefix(text))
+    else:
+        entries = list(catalog)
+    print(f"已知标准 {len(catalog)} 个，匹配 {len(entries)} 个")
+    for entry in entries:
+        latest = StandardCatalog.latest_year(entry)
+        print(f"{entry['key']}" + (f" (最新 {latest})" if latest else ""))
+        for year in sorted(entry["versions"], reverse=True):
+            for path in entry["versions"][year]:
+                print(f"  {year or '----'}  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF标准文档识别系统 - 文档类别模型训练
+由带标签的样本（标签文件、按类别分好的目录）训练 pdf_standard_classifier 使用的多类别模型：
+正文和文件名的字符 n-gram 哈希后用逻辑回归一次为所有类别打分
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import CATEGORY_MODEL_CONFIG, CACHE_CONFIG, EVALUATION_CONFIG
+from text_model import NgramHasher, HashedMultiClassModel, split_is_holdout
+from catalog import parse_code
+from pdf_standard_classifier import CATEGORIES, EXACT_MATCHES, classify_by_rules, extract_text_from_pdf, set_text_cache
+
+
+def resolve_label(filename: str, label: str) -> Optional[str]:
+    """把样本标签转为类别：类别名原样使用，"标准" 按文件名中编号的类型归类，其他标签返回None"""
+    if label in CATEGORIES:
+        return label
+    if label in EVALUATION_CONFIG["positive_labels"]:
+        code = parse_code(filename)
+        if code is not None:
+            return CATEGORY_MODEL_CONFIG["standard_categories"].get(code.standard_type)
+    return None
+
+
+def collect_examples(label_sets: Sequence[Tuple[str, Optional[str]]] = (),
+                     category_dirs: Sequence[str] = ()) -> Tuple[List[Tuple[str, str]], int]:
+    """收集 [(文件路径, 类别), ...] 和找不到或无法归类的样本数
+
+    label_sets 为 (标签文件, 文件所在目录)，标签文件每行 文件,标签（如 example/category_labels.csv，
+    即 test_classifier.py 的期望分类）；category_dirs 中每个子目录名为类别（如分类输出目录 ./标准分类），
+    文件名在精确匹配规则中时以规则给出的类别为准。
+    """
+    from evaluate import load_label_sets
+
+    labelled, missing = load_label_sets(label_sets)
+    examples = {}
+    skipped = len(missing)
+    for path, label in labelled:
+        category = resolve_label(os.path.basename(path), label)
+        if category is None:
+            skipped += 1
+        else:
+            examples[path] = category
+    for category_dir in category_dirs:
+        for category in os.listdir(category_dir):
+            if category not in CATEGORIES:
+                continue
+            for dirpath, _, filenames in os.walk(os.path.join(category_dir, category)):
+                for filename in filenames:
+                    if filename.lower().endswith(".pdf"):
+                        examples[os.path.join(dirpath, filename)] = EXACT_MATCHES.get(filename, category)
+    return sorted(examples.items()), skipped
+
+
+class CategoryModelTrainer:
+    """文档类别模型训练器：取前3页正文（优先读取文本缓存）和文件名，哈希后训练一对其余逻辑回归
+
+    样本量通常只有几百个，整体读入后一次训练；留出集按文件路径哈希划分，评估时同时给出关键词规则的准确率作对照。
+    """
+
+    def __init__(self, text_source: Callable[[str], str] = None):
+        self.hasher = NgramHasher(CATEGORY_MODEL_CONFIG["n_features"], CATEGORY_MODEL_CONFIG["ngram_sizes"],
+                                  CATEGORY_MODEL_CONFIG["max_chars"])
+        self.text_source = text_source or extract_text_from_pdf
+        self.model = None
+        self.model_info = {}
+
+    def _documents(self, examples: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """读取正文，返回 ([(正文, 文件名), ...], [类别, ...])；读不到正文的样本跳过"""
+        documents = []
+        labels = []
+        for path, category in examples:
+            text = self.text_source(path)
+            if text:
+                documents.append((text, os.path.basename(path)))
+                labels.append(category)
+        return documents, labels
+
+    def train_model(self, examples: List[Tuple[str, str]], test_size: float = 0.2) -> Dict[str, Any]:
+        """训练并在留出集上评估，返回模型信息"""
+        from scipy.sparse import csr_matrix
+        from sklearn.linear_model import SGDClassifier
+
+        train = [e for e in examples if not split_is_holdout(e[0], test_size)]
+        test = [e for e in examples if split_is_holdout(e[0], test_size)]
+        documents, labels = self._documents(train)
+        if len(set(labels)) < 2:
+            raise ValueError("训练样本至少要有两个类别")
+        print(f"训练样本: {len(documents)} ({len(set(labels))} 个类别), 留出样本: {len(test)}")
+
+        indptr, indices, data = self.hasher.transform(documents)
+        X = csr_matrix((data, indices, indptr), shape=(len(documents), self.hasher.n_features))
+        model = SGDClassifier(loss="log_loss", alpha=CATEGORY_MODEL_CONFIG["alpha"], class_weight="balanced",
+                              max_iter=CATEGORY_MODEL_CONFIG["epochs"], tol=None, random_state=42)
+        model.fit(X, labels)
+
+        coef = model.coef_.T.astype(np.float32)
+        intercept = model.intercept_
+        if len(model.classes_) == 2:
+            # 两个类别时 scikit-learn 只有一组系数（第二个类别的得分），第一个类别取其相反数
+            coef = np.column_stack([-coef[:, 0], coef[:, 0]])
+            intercept = np.array([-intercept[0], intercept[0]])
+        self.model = HashedMultiClassModel(coef, intercept, [str(c) for c in model.classes_], self.hasher)
+
+        missing = [category for category in CATEGORIES if category not in model.classes_]
+        if missing:
+            print(f"警告: 训练样本中没有 {len(missing)} 个类别（{'、'.join(missing)}），"
+                  "分类时不会使用该模型，请补充样本后重新训练")
+
+        test_documents, test_labels = self._documents(test)
+        predictions = [category for category, _ in self.model.predict(test_documents)]
+        rules = [classify_by_rules(filename, text)[0] for text, filename in test_documents]
+        n_test = len(test_labels)
+        self.model_info = {
+            "classes": self.model.classes_,
+            "n_train": len(documents),
+            "n_test": n_test,
+            "accuracy": sum(p == y for p, y in zip(predictions, test_labels)) / n_test if n_test else None,
+            "rules_accuracy": sum(p == y for p, y in zip(rules, test_labels)) / n_test if n_test else None,
+            "test_size": test_size,
+            "missing_categories": missing,
+            "hasher": self.hasher.settings()
+        }
+        if n_test:
+            print(f"模型训练完成，留出集准确率: {self.model_info['accuracy']:.4f} "
+                  f"(关键词规则: {self.model_info['rules_accuracy']:.4f})")
+        else:
+            print("模型训练完成（没有留出样本，未评估）")
+        return self.model_info
+
+    def save_model(self, model_dir: str):
+        self.model.save(model_dir, self.model_info)
+        print(f"类别模型已保存到: {model_dir}")
+
+
+def main():
+    """训练命令行"""
+    parser = argparse.ArgumentParser(description="PDF标准文档识别系统 - 文档类别模型训练")
+    parser.add_argument("--labels", action="append", default=[], metavar="FILE",
+                        help="标签文件（每行 文件,标签，可多次指定）；不指定 --labels 和 --dir 时使用 "
+                             "EVALUATION_CONFIG[\"label_sets\"]（example/labels.csv、example/category_labels.csv）")
+    parser.add_argument("--root", default=None, help="--labels 中的文件所在目录 (默认: 标签文件所在目录)")
+    parser.add_argument("--dir", action="append", default=[], metavar="DIR",
+                        help="按类别分好的目录（子目录名为类别，如 ./标准分类，可多次指定）")
+    parser.add_argument("--model-dir", default=CATEGORY_MODEL_CONFIG["model_dir"], help="模型目录 (默认: %(default)s)")
+    parser.add_argument("--test-size", type=float, default=0.2, help="留出集比例 (默认: %(default)s)")
+    args = parser.parse_args()
+
+    if args.labels or args.dir:
+        label_sets = [(labels_path, args.root) for labels_path in args.labels]
+    else:
+        label_sets = [(s["labels"], s["root"]) for s in EVALUATION_CONFIG["label_sets"]]
+
+    if CACHE_CONFIG["enabled"]:
+        from text_cache import TextCache
+        set_text_cache(TextCache(CACHE_CONFIG["text_cache_dir"], CACHE_CONFIG["compress_level"]))
+
+    examples, skipped = collect_examples(label_sets, args.dir)
+    print(f"样本: {len(examples)} 个" + (f"（{skipped} 个找不到或无法归类，已跳过）" if skipped else ""))
+    trainer = CategoryModelTrainer()
+    try:
+        trainer.train_model(examples, args.test_size)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    trainer.save_model(args.model_dir)
+
+
+if __name__ == "__main__":
+    main()
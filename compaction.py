@@ -0,0 +1,195 @@
+import time
+import numpy as np
+from typing import Dict, List, Any, Sequence, Tuple
+from flat_forest import FlatForest
+from config import COMPACTION_CONFIG, MODEL_CONFIG
+
+# 变体名后缀：安装时开启提前结束
+EARLY_EXIT_SUFFIX = "+early"
+
+
+def generate_samples(X: np.ndarray, size: int, groups: Sequence[Sequence[int]], seed: int,
+                     swap_prob: float = 0.5, noise: float = 0.1) -> np.ndarray:
+    """在训练样本附近生成蒸馏样本（MUNGE）：每个样本取一个训练样本，各列组以 swap_prob 的概率
+    换成其最近邻样本的值，取值多于两种的列再加少量高斯噪声；one-hot 编码的列组整组替换，保持编码有效
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    rng = np.random.RandomState(seed)
+    neighbors = NearestNeighbors(n_neighbors=min(2, len(X))).fit(X).kneighbors(X, return_distance=False)[:, -1]
+    base = rng.randint(0, len(X), size)
+    samples = X[base].copy()
+    partner = X[neighbors[base]]
+    for group in groups:
+        swap = rng.rand(size) < swap_prob
+        samples[np.ix_(swap, group)] = partner[np.ix_(swap, group)]
+
+    continuous = [i for i in range(X.shape[1]) if len(np.unique(X[:, i])) > 2]
+    scale = X[:, continuous].std(axis=0) * noise
+    samples[:, continuous] += rng.normal(size=(size, len(continuous))) * scale
+    return samples
+
+
+def tree_outputs(forest: FlatForest, X: np.ndarray) -> np.ndarray:
+    """每棵树给出的正类概率，形状 (n_samples, n_trees)"""
+    return np.asarray(forest.values)[forest.apply(X), 1]
+
+
+def select_trees(outputs: np.ndarray, target: np.ndarray, n_trees: int) -> List[int]:
+    """贪心前向选择：每次加入使子森林平均输出与 target 的均方误差最小的树
+
+    返回的顺序即重要性顺序：取前 k 棵得到剪枝后的森林，按此顺序遍历时提前结束也更早。
+    """
+    chosen = []
+    remaining = list(range(outputs.shape[1]))
+    total = np.zeros(len(target))
+    for k in range(1, min(n_trees, len(remaining)) + 1):
+        candidates = outputs[:, remaining]
+        errors = (((total[:, None] + candidates) / k - target[:, None]) ** 2).mean(axis=0)
+        best = remaining.pop(int(np.argmin(errors)))
+        chosen.append(best)
+        total += outputs[:, best]
+    return chosen
+
+
+def distil_forest(X: np.ndarray, target: np.ndarray, features: Sequence[int],
+                  n_trees: int, max_depth: int) -> FlatForest:
+    """蒸馏：只用 features 中的列，以回归森林拟合原模型的正类概率；节点的特征下标映射回完整特征向量"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=n_trees, max_depth=max_depth, random_state=42)
+    model.fit(X[:, features], target)
+    forest = FlatForest.from_sklearn(model)
+    forest.nodes["feature"] = np.asarray(features)[forest.nodes["feature"]]
+    importances = np.zeros(X.shape[1])
+    importances[list(features)] = model.feature_importances_
+    forest.feature_importances_ = importances
+    return forest
+
+
+def decide(forest: FlatForest, X: np.ndarray, threshold: float, early_exit: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """是否判为标准文档（正类概率 >= threshold）及每个样本遍历的树数"""
+    if early_exit:
+        probability, evaluated = forest.predict_decided(X, threshold, MODEL_CONFIG["early_exit_chunk"])
+    else:
+        probability = forest.predict_proba(X)[:, 1]
+        evaluated = np.full(len(X), forest.n_trees)
+    return probability >= threshold, evaluated
+
+
+def measure_latency(forest: FlatForest, X: np.ndarray, threshold: float, early_exit: bool,
+                    repeat: int, batch_size: int = 1) -> float:
+    """每个文件的平均模型耗时（微秒，每次调用 batch_size 个文件，取三次测量的最小值；不含特征提取和标准化）"""
+    batches = [X[i:i + batch_size] for i in range(0, len(X) - batch_size + 1, batch_size)]
+    calls = max(1, repeat // batch_size)
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            decide(forest, batches[i % len(batches)], threshold, early_exit)
+        best = min(best, (time.perf_counter() - start) / (calls * batch_size))
+    return best * 1e6
+
+
+def compact_forest(trainer, features: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, FlatForest]]:
+    """由已加载 .pkl 模型的训练器生成剪枝和蒸馏的各个变体，返回 (报告, {变体名: 扁平化模型})
+
+    留出集与训练时的划分相同（原模型没有见过）；一致率在另一组生成样本上比较与原模型的判定结果。
+    """
+    from sklearn.model_selection import train_test_split
+
+    X, y = trainer.extract_training_features(features)
+    if len(X) == 0:
+        raise ValueError("没有有效的训练数据")
+    X = trainer.scaler.transform(X)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=trainer.model_info.get("test_size", 0.2), random_state=42, stratify=y
+    )
+    groups = trainer.get_feature_groups()
+    threshold = MODEL_CONFIG["min_confidence"]
+    teacher = trainer.model if isinstance(trainer.model, FlatForest) else FlatForest.from_sklearn(trainer.model)
+
+    # 蒸馏样本：训练样本及其附近的生成样本，标签为原模型的正类概率
+    transfer = np.vstack([X_train, generate_samples(X_train, COMPACTION_CONFIG["transfer_size"], groups, seed=1)])
+    target = teacher.predict_proba(transfer)[:, 1]
+    evaluation = np.vstack([X, generate_samples(X, COMPACTION_CONFIG["eval_size"], groups, seed=2)])
+    reference, _ = decide(teacher, evaluation, threshold, early_exit=False)
+
+    order = select_trees(tree_outputs(teacher, transfer), target, teacher.n_trees)
+    variants = {"full": teacher.subset(order)}
+    for size in COMPACTION_CONFIG["prune_sizes"]:
+        if size < teacher.n_trees:
+            variants[f"prune-{size}"] = teacher.subset(order[:size])
+
+    importances = teacher.feature_importances_
+    kept = [i for i in range(X.shape[1])
+            if importances is None or importances[i] > COMPACTION_CONFIG["min_importance"]]
+    for n_trees, max_depth in COMPACTION_CONFIG["distil_shapes"]:
+        student = distil_forest(transfer, target, kept, n_trees, max_depth)
+        ordered = select_trees(tree_outputs(student, transfer), target, student.n_trees)
+        variants[f"distil-{n_trees}x{max_depth}"] = student.subset(ordered)
+
+    rows = []
+    for name, forest in variants.items():
+        decisions, _ = decide(forest, X_test, threshold, early_exit=False)
+        agreement, _ = decide(forest, evaluation, threshold, early_exit=False)
+        _, evaluated = decide(forest, evaluation, threshold, early_exit=True)
+        used = np.asarray(forest.nodes["feature"])[np.asarray(forest.nodes["left"]) >= 0]
+        rows.append({
+            "variant": name,
+            "trees": forest.n_trees,
+            "nodes": len(forest.nodes),
+            "features": len(np.unique(used)),
+            "accuracy": float((decisions == (y_test == 1)).mean()),
+            "agreement": float((agreement == reference).mean()),
+            "early_trees": float(evaluated.mean())
+        })
+        # 单个文件调用（元数据通道之外零散的文件）和整批调用（预测器每批 predict_batch_size 个文件）
+        for key, batch_size in (("latency_us", 1), ("batch_latency_us", MODEL_CONFIG["predict_batch_size"])):
+            for suffix, early_exit in (("", False), ("_early", True)):
+                rows[-1][key.replace("_us", suffix + "_us")] = measure_latency(
+                    forest, evaluation, threshold, early_exit, COMPACTION_CONFIG["latency_repeat"], batch_size)
+
+    report = {
+        "threshold": threshold,
+        "n_holdout": len(X_test),
+        "n_eval": len(evaluation),
+        "batch_size": MODEL_CONFIG["predict_batch_size"],
+        "dropped_features": [trainer.feature_names[i] for i in range(X.shape[1]) if i not in kept],
+        "rows": rows
+    }
+    return report, variants
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """准确率与每个文件模型耗时的对照表"""
+    lines = [
+        f"判定阈值 {report['threshold']}，留出集 {report['n_holdout']} 个样本，"
+        f"一致率在 {report['n_eval']} 个样本上与原模型比较",
+        f"蒸馏时去除的特征: {', '.join(report['dropped_features']) or '无'}",
+        f"延迟为每个文件的模型耗时（微秒）；单个为逐个文件调用，批量为每次 {report['batch_size']} 个文件",
+        "",
+        f"{'变体':<14}{'树数':>6}{'节点数':>8}{'特征数':>8}{'准确率':>9}{'一致率':>9}"
+        f"{'单个':>9}{'单个+提前结束':>14}{'批量':>8}{'批量+提前结束':>14}{'平均遍历树数':>14}"
+    ]
+    for row in report["rows"]:
+        lines.append(f"{row['variant']:<16}{row['trees']:>6}{row['nodes']:>9}{row['features']:>9}"
+                     f"{row['accuracy']:>12.3f}{row['agreement']:>11.3f}{row['latency_us']:>11.1f}"
+                     f"{row['latency_early_us']:>16.1f}{row['batch_latency_us']:>12.1f}"
+                     f"{row['batch_latency_early_us']:>16.1f}{row['early_trees']:>18.1f}")
+    return "\n".join(lines)
+
+
+def install_variant(model_dir: str, name: str, variants: Dict[str, FlatForest], report: Dict[str, Any], scaler):
+    """把选定的变体保存为模型目录中的扁平化模型（预测进程以内存映射方式加载）
+
+    名称加 "+early" 后缀时开启提前结束；.pkl 原模型保持不变，可再次压缩或用 "full" 恢复。
+    """
+    base = name[:-len(EARLY_EXIT_SUFFIX)] if name.endswith(EARLY_EXIT_SUFFIX) else name
+    if base not in variants:
+        choices = ", ".join(variants)
+        raise ValueError(f"未知的模型变体: {name}，可选: {choices}（可加 {EARLY_EXIT_SUFFIX} 后缀）")
+    forest = variants[base]
+    forest.early_exit = name.endswith(EARLY_EXIT_SUFFIX)
+    row = next(r for r in report["rows"] if r["variant"] == base)
+    forest.save(model_dir, scaler, info=dict(row, variant=name, threshold=report["threshold"]))
@@ -0,0 +1,276 @@
+import os
+import time
+import logging
+from concurrent.futures import Executor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, Any, List, Optional, Tuple
+from config import AUTOTUNE_CONFIG
+
+
+def read_cpu_times() -> Optional[Tuple[int, int, int]]:
+    """系统累计的CPU时间 (总计, 忙碌, I/O等待)，单位为时钟周期；非Linux平台返回None"""
+    try:
+        with open("/proc/stat", 'r') as f:
+            fields = [int(x) for x in f.readline().split()[1:9]]
+    except (OSError, ValueError):
+        return None
+    if len(fields) < 5:
+        return None
+    # user nice system idle iowait irq softirq steal
+    total = sum(fields)
+    idle, iowait = fields[3], fields[4]
+    return total, total - idle - iowait, iowait
+
+
+# 测得的吞吐量在多少个窗口内有效（负载变化后允许重新尝试）
+_MEASUREMENT_TTL = 10
+
+
+class CpuSampler:
+    """两次采样之间全系统的CPU利用率和I/O等待占比（0~1，对所有CPU平均）"""
+
+    def __init__(self, reader: Callable[[], Optional[Tuple[int, int, int]]] = read_cpu_times):
+        self._reader = reader
+        self._last = reader()
+
+    def sample(self) -> Tuple[Optional[float], Optional[float]]:
+        """返回 (CPU利用率, I/O等待占比)；无法读取时为 (None, None)"""
+        current = self._reader()
+        last, self._last = self._last, current
+        if current is None or last is None or current[0] <= last[0]:
+            return None, None
+        total = current[0] - last[0]
+        return (current[1] - last[1]) / total, (current[2] - last[2]) / total
+
+
+class ConcurrencyController:
+    """按测量窗口调整并发数，使吞吐量最大（爬山法）
+
+    每个窗口（至少 interval 秒且完成 min_window_files 个文件）结束时：
+    上次调整后吞吐量下降超过 tolerance 则撤销调整并保持两个窗口；
+    I/O等待偏高时减少并发；CPU未饱和时增加并发；CPU已饱和时保持。
+    无法读取CPU统计的平台只按吞吐量变化调整。每次决定及原因记录到日志和 decisions。
+    """
+
+    def __init__(self, name: str, initial: int, min_value: int, max_value: int,
+                 by_bytes: bool = False, logger: logging.Logger = None,
+                 sampler: CpuSampler = None, clock: Callable[[], float] = time.perf_counter):
+        self.name = name
+        self.min_value = max(1, min_value)
+        self.max_value = max(self.min_value, max_value)
+        self.value = min(max(initial, self.min_value), self.max_value)
+        self.by_bytes = by_bytes
+        self.logger = logger
+        self.sampler = sampler or CpuSampler()
+        self.clock = clock
+        self.interval = AUTOTUNE_CONFIG["interval"]
+        self.min_window_files = AUTOTUNE_CONFIG["min_window_files"]
+        self.cpu_high = AUTOTUNE_CONFIG["cpu_high"]
+        self.iowait_high = AUTOTUNE_CONFIG["iowait_high"]
+        self.tolerance = AUTOTUNE_CONFIG["tolerance"]
+        self.decisions = []
+        # 每个并发数最近一次测得的吞吐量及所在窗口序号（超过 _MEASUREMENT_TTL 个窗口的测量不再采信）
+        self.throughput = {}
+        self._window = 0
+        self._previous = None
+        self._hold = 0
+        self._start_window()
+
+    def _start_window(self):
+        self._window_start = self.clock()
+        self._window_files = 0
+        self._window_bytes = 0
+
+    def _step(self) -> int:
+        # 并发数较大时按比例调整，较快接近最优值
+        return max(1, self.value // 4)
+
+    def update(self, files: int = 1, nbytes: int = 0) -> int:
+        """记录完成的文件，窗口结束时做出调整；返回当前并发数"""
+        self._window_files += files
+        self._window_bytes += nbytes
+        elapsed = self.clock() - self._window_start
+        if elapsed >= self.interval and self._window_files >= self.min_window_files:
+            self._decide(elapsed)
+        return self.value
+
+    def _decide(self, elapsed: float):
+        rate = (self._window_bytes if self.by_bytes else self._window_files) / elapsed
+        cpu, iowait = self.sampler.sample()
+        self._window += 1
+        self.throughput[self.value] = (rate, self._window)
+        current = self.value
+        previous, self._previous = self._previous, None
+
+        if previous is not None and rate < self._measured(previous) * (1 - self.tolerance):
+            target = previous
+            reason = f"吞吐量低于 {previous} 时的 {self._format_rate(self._measured(previous))}，撤销调整"
+            self._hold = 2
+        elif self._hold > 0:
+            self._hold -= 1
+            target, reason = current, "撤销调整后保持"
+        elif iowait is not None and iowait >= self.iowait_high and current > self.min_value:
+            target = max(self.min_value, current - self._step())
+            reason = f"I/O等待 {iowait:.0%} 偏高，减少并发"
+        elif cpu is not None and cpu >= self.cpu_high:
+            target, reason = current, f"CPU利用率 {cpu:.0%} 已饱和"
+        elif current < self.max_value:
+            target = min(self.max_value, current + self._step())
+            reason = "CPU未饱和，增加并发" if cpu is not None else "尝试增加并发"
+        else:
+            target, reason = current, "已达到上限"
+
+        if target != current and target != previous and self._measured(target) > 0 \
+                and self._measured(target) < rate * (1 - self.tolerance):
+            reason = f"{target} 时测得的吞吐量 {self._format_rate(self._measured(target))} 更低，保持"
+            target = current
+
+        if target != current:
+            self.value = target
+            # 撤销的调整不再与之比较，避免来回振荡
+            self._previous = None if self._hold else current
+        self._record(current, target, rate, cpu, iowait, reason)
+        self._start_window()
+
+    def _measured(self, value: int) -> float:
+        """并发数为 value 时最近测得的吞吐量，没有或已过期时为0"""
+        rate, window = self.throughput.get(value, (0.0, 0))
+        return rate if self._window - window <= _MEASUREMENT_TTL else 0.0
+
+    def _format_rate(self, rate: float) -> str:
+        if self.by_bytes:
+            return f"{rate / 1024 / 1024:.1f} MB/秒"
+        return f"{rate:.1f} 文件/秒"
+
+    def _record(self, current: int, target: int, rate: float, cpu: Optional[float],
+                iowait: Optional[float], reason: str):
+        decision = {"from": current, "to": target, "rate": rate, "cpu": cpu, "iowait": iowait, "reason": reason}
+        self.decisions.append(decision)
+        if self.logger is None:
+            return
+        usage = "" if cpu is None else f", CPU {cpu:.0%}, I/O等待 {iowait:.0%}"
+        change = f"{current} → {target}" if target != current else f"保持 {current}"
+        # 只有并发数变化时输出到控制台，保持不变的窗口记为DEBUG
+        level = logging.INFO if target != current else logging.DEBUG
+        self.logger.log(level, f"并发调整: {self.name} {change} ({self._format_rate(rate)}{usage}): {reason}",
+                        extra={"fields": dict(decision, event="autotune", name=self.name)})
+
+    def summary(self) -> Dict[str, Any]:
+        """最终并发数、各并发数测得的吞吐量和调整记录（写入运行指标）"""
+        return {"final": self.value, "throughput": {str(k): v[0] for k, v in sorted(self.throughput.items())},
+                "decisions": self.decisions}
+
+
+def parse_concurrency(text: str):
+    """解析并发数参数：正整数或 auto"""
+    if text.strip().lower() == "auto":
+        return "auto"
+    value = int(text)
+    if value < 1:
+        raise ValueError(f"并发数应为正整数或 auto，实际为: {text}")
+    return value
+
+
+def default_max_workers() -> int:
+    """预测进程上限：配置值，未配置时为CPU核数的2倍（I/O等待较多时多于核数的进程仍有收益）"""
+    return AUTOTUNE_CONFIG["max_workers"] or 2 * (os.cpu_count() or 1)
+
+
+_END = object()
+
+
+def until_deadline(items: Iterable, deadline: Optional[float],
+                   clock: Callable[[], float] = time.monotonic) -> Iterator:
+    """依次产出 items，到达 deadline（clock 的时刻）后不再产出；deadline 为None时不限制"""
+    for item in items:
+        if deadline is not None and clock() >= deadline:
+            return
+        yield item
+
+
+def iter_windowed(executor: Executor, fn: Callable, items: Iterable,
+                  window: Callable[[], int]) -> Iterator[Tuple[Any, Future]]:
+    """按窗口提交任务：同时在途的任务数不超过 window() 的当前值，按完成顺序产出 (任务参数, future)
+
+    并发数在运行中调整时，下一次提交即按新的窗口生效（已在运行的任务不受影响）。
+    """
+    items = iter(items)
+    pending = {}
+    exhausted = False
+
+    def fill():
+        nonlocal exhausted
+        while not exhausted and len(pending) < max(1, window()):
+            item = next(items, _END)
+            if item is _END:
+                exhausted = True
+                return
+            pending[executor.submit(fn, item)] = item
+
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        finished = [(pending.pop(future), future) for future in done]
+        # 先补充任务再交给调用方处理结果，工作进程不必等待
+        fill()
+        for item, future in finished:
+            yield item, future
+            fill()
+
+
+def device_share(window: int, busy_limits: List[Optional[int]], limit: Optional[int]) -> int:
+    """一个设备可同时在途的任务数
+
+    配置了上限的设备取其上限；其余设备平分窗口中剩下的部分。busy_limits 为所有还有待提交任务的设备的上限。
+    """
+    if limit is not None:
+        return max(1, min(limit, window))
+    remaining = window - sum(l for l in busy_limits if l is not None)
+    unlimited = sum(1 for l in busy_limits if l is None)
+    return max(1, -(-remaining // max(1, unlimited)))
+
+
+def iter_device_windowed(executor: Executor, fn: Callable, queues: Dict[Any, Iterable],
+                         window: Callable[[], int],
+                         limits: Dict[Any, Optional[int]] = None) -> Iterator[Tuple[Any, Any, Future]]:
+    """按设备分别排队提交任务：总在途任务数不超过 window()，每个设备不超过 device_share 给出的份额
+
+    各设备轮流提交，慢速设备上的任务最多占用自己的份额，其余进程继续处理其他设备的文件；
+    某个设备的任务全部提交后，它的份额分给仍有任务的设备。按完成顺序产出 (设备, 任务参数, future)。
+    """
+    queues = {key: iter(items) for key, items in queues.items()}
+    heads = {}
+    limits = limits or {}
+    in_flight = {key: 0 for key in queues}
+    pending = {}
+
+    def next_item(key):
+        if key not in heads:
+            heads[key] = next(queues[key], _END)
+        return heads[key]
+
+    def fill():
+        while len(pending) < max(1, window()):
+            busy = [key for key in queues if next_item(key) is not _END]
+            if not busy:
+                return
+            total = max(1, window())
+            busy_limits = [limits.get(key) for key in busy]
+            ready = [key for key in busy if in_flight[key] < device_share(total, busy_limits, limits.get(key))]
+            if not ready:
+                return
+            # 优先提交在途任务最少的设备
+            key = min(ready, key=lambda k: in_flight[k])
+            item = heads.pop(key)
+            in_flight[key] += 1
+            pending[executor.submit(fn, item)] = (key, item)
+
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        finished = [(pending.pop(future), future) for future in done]
+        for (key, _), _ in finished:
+            in_flight[key] -= 1
+        fill()
+        for (key, item), future in finished:
+            yield key, item, future
+            fill()
@@ -5,6 +5,10 @@ STANDARD_PDFS_DIR = "./pdfs/标准"
 MODEL_DIR = "./model"
 OUTPUT_DIR = "./I盘标准"
 
+# 特征文件（列式特征存储；旧版JSON仅用于兼容和转换）
+FEATURES_FILE = "standard_features.npz"
+LEGACY_FEATURES_FILE = "standard_features.json"
+
 # 标准类型分类
 STANDARD_TYPES = {
     "GB": {
@@ -59,13 +63,216 @@ EXCLUDE_KEYWORDS = [
 MODEL_CONFIG = {
     "min_confidence": 0.6,
     "max_pages_to_extract": 5,
+    "large_document_pages": 50,      # 页数超过该值时惰性读取前几页，不构建整个页面列表
     "min_text_length": 100,
+    "metadata_fast_path": True,      # 先读取文档信息/XMP/书签，能确定标准编号时不再提取页面文本
+    "max_outline_entries": 50,
+    "scan_detection": True,          # 前几页都只有图像、没有文本层的文件视为扫描件，不再提取文本
+    "scan_probe_pages": 2,           # 检查的页数（封面常为图像，只看首页会误判）
+    "scan_min_chars": 10,            # 页面字符数少于该值（且含图像）视为无文本层
+    "mmap_model": True,              # 预测时加载扁平化模型（只读内存映射，多进程共享），无需导入scikit-learn
+    "backend": "forest",             # 模型类型：forest 手工特征随机森林，text 字符n-gram哈希文本模型
+    "predict_batch_size": 32,        # 批量预测的文件数（提取完一批后一次调用模型）
+    "early_exit_chunk": 4,           # 开启提前结束的模型每遍历几棵树检查一次结论是否已确定
     "feature_weight": {
         "filename": 0.3,
         "content": 0.7
     }
 }
 
+# 模型压缩（python main.py --compact）：剪枝、去除无用特征并蒸馏随机森林，输出准确率与单文件延迟对照表
+COMPACTION_CONFIG = {
+    "prune_sizes": [50, 20, 10, 5],  # 剪枝后保留的树数（按与原模型输出的误差贪心选择）
+    "distil_shapes": [[10, 4], [5, 3]],  # 蒸馏小模型的 [树数, 最大深度]
+    "min_importance": 0.0,           # 蒸馏时去除重要性不高于该值的特征
+    "transfer_size": 5000,           # 在训练样本附近生成的蒸馏样本数
+    "eval_size": 2000,               # 评估与原模型一致率的另一组生成样本数
+    "latency_repeat": 300,           # 测量单文件延迟的调用次数
+    "report_file": "compaction_report.json"
+}
+
+# 哈希文本模型：正文和文件名的字符 n-gram 哈希到固定维度，SGD逻辑回归增量训练（内存与语料规模无关）
+TEXT_MODEL_CONFIG = {
+    "n_features": 2 ** 20,           # 哈希维度（系数向量 4MB）
+    "ngram_sizes": [2, 3],           # 字符 n-gram 长度（中文以二、三字词为主）
+    "max_chars": 20000,              # 每个文件参与哈希的最多字符数
+    "batch_size": 256,               # 每次 partial_fit 的样本数
+    "epochs": 3,
+    "alpha": 1e-5                    # L2正则化系数
+}
+
+# 文档类别模型（python category_model.py 训练）：pdf_standard_classifier 用字符 n-gram 哈希上的多类别逻辑回归
+# 一次为所有类别打分、按批次预测；精确匹配和特殊规则仍先于模型生效，模型不确定、未训练或没有覆盖全部类别时沿用关键词规则
+CATEGORY_MODEL_CONFIG = {
+    "enabled": True,
+    "model_dir": MODEL_DIR,
+    "n_features": 2 ** 18,           # 哈希维度（15个类别的系数矩阵 15MB）
+    "ngram_sizes": [2, 3],
+    "max_chars": 20000,
+    "alpha": 1e-4,                   # L2正则化系数
+    "epochs": 20,
+    # 最可能的类别比第二可能的类别的概率高出不到该值时改用关键词规则（与类别数无关；只覆盖部分类别的模型不使用）
+    "min_margin": 0.15,
+    "batch_size": 64,                # 分类时每批提取、预测的文件数
+    # 标签为 "标准" 的样本按编号的类型归入的类别（如 example/labels.csv；其他类型的样本不参与训练）；
+    # 训练样本默认取 EVALUATION_CONFIG["label_sets"]（含 test_classifier.py 的期望分类 example/category_labels.csv）
+    "standard_categories": {"GB": "国标", "NB": "行标", "T": "团标", "QGDW": "企业标准"}
+}
+
+# 已知标准目录（python catalog.py 查询）：由标准文件目录和以前的预测结果建立，按规范化编号（GB/T、DB3401/T、NB/T、
+# T/CSAE、Q/GDW 等）查找各版本；latest_only 为 True 时同一标准只输出最新版本，已知目录中已有更新版本的旧版本也不输出
+# （命令行 --latest-only）
+CATALOG_CONFIG = {
+    "reference_dirs": [STANDARD_PDFS_DIR],
+    "catalog_file": "./cache/standard_catalog.json",   # 保存的已知标准目录（每次复制时补充本次的标准文档），None 为不保存
+    "latest_only": False,
+    "first_page_chars": 2000                # 文件名和元数据中没有编号时，在首页文本的前多少个字符中查找
+}
+
+# 准确率与吞吐量评估（python evaluate.py）：在带标签的语料上比较各变体的精确率、召回率和文件/秒；
+# 每个变体为对 MODEL_CONFIG 的临时修改，各变体共用文本缓存
+EVALUATION_CONFIG = {
+    # 标签文件（每行 文件,标签）及其中的文件所在的目录；标签在 positive_labels 中的为标准文档，其余为非标准
+    "label_sets": [
+        {"labels": "./example/labels.csv", "root": "./pdfs"},
+        {"labels": "./example/category_labels.csv", "root": "./标准分类"}   # test_classifier.py 的期望分类，以非标准文档为主
+    ],
+    "positive_labels": ["标准", "国标", "行标", "团标", "企业标准"],   # 视为标准文档的标签
+    "variants": {
+        "baseline": {},
+        "pages-2": {"max_pages_to_extract": 2},
+        "pages-1": {"max_pages_to_extract": 1},
+        "no-metadata": {"metadata_fast_path": False},
+        "text-model": {"backend": "text"}
+    }
+}
+
+# 文本缓存配置（修改关键词后可用 --rescore 直接从缓存重新评分）
+CACHE_CONFIG = {
+    "enabled": True,
+    "text_cache_dir": "./cache/text",
+    "compress_level": 6
+}
+
+# OCR插件配置：engine 为 "模块名:函数名"，函数签名 engine(pdf_path, max_pages) -> 逐页文本列表；
+# 为 None 时扫描件只记录到 scanned_files.json，不参与预测
+OCR_CONFIG = {
+    "engine": None,
+    "max_pages": 2
+}
+
+# 结果索引：预测结果同时写入输出目录中的SQLite数据库，可用 python result_index.py 查询
+INDEX_CONFIG = {
+    "enabled": True,
+    "db_file": "prediction_index.db"
+}
+
+# 扫描配置：exclude_dirs 按目录名匹配，include_globs 按文件名匹配，exclude_globs 按文件名或相对路径匹配
+# （均为通配符，不区分大小写）；输出目录始终自动排除
+SCAN_CONFIG = {
+    "exclude_dirs": [
+        "$RECYCLE.BIN", "RECYCLER", "System Volume Information", ".Trash-*",
+        ".git", ".svn", ".hg", "node_modules", "__pycache__", ".venv"
+    ],
+    "include_globs": ["*.pdf"],
+    "exclude_globs": [],
+    "max_depth": None,                               # 最大目录深度（目标目录为0），None 为不限制
+    "listing_cache_file": "./cache/dir_listing.json.gz",  # 目录列表缓存，None 为不使用
+    "order": "walk"                                  # 处理顺序：walk/inode/extent（机械硬盘上用 inode 或 extent）
+}
+
+# 压缩包扫描：匹配 globs 的ZIP压缩包中的PDF成员也参与预测，路径写作 "压缩包.zip!/成员.pdf"（命令行 --no-archives 关闭）；
+# 成员直接从压缩包读入内存，解压后超过 max_member_memory 的成员解压到 spill_dir（None 为系统临时目录）的临时文件
+ARCHIVE_CONFIG = {
+    "enabled": True,
+    "globs": ["*.zip"],
+    "max_member_memory": 32 * 1024 * 1024,
+    "spill_dir": None
+}
+
+# 目录优先级：每次运行后记录各目录的文件数和标准文档数，下次按估计命中率从高到低处理（命令行 --prioritize）；
+# 指定时间预算（命令行 --time-budget）时自动按优先级处理，到时停止提交新文件，保存已得到的结果并估计覆盖率
+PRIORITY_CONFIG = {
+    "enabled": False,
+    "stats_file": "./cache/dir_hit_rates.json",   # 各目录的命中记录，None 为不记录
+    "prior_weight": 5.0,                    # 逐级收缩时上级目录命中率的权重（相当于的文件数）
+    "default_rate": 0.05,                   # 没有任何记录时的命中率
+    "filename_boost": 0.5,                  # 文件名像标准编号时，把估计概率向1提高的比例
+    "time_budget": None                     # 预测阶段的时间预算（秒），None 为不限制
+}
+
+# 并行预测配置（workers 为 1 时在主进程中顺序处理）
+PARALLEL_CONFIG = {
+    "workers": 1,
+    "size_aware": True,                     # 按估算开销从大到小调度；关闭时按扫描顺序逐个提交
+    "file_overhead_bytes": 64 * 1024,       # 每个文件打开/解析的固定开销，折算为字节
+    "small_file_bytes": 512 * 1024,         # 估算开销低于该值的文件打包成批次提交
+    "batch_max_files": 32,
+    "batch_max_bytes": 4 * 1024 * 1024,
+    "copy_threads": 1,                      # 复制标准文档的线程数
+    # 多个目标目录时按所在设备分别排队：{路径: 同时在途的任务数}，路径为该设备上的任意目录（如网络共享的挂载点）；
+    # 未配置的设备平分其余进程，某个设备的文件全部提交后其份额分给其他设备
+    "device_limits": {}
+}
+
+# 自适应并发：--workers auto / --copy-threads auto 时按吞吐量、CPU利用率和I/O等待调整并发数
+AUTOTUNE_CONFIG = {
+    "interval": 5.0,                        # 每个测量窗口的最短秒数
+    "min_window_files": 8,                  # 每个测量窗口至少完成的文件数
+    "max_workers": None,                    # 预测进程数上限，None 为CPU核数的2倍
+    "max_copy_threads": 16,                 # 复制线程数上限
+    "cpu_high": 0.9,                        # CPU利用率达到该值视为饱和，不再增加并发
+    "iowait_high": 0.3,                     # I/O等待占比达到该值时减少并发
+    "tolerance": 0.05                       # 调整后吞吐量下降超过该比例时撤销调整
+}
+
+# 预读配置：处理文件时由I/O线程提前把后续文件读入内存（源为U盘、移动硬盘或网络共享时效果明显）
+PREFETCH_CONFIG = {
+    "enabled": True,
+    "depth": 8,                             # 同时在途的预读文件数
+    "max_bytes": 128 * 1024 * 1024,         # 已读入内存（含正在解析）的字节数上限
+    "max_file_bytes": 32 * 1024 * 1024,     # 超过该大小的文件不读入内存，只提示系统预读
+    "threads": 4
+}
+
+# I/O限速（命令行 --limit-read/--limit-opens/--limit-copy）：在生产文件服务器上运行时限制读取源文件的字节数、
+# 打开源文件的次数和输出标准文档写入的字节数（每秒，None 为不限制），所有预测进程和复制线程共用同一组令牌桶
+THROTTLE_CONFIG = {
+    "read_bytes_per_second": None,
+    "opens_per_second": None,
+    "copy_bytes_per_second": None,
+    "burst_seconds": 1.0,                   # 空闲后最多可一次性使用的额度（秒）
+    "chunk_bytes": 1024 * 1024              # 限速时分块读取/复制的块大小
+}
+
+# 标准文档的输出方式（命令行 --output-mode）：copy 复制，hardlink 硬链接，reflink 克隆（btrfs/XFS 等共享数据块），
+# symlink 符号链接，manifest 只写清单；不支持时（如跨文件系统）自动退回复制
+OUTPUT_CONFIG = {
+    "mode": "copy",
+    "manifest_file": "output_manifest.jsonl"   # 输出目录中的清单：每个文件的源路径、输出路径、方法和写入字节数
+}
+
+# 近似重复检测：由提取的文本计算 MinHash 签名，LSH 分桶后按估计相似度分组；
+# copy_representative_only 为 True 时每组只复制一个代表文件（命令行 --dedup）
+DEDUP_CONFIG = {
+    "enabled": True,
+    "copy_representative_only": False,
+    "num_perm": 64,                         # 签名长度
+    "bands": 16,                            # LSH 分段数（每段 num_perm/bands 个值）
+    "shingle_size": 5,                      # 字符 n-gram 长度（去掉空白后）
+    "threshold": 0.8,                       # 估计相似度达到该值才算重复
+    "draft_markers": ["征求意见稿", "送审稿", "报批稿"]   # 选代表文件时排在正式版之后
+}
+
+# 日志配置：逐个文件的结果为 DEBUG 级别（默认不输出，命令行 --verbose 开启）；
+# json_file 为 JSON Lines 日志路径（命令行 --log-json），None 为不写
+LOG_CONFIG = {
+    "level": "INFO",
+    "json_file": None,
+    "json_level": "INFO",               # 设为 DEBUG 时JSON日志包含每个文件的结果
+    "progress_interval": 10.0           # 进度汇总的最小间隔（秒）
+}
+
 # 文件处理配置
 FILE_CONFIG = {
     "supported_extensions": [".pdf"],
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+pytest 配置：test_system.py 中的测试沿用脚本风格，检查失败时打印原因并返回 False。
+pytest 默认只对返回值给出警告，这里把返回 False 的测试判为失败，与 python test_system.py 的结果一致。
+"""
+
+import pytest
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_pyfunc_call(pyfuncitem):
+    test_func = pyfuncitem.obj
+
+    def checked(*args, **kwargs):
+        if test_func(*args, **kwargs) is False:
+            pytest.fail(f"{pyfuncitem.name} 返回 False（失败原因见上方输出）", pytrace=False)
+
+    pyfuncitem.obj = checked
+    try:
+        yield
+    finally:
+        pyfuncitem.obj = test_func
@@ -0,0 +1,147 @@
+import os
+import re
+import zlib
+import numpy as np
+from typing import Dict, List, Any, Optional, Sequence
+from config import DEDUP_CONFIG
+from scheduler import file_size
+
+# MinHash 使用的梅森素数和32位掩码
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# 同一LSH桶中两两比较的成员数上限，超过时只与桶内第一个成员比较
+_MAX_PAIRWISE_BUCKET = 50
+
+
+class MinHasher:
+    """基于字符 n-gram 的 MinHash 签名（固定随机种子，不同进程计算的签名可直接比较）"""
+
+    def __init__(self, num_perm: int = None, shingle_size: int = None, seed: int = 1):
+        self.num_perm = num_perm or DEDUP_CONFIG["num_perm"]
+        self.shingle_size = shingle_size or DEDUP_CONFIG["shingle_size"]
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(_MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, int(_MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """计算文本的签名；去掉空白后不足一个 n-gram 时返回 None"""
+        normalized = re.sub(r'\s+', '', text).lower()
+        k = self.shingle_size
+        if len(normalized) < k:
+            return None
+
+        shingles = {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+
+        # 按块计算，避免长文本时 (num_perm, n) 矩阵过大
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), 8192):
+            chunk = hashes[start:start + 8192]
+            permuted = (np.outer(self._a, chunk) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+            signature = np.minimum(signature, permuted.min(axis=1))
+        return signature.tolist()
+
+
+def estimate_similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """由签名估计两段文本 n-gram 集合的 Jaccard 相似度"""
+    return float(np.mean(np.asarray(sig_a) == np.asarray(sig_b)))
+
+
+def find_duplicate_groups(signatures: Dict[str, Sequence[int]], bands: int = None,
+                          threshold: float = None) -> List[List[str]]:
+    """用 LSH 分桶找出近似重复的文件组（只返回至少两个成员的组）
+
+    签名按 bands 段分桶，任一段完全相同的文件成为候选，再用签名估计的相似度确认，
+    总体耗时与文件数大致成线性关系。
+    """
+    bands = bands or DEDUP_CONFIG["bands"]
+    threshold = DEDUP_CONFIG["threshold"] if threshold is None else threshold
+
+    keys = sorted(signatures)
+    matrix = np.asarray([signatures[key] for key in keys], dtype=np.uint64)
+    if len(keys) < 2:
+        return []
+    rows = matrix.shape[1] // bands
+
+    parent = list(range(len(keys)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    for band in range(bands):
+        segment = np.ascontiguousarray(matrix[:, band * rows:(band + 1) * rows])
+        _, bucket_ids, counts = np.unique(segment.view(np.dtype((np.void, segment.dtype.itemsize * rows))),
+                                          return_inverse=True, return_counts=True)
+        bucket_ids = bucket_ids.ravel()
+        # 只处理有两个以上成员的桶
+        shared = np.flatnonzero(counts[bucket_ids] > 1)
+        buckets = {}
+        for i in shared.tolist():
+            buckets.setdefault(bucket_ids[i], []).append(i)
+
+        for members in buckets.values():
+            anchors = members if len(members) <= _MAX_PAIRWISE_BUCKET else members[:1]
+            for x, i in enumerate(anchors):
+                for j in members[x + 1:]:
+                    if find(i) != find(j) and np.mean(matrix[i] == matrix[j]) >= threshold:
+                        union(i, j)
+
+    groups = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(find(i), []).append(key)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def result_signature(result: Dict[str, Any]) -> Optional[List[int]]:
+    """预测结果中的签名（完整结果在 features 中，简化结果在顶层）"""
+    return result.get("minhash") or result.get("features", {}).get("minhash")
+
+
+def _representative_rank(result: Dict[str, Any]):
+    """代表文件的优先级：非征求意见稿 > 年份新 > 置信度高 > 路径短"""
+    filename = result.get("filename") or os.path.basename(result["file_path"])
+    is_draft = any(marker in filename for marker in DEDUP_CONFIG["draft_markers"])
+    year = result.get("year") or result.get("features", {}).get("filename_features", {}).get("year") or ""
+    return (is_draft, _negated(year), -result.get("confidence", 0.0), len(result["file_path"]), result["file_path"])
+
+
+def _negated(text: str) -> str:
+    """字符串降序排序用"""
+    return "".join(chr(0x10FFFF - ord(c)) for c in text)
+
+
+def group_results(results: List[Dict[str, Any]], file_sizes: Dict[str, int] = None) -> List[Dict[str, Any]]:
+    """对带 minhash 签名的结果分组，每组选出一个代表文件，返回重复组报告（按可节省的字节数排序）"""
+    by_path = {r["file_path"]: r for r in results if result_signature(r)}
+    groups = find_duplicate_groups({path: result_signature(r) for path, r in by_path.items()})
+    file_sizes = file_sizes or {}
+
+    report = []
+    for members in groups:
+        ranked = sorted((by_path[path] for path in members), key=_representative_rank)
+        representative = ranked[0]
+        duplicates = []
+        for result in ranked[1:]:
+            duplicates.append({
+                "file_path": result["file_path"],
+                "similarity": estimate_similarity(result_signature(representative), result_signature(result)),
+                "size": file_size(result["file_path"], file_sizes)
+            })
+        report.append({
+            "representative": representative["file_path"],
+            "duplicates": duplicates,
+            "bytes_saved": sum(d["size"] for d in duplicates)
+        })
+
+    report.sort(key=lambda g: g["bytes_saved"], reverse=True)
+    return report
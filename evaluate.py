@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF标准文档识别系统 - 准确率与吞吐量评估
+在带标签的语料上运行多个流水线变体（页数预算、模型类型、元数据快速通道等），
+比较每个变体的精确率、召回率和处理速度；各变体共用文本缓存，不重复解析PDF
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import MODEL_DIR, MODEL_CONFIG, CACHE_CONFIG, EVALUATION_CONFIG
+from text_cache import TextCache
+from predictor import StandardPredictor
+
+
+def load_labels(labels_path: str, root_dir: str = None) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """读取标签文件（每行 文件,标签；可有表头），返回 ([(文件路径, 标签), ...], 找不到的文件)
+
+    文件按相对 root_dir（默认为标签文件所在目录）的路径查找；不存在时在 root_dir 下按文件名查找。
+    """
+    if root_dir is None:
+        root_dir = os.path.dirname(os.path.abspath(labels_path))
+    with open(labels_path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = [row for row in csv.reader(f) if len(row) >= 2 and row[0].strip()]
+    if rows and rows[0][1].strip().lower() in ("label", "标签"):
+        rows = rows[1:]
+
+    by_name = None
+    labelled = []
+    missing = []
+    for row in rows:
+        name, label = row[0].strip(), row[1].strip()
+        path = os.path.join(root_dir, name)
+        if not os.path.exists(path):
+            if by_name is None:
+                by_name = {}
+                for dirpath, _, filenames in os.walk(root_dir):
+                    for filename in filenames:
+                        by_name.setdefault(filename, os.path.join(dirpath, filename))
+            path = by_name.get(os.path.basename(name))
+        if path is None:
+            missing.append(name)
+        else:
+            labelled.append((path, label))
+    return labelled, missing
+
+
+def load_label_sets(label_sets: List[Tuple[str, Optional[str]]]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """读取多个 (标签文件, 文件所在目录)，合并为 ([(文件路径, 标签), ...], 找不到的文件)；同一文件以先出现的标签为准"""
+    labelled = {}
+    missing = []
+    for labels_path, root_dir in label_sets:
+        found, not_found = load_labels(labels_path, root_dir)
+        for path, label in found:
+            labelled.setdefault(path, label)
+        missing.extend(not_found)
+    return list(labelled.items()), missing
+
+
+def parse_variant(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """解析命令行变体：名称 或 名称:键=值,键=值（键为 MODEL_CONFIG 中的项，值按JSON解析，失败时作为字符串）"""
+    name, _, assignments = spec.partition(":")
+    if not assignments:
+        if name not in EVALUATION_CONFIG["variants"]:
+            raise ValueError(f"未知的变体: {name}，可选: {', '.join(EVALUATION_CONFIG['variants'])}")
+        return name, EVALUATION_CONFIG["variants"][name]
+    overrides = {}
+    for assignment in assignments.split(","):
+        key, _, value = assignment.partition("=")
+        if key not in MODEL_CONFIG or not value:
+            raise ValueError(f"变体设置应为 MODEL_CONFIG 中的 键=值，实际为: {assignment}")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return name, overrides
+
+
+@contextmanager
+def model_settings(overrides: Dict[str, Any]):
+    """临时修改 MODEL_CONFIG，退出时恢复"""
+    saved = {key: MODEL_CONFIG[key] for key in overrides}
+    MODEL_CONFIG.update(overrides)
+    try:
+        yield
+    finally:
+        MODEL_CONFIG.update(saved)
+
+
+def score(results: List[Dict[str, Any]], labels: Dict[str, str]) -> Dict[str, Any]:
+    """按标签计算混淆矩阵、精确率、召回率和F1（扫描件和出错的文件按判定为非标准计）
+
+    没有非标准文件时误判数恒为0，精确率没有意义：precision、f1 和 accuracy 为None。
+    """
+    positive = set(EVALUATION_CONFIG["positive_labels"])
+    counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    for result in results:
+        expected = labels[result["file_path"]] in positive
+        predicted = bool(result.get("is_standard"))
+        counts[("t" if expected == predicted else "f") + ("p" if predicted else "n")] += 1
+    tp, fp, fn = counts["tp"], counts["fp"], counts["fn"]
+    negatives = counts["fp"] + counts["tn"]
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    if not negatives:
+        return dict(counts, negatives=0, precision=None, recall=recall, f1=None, accuracy=None)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    return dict(counts,
+                negatives=negatives,
+                precision=precision,
+                recall=recall,
+                f1=2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+                accuracy=(tp + counts["tn"]) / len(results))
+
+
+def evaluate_variant(name: str, overrides: Dict[str, Any], labelled: List[Tuple[str, str]],
+                     text_cache: Optional[TextCache], model_dir: str = MODEL_DIR) -> Dict[str, Any]:
+    """在主进程中顺序运行一个变体，返回准确率、吞吐量和文本缓存命中情况"""
+    labels = dict(labelled)
+    paths = [path for path, _ in labelled]
+    with model_settings(overrides):
+        predictor = StandardPredictor(model_dir, text_cache)
+        predictor.load_model()
+        hits, misses = (text_cache.hits, text_cache.misses) if text_cache is not None else (0, 0)
+        start = time.perf_counter()
+        results = list(predictor.iter_predict_paths(paths))
+        elapsed = time.perf_counter() - start
+
+    report = {"variant": name, "settings": overrides, "files": len(results), "seconds": elapsed,
+              "files_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+              "scanned": sum(1 for r in results if r.get("scanned")),
+              "errors": sum(1 for r in results if "error" in r),
+              "metadata_decided": sum(1 for r in results if r.get("features", {}).get("decided_by") == "metadata")}
+    if text_cache is not None:
+        report["cache_hits"] = text_cache.hits - hits
+        report["cache_misses"] = text_cache.misses - misses
+    report.update(score(results, labels))
+    return report
+
+
+def evaluate(variants: List[Tuple[str, Dict[str, Any]]], labelled: List[Tuple[str, str]],
+             text_cache: Optional[TextCache], model_dir: str = MODEL_DIR) -> List[Dict[str, Any]]:
+    """依次评估各变体（页数预算大的先运行，之后页数少的变体直接使用缓存中的文本），按给定顺序返回报告"""
+    order = sorted(range(len(variants)),
+                   key=lambda i: -variants[i][1].get("max_pages_to_extract", MODEL_CONFIG["max_pages_to_extract"]))
+    reports = [None] * len(variants)
+    for i in order:
+        name, overrides = variants[i]
+        try:
+            reports[i] = evaluate_variant(name, overrides, labelled, text_cache, model_dir)
+        except Exception as e:
+            reports[i] = {"variant": name, "settings": overrides, "failed": str(e)}
+    return reports
+
+
+def format_report(reports: List[Dict[str, Any]]) -> str:
+    """对照表：每个变体一行"""
+    lines = [f"{'变体':<16}{'精确率':>8}{'召回率':>8}{'F1':>8}{'文件/秒':>10}{'缓存命中':>10}{'元数据判定':>10}"]
+    for report in reports:
+        if "failed" in report:
+            lines.append(f"{report['variant']:<18}失败: {report['failed']}")
+            continue
+        hits = f"{report['cache_hits']}/{report['files']}" if "cache_hits" in report else "-"
+        precision, f1 = (f"{report[key]:.3f}" if report[key] is not None else "-" for key in ("precision", "f1"))
+        lines.append(f"{report['variant']:<18}{precision:>10}{report['recall']:>10.3f}"
+                     f"{f1:>8}{report['files_per_second']:>12.1f}{hits:>12}"
+                     f"{report['metadata_decided']:>12}")
+    return "\n".join(lines)
+
+
+def main():
+    """评估命令行"""
+    parser = argparse.ArgumentParser(description="PDF标准文档识别系统 - 准确率与吞吐量评估")
+    parser.add_argument("--labels", action="append", default=None, metavar="FILE",
+                        help="标签文件（每行 文件,标签，可多次指定）(默认: EVALUATION_CONFIG 中的 "
+                             f"{', '.join(s['labels'] for s in EVALUATION_CONFIG['label_sets'])})")
+    parser.add_argument("--root", default=None,
+                        help="语料目录，--labels 中的文件按相对路径或文件名在其中查找 (默认: 标签文件所在目录)")
+    parser.add_argument("--variant", action="append", default=None, metavar="名称[:键=值,...]",
+                        help=f"评估的变体，可多次指定 (默认: {', '.join(EVALUATION_CONFIG['variants'])})；"
+                             "可临时定义，如 pages-1:max_pages_to_extract=1 或 text:backend=text")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="模型目录 (默认: %(default)s)")
+    parser.add_argument("--no-text-cache", action="store_true",
+                        help="不使用文本缓存（每个变体都重新解析PDF，测量冷启动速度）")
+    parser.add_argument("--output", default=None, metavar="FILE", help="同时把报告写入JSON文件")
+    args = parser.parse_args()
+
+    try:
+        variants = [parse_variant(spec) for spec in (args.variant or EVALUATION_CONFIG["variants"])]
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.labels:
+        label_sets = [(labels_path, args.root) for labels_path in args.labels]
+    else:
+        label_sets = [(s["labels"], s["root"]) for s in EVALUATION_CONFIG["label_sets"]]
+    labelled, missing = load_label_sets(label_sets)
+    if missing:
+        print(f"警告: {len(missing)} 个文件在语料目录中找不到，不参与评估")
+    if not labelled:
+        print("错误: 没有可评估的文件")
+        sys.exit(1)
+    positives = sum(1 for _, label in labelled if label in EVALUATION_CONFIG["positive_labels"])
+    print(f"评估 {len(labelled)} 个文件（标准 {positives} 个）, {len(variants)} 个变体")
+    if positives == len(labelled):
+        print("警告: 没有非标准文件，无法评估误判，精确率和F1不报告")
+
+    text_cache = None
+    if not args.no_text_cache:
+        text_cache = TextCache(CACHE_CONFIG["text_cache_dir"], CACHE_CONFIG["compress_level"])
+    reports = evaluate(variants, labelled, text_cache, args.model_dir)
+
+    print(format_report(reports))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
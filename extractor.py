@@ -1,16 +1,58 @@
 import os
 import re
 import json
+import html
+import importlib
 import pdfplumber
-from typing import Dict, List, Tuple, Any
-from config import STANDARD_TYPES, EV_KEYWORDS, STANDARD_KEYWORDS, EXCLUDE_KEYWORDS, MODEL_CONFIG
+from itertools import islice
+from pdfplumber.page import Page
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1, PDFStream
+from pdfminer.utils import decode_text
+from typing import Dict, List, Tuple, Any, Optional, Iterator, Callable
+from config import STANDARD_TYPES, EV_KEYWORDS, STANDARD_KEYWORDS, EXCLUDE_KEYWORDS, MODEL_CONFIG, OCR_CONFIG, DEDUP_CONFIG, CATALOG_CONFIG
+from feature_store import FeatureStore
+from text_cache import TextCache
+from dedup import MinHasher
+from prefetch import IOStats, open_source
+from archive import materialize
+from catalog import parse_code
+from utils import get_logger, ProgressReporter
+
+logger = get_logger("extractor")
+
+_YEAR_PATTERN = re.compile(r'20\d{2}')
+_STD_CODE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'GB/T\s*(\d+[-\d]*)',
+    r'GB\s*(\d+[-\d]*)',
+    r'DB\d+[-\s]*(\d+[-\d]*)',
+    r'NB/T\s*(\d+[-\d]*)',
+    r'T/[A-Z]+\s*(\d+[-\d]*)',
+    r'Q/GDW\s*(\d+[-\d]*)'
+)]
+
+def load_ocr_engine(spec: str) -> Callable[[str, int], List[str]]:
+    """按 "模块名:函数名" 加载OCR插件，函数签名为 engine(pdf_path, max_pages) -> 逐页文本列表"""
+    module_name, _, func_name = spec.partition(":")
+    if not module_name or not func_name:
+        raise ValueError(f"OCR引擎配置格式应为 模块名:函数名，实际为: {spec}")
+    return getattr(importlib.import_module(module_name), func_name)
 
 class StandardFeatureExtractor:
     """标准文档特征提取器"""
     
-    def __init__(self):
+    def __init__(self, text_cache: Optional[TextCache] = None, use_metadata: bool = None):
         self.features = []
         self.standard_patterns = self._build_standard_patterns()
+        self.text_cache = text_cache
+        self.use_metadata = MODEL_CONFIG["metadata_fast_path"] if use_metadata is None else use_metadata
+        self.detect_scanned = MODEL_CONFIG["scan_detection"]
+        self.ocr_engine_spec = OCR_CONFIG["engine"]
+        self._ocr_engine = None
+        self.minhasher = MinHasher() if DEDUP_CONFIG["enabled"] else None
+        self.io_stats = IOStats()
+        # 是否在特征中保留正文 text（哈希文本模型预测时需要，不写入特征文件）
+        self.keep_text = False
     
     def _build_standard_patterns(self) -> Dict[str, List[str]]:
         """构建标准模式匹配规则"""
@@ -32,32 +74,19 @@ class StandardFeatureExtractor:
         
         # 检测标准类型
         for std_type, patterns in self.standard_patterns.items():
-            for pattern in patterns:
-                if pattern in filename:
-                    features["standard_type"] = std_type
-                    break
-            if features["standard_type"]:
+            if any(pattern in filename for pattern in patterns):
+                features["standard_type"] = std_type
                 break
         
-        # 提取标准编号
-        std_code_patterns = [
-            r'GB/T\s*(\d+[-\d]*)',
-            r'GB\s*(\d+[-\d]*)',
-            r'DB\d+[-\s]*(\d+[-\d]*)',
-            r'NB/T\s*(\d+[-\d]*)',
-            r'T/[A-Z]+\s*(\d+[-\d]*)',
-            r'Q/GDW\s*(\d+[-\d]*)'
-        ]
-        
-        for pattern in std_code_patterns:
-            match = re.search(pattern, filename)
+        # 提取标准编号（模型输入，保持训练时的规则；规范化的编号见 build_features_from_pages 中的 catalog_code）
+        for pattern in _STD_CODE_PATTERNS:
+            match = pattern.search(filename)
             if match:
                 features["standard_code"] = match.group(1)
                 break
         
         # 提取年份
-        year_pattern = r'20\d{2}'
-        year_match = re.search(year_pattern, filename)
+        year_match = _YEAR_PATTERN.search(filename)
         if year_match:
             features["year"] = year_match.group()
         
@@ -110,8 +139,321 @@ class StandardFeatureExtractor:
         
         return features
     
-    def extract_pdf_features(self, pdf_path: str) -> Dict[str, Any]:
-        """从PDF文件提取完整特征"""
+    @staticmethod
+    def extraction_settings() -> Dict[str, Any]:
+        """影响提取文本结果的设置，作为文本缓存键的一部分"""
+        return {
+            "backend": "pdfplumber",
+            "backend_version": pdfplumber.__version__
+        }
+    
+    @staticmethod
+    def page_count(pdf) -> Optional[int]:
+        """从页面树根节点的 /Count 读取页数，不构建页面对象"""
+        try:
+            count = resolve1(resolve1(pdf.doc.catalog["Pages"]).get("Count"))
+            return int(count) if count is not None else None
+        except Exception:
+            return None
+    
+    @staticmethod
+    def close_pdf(pdf, pages_built: bool):
+        """释放PDF的解析缓存（文件流由调用方关闭）
+        
+        构建过页面列表时用 pdf.close() 逐页释放；大文档模式的页面已在提取后逐个 page.close()，
+        只需 flush_cache()，不为关闭而访问 pdf.pages 构建整个文档的页面列表。
+        """
+        if pages_built:
+            pdf.close()
+        else:
+            pdf.flush_cache()
+    
+    @staticmethod
+    def iter_pages(pdf, max_pages: int) -> Iterator[Page]:
+        """惰性遍历前 max_pages 页（不访问 pdf.pages，避免为整个文档构建页面对象）"""
+        doctop = 0
+        for i, page_obj in enumerate(islice(PDFPage.create_pages(pdf.doc), max_pages)):
+            page = Page(pdf, page_obj, page_number=i + 1, initial_doctop=doctop)
+            doctop += page.height
+            yield page
+    
+    @classmethod
+    def _scan_resources(cls, resources, depth: int = 0) -> Tuple[bool, bool]:
+        """检查页面资源，返回 (是否有图像XObject, 是否有字体)，向下查找两层表单XObject"""
+        if not isinstance(resources, dict):
+            return False, False
+        has_image = False
+        has_font = bool(resolve1(resources.get("Font")))
+        
+        xobjects = resolve1(resources.get("XObject"))
+        if isinstance(xobjects, dict):
+            for xobj in xobjects.values():
+                xobj = resolve1(xobj)
+                if not isinstance(xobj, PDFStream):
+                    continue
+                subtype = getattr(resolve1(xobj.get("Subtype")), "name", None)
+                if subtype == "Image":
+                    has_image = True
+                elif subtype == "Form" and depth < 2:
+                    form_image, form_font = cls._scan_resources(resolve1(xobj.get("Resources")), depth + 1)
+                    has_image = has_image or form_image
+                    has_font = has_font or form_font
+        return has_image, has_font
+    
+    def is_scanned_page(self, page: Page) -> bool:
+        """判断页面是否为无文本层的扫描页：含图像，且没有字体资源或字符数过少"""
+        has_image, has_font = self._scan_resources(resolve1(page.page_obj.resources))
+        if not has_image:
+            return False
+        if not has_font:
+            # 没有字体资源就不可能有文本层，无需解析内容流
+            return True
+        return len(page.chars) < MODEL_CONFIG["scan_min_chars"]
+    
+    def read_pdf_metadata(self, pdf) -> Dict[str, Any]:
+        """读取文档信息字典、XMP和书签标题（不解析页面内容流）"""
+        metadata = {"title": "", "subject": "", "keywords": "", "xmp": "", "xmp_title": "", "outline": []}
+        
+        info = pdf.metadata or {}
+        for key in ("Title", "Subject", "Keywords"):
+            value = info.get(key)
+            if isinstance(value, str):
+                metadata[key.lower()] = value.strip()
+        
+        try:
+            stream = resolve1(pdf.doc.catalog.get("Metadata"))
+            if stream is not None:
+                data = stream.get_data()
+                metadata["xmp"] = self._parse_xmp(data)
+                metadata["xmp_title"] = self._parse_xmp(data, ("dc:title",), keywords=False)
+        except Exception:
+            pass
+        
+        try:
+            for _, title, *_ in pdf.doc.get_outlines():
+                if isinstance(title, bytes):
+                    title = decode_text(title)
+                if isinstance(title, str) and title.strip():
+                    metadata["outline"].append(title.strip())
+                if len(metadata["outline"]) >= MODEL_CONFIG["max_outline_entries"]:
+                    break
+        except Exception:
+            # 没有书签或书签损坏
+            pass
+        
+        return metadata
+    
+    @staticmethod
+    def _parse_xmp(data: bytes, tags: Tuple[str, ...] = ("dc:title", "dc:subject", "dc:description"),
+                   keywords: bool = True) -> str:
+        """从XMP中取出标题、主题、描述和关键字（tags 指定取哪些 dc 字段，keywords 为是否另取 pdf:Keywords）"""
+        xml = data.decode('utf-8', errors='ignore')
+        values = []
+        for tag in tags:
+            block = re.search(rf'<{tag}[^>]*>(.*?)</{tag}>', xml, re.DOTALL)
+            if block:
+                values.extend(re.findall(r'<rdf:li[^>]*>(.*?)</rdf:li>', block.group(1), re.DOTALL))
+        if keywords:
+            values.extend(re.findall(r'<pdf:Keywords>(.*?)</pdf:Keywords>', xml, re.DOTALL))
+            values.extend(re.findall(r'pdf:Keywords="([^"]*)"', xml))
+        return "\n".join(html.unescape(v).strip() for v in values if v.strip())
+    
+    @staticmethod
+    def metadata_text(metadata: Dict[str, Any]) -> str:
+        """将元数据字段拼接为文本"""
+        fields = [metadata.get("title", ""), metadata.get("subject", ""),
+                  metadata.get("keywords", ""), metadata.get("xmp", "")]
+        fields.extend(metadata.get("outline", []))
+        return "\n".join(field for field in fields if field)
+    
+    @staticmethod
+    def metadata_title_text(metadata: Dict[str, Any]) -> str:
+        """元数据中描述文档本身的字段（标题、主题、XMP dc:title）"""
+        fields = [metadata.get("title", ""), metadata.get("subject", ""), metadata.get("xmp_title", "")]
+        return "\n".join(field for field in fields if field)
+    
+    def extract_metadata_features(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """用文件名特征的同一套规则分析元数据文本；标题、主题或 dc:title 中同时识别出标准类型和编号才视为可直接判定
+        
+        关键字、XMP描述和书签只作为特征：非标准文档的书签和关键字中也常引用标准编号（如 "规范性引用文件 GB/T 27930-2023"）。
+        """
+        features = self.extract_filename_features(self.metadata_title_text(metadata))
+        features["decisive"] = bool(features["standard_type"] and features["standard_code"])
+        if not features["decisive"]:
+            features = self.extract_filename_features(self.metadata_text(metadata))
+            features["decisive"] = False
+        del features["filename"]
+        return features
+    
+    def _cached_document(self, pdf_path: str, max_pages: int, use_metadata: bool,
+                         record_stats: bool = True) -> Optional[Tuple[Optional[Dict[str, Any]], List[str], bool]]:
+        """从文本缓存取 extract_document 的结果；缓存中没有可直接使用的条目时返回None"""
+        if self.text_cache is None:
+            return None
+        
+        def _metadata_decides(entry: Dict[str, Any]) -> bool:
+            metadata = entry.get("metadata")
+            return (use_metadata and metadata is not None
+                    and self.extract_metadata_features(metadata)["decisive"])
+        
+        def _accept(entry: Dict[str, Any]) -> bool:
+            return _metadata_decides(entry) or (self.detect_scanned and entry.get("scanned", False))
+        
+        entry = self.text_cache.get(pdf_path, self.extraction_settings(), min_pages=max_pages,
+                                    accept=_accept, record_stats=record_stats)
+        if entry is not None and (entry.get("metadata") is not None or not use_metadata):
+            if _metadata_decides(entry):
+                return entry["metadata"], [], False
+            if self.detect_scanned and entry.get("scanned", False):
+                return entry.get("metadata"), [], True
+            if not entry.get("scanned", False):
+                return entry.get("metadata"), entry["pages"][:max_pages], False
+        return None
+    
+    def needs_pdf(self, pdf_path: str) -> bool:
+        """提取特征时是否需要读取PDF文件（文本缓存中没有可直接使用的条目；用于决定是否预读）"""
+        return self._cached_document(pdf_path, MODEL_CONFIG["max_pages_to_extract"], self.use_metadata,
+                                     record_stats=False) is None
+    
+    def extract_document(self, pdf_path: str, max_pages: int = None, use_metadata: bool = None,
+                         data: Optional[bytes] = None) -> Tuple[Optional[Dict[str, Any]], List[str], bool]:
+        """提取元数据和前几页文本（优先读取文本缓存），返回 (元数据, 逐页文本, 是否为扫描件)
+        
+        启用元数据快速通道时先读取元数据，能直接判定时不再提取页面文本（返回的页面列表为空）。
+        启用扫描件检测时，前几页都没有文本层的文件不再提取后续页面（返回的页面列表为空）。
+        data 为预读到内存的文件内容，为None时直接读取文件（读取的阻塞时间计入 io_stats）。
+        """
+        if max_pages is None:
+            max_pages = MODEL_CONFIG["max_pages_to_extract"]
+        if use_metadata is None:
+            use_metadata = self.use_metadata
+        
+        settings = self.extraction_settings()
+        
+        cached = self._cached_document(pdf_path, max_pages, use_metadata)
+        if cached is not None:
+            return cached
+        
+        metadata = None
+        pages = []
+        total_pages = None
+        scanned = False
+        pages_built = False
+        source = open_source(pdf_path, data, self.io_stats)
+        try:
+            pdf = pdfplumber.open(source)
+        except Exception:
+            source.close()
+            raise
+        try:
+            if use_metadata:
+                metadata = self.read_pdf_metadata(pdf)
+            
+            if metadata is None or not self.extract_metadata_features(metadata)["decisive"]:
+                total_pages = self.page_count(pdf)
+                lazy = total_pages is not None and total_pages > MODEL_CONFIG["large_document_pages"]
+                if lazy:
+                    # 大文档模式：只惰性解析前几页，每页提取后立即释放缓存
+                    page_iter = self.iter_pages(pdf, max_pages)
+                else:
+                    pages_built = True
+                    total_pages = len(pdf.pages)
+                    page_iter = islice(pdf.pages, max_pages)
+                
+                probe_pages = MODEL_CONFIG["scan_probe_pages"] if self.detect_scanned else 0
+                image_only = 0
+                for i, page in enumerate(page_iter):
+                    if i < probe_pages and self.is_scanned_page(page):
+                        image_only += 1
+                        pages.append("")
+                    else:
+                        pages.append(page.extract_text() or "")
+                    if lazy:
+                        page.close()
+                    if probe_pages and image_only == probe_pages:
+                        # 前几页都没有文本层：不再提取后续页面，交给扫描件队列处理
+                        break
+                
+                scanned = image_only > 0 and image_only == len(pages)
+                if scanned:
+                    pages = []
+        finally:
+            self.close_pdf(pdf, pages_built)
+            source.close()
+        
+        if self.text_cache is not None:
+            try:
+                self.text_cache.put(pdf_path, settings, pages, total_pages, metadata=metadata, scanned=scanned)
+            except OSError as e:
+                logger.warning(f"写入文本缓存失败 {pdf_path}: {e}")
+        
+        return metadata, pages, scanned
+    
+    def extract_pages_text(self, pdf_path: str, max_pages: int = None) -> List[str]:
+        """提取前几页的文本（不使用元数据快速通道）"""
+        _, pages, _ = self.extract_document(pdf_path, max_pages, use_metadata=False)
+        return pages
+    
+    def extract_pdf_features(self, pdf_path: str, data: Optional[bytes] = None) -> Dict[str, Any]:
+        """从PDF文件提取完整特征（data 为预读到内存的文件内容）"""
+        try:
+            metadata, pages, scanned = self.extract_document(pdf_path, data=data)
+            error = None
+        except Exception as e:
+            logger.warning(f"文本提取失败 {pdf_path}: {e}")
+            metadata, pages, scanned, error = None, [], False, str(e)
+        
+        return self.build_features_from_pages(pdf_path, pages, error, metadata, scanned)
+    
+    @property
+    def ocr_available(self) -> bool:
+        """是否配置了OCR插件"""
+        return bool(self.ocr_engine_spec)
+    
+    def extract_ocr_pages(self, pdf_path: str, cache_only: bool = False) -> Optional[List[str]]:
+        """用OCR插件识别扫描件前几页的文本（结果同样写入文本缓存）；cache_only 时缓存未命中返回None"""
+        if not self.ocr_available:
+            raise ValueError("未配置OCR引擎")
+        max_pages = OCR_CONFIG["max_pages"]
+        settings = dict(self.extraction_settings(), ocr_engine=self.ocr_engine_spec)
+        
+        if self.text_cache is not None:
+            entry = self.text_cache.get(pdf_path, settings, min_pages=max_pages)
+            if entry is not None:
+                return entry["pages"][:max_pages]
+        if cache_only:
+            return None
+        
+        if self._ocr_engine is None:
+            self._ocr_engine = load_ocr_engine(self.ocr_engine_spec)
+        # OCR插件需要真实的文件路径：压缩包成员临时解压
+        with materialize(pdf_path) as ocr_path:
+            pages = [page_text or "" for page_text in self._ocr_engine(ocr_path, max_pages)][:max_pages]
+        
+        if self.text_cache is not None:
+            try:
+                self.text_cache.put(pdf_path, settings, pages, len(pages))
+            except OSError as e:
+                logger.warning(f"写入文本缓存失败 {pdf_path}: {e}")
+        
+        return pages
+    
+    def extract_ocr_features(self, pdf_path: str) -> Dict[str, Any]:
+        """对扫描件做OCR后提取完整特征"""
+        try:
+            pages = self.extract_ocr_pages(pdf_path)
+            error = None
+        except Exception as e:
+            logger.warning(f"OCR识别失败 {pdf_path}: {e}")
+            pages, error = [], str(e)
+        
+        features = self.build_features_from_pages(pdf_path, pages, error)
+        features["text_source"] = "ocr"
+        return features
+    
+    def build_features_from_pages(self, pdf_path: str, pages: List[str], error: str = None,
+                                  metadata: Dict[str, Any] = None, scanned: bool = False) -> Dict[str, Any]:
+        """由已提取的元数据和逐页文本构建完整特征（不访问PDF文件）"""
         features = {
             "file_path": pdf_path,
             "filename_features": {},
@@ -124,30 +466,61 @@ class StandardFeatureExtractor:
         filename = os.path.basename(pdf_path)
         features["filename_features"] = self.extract_filename_features(filename)
         
+        # 元数据特征
+        metadata_features = None
+        if self.use_metadata and metadata is not None:
+            metadata_features = self.extract_metadata_features(metadata)
+            features["metadata_features"] = metadata_features
+        
         # 提取内容特征
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                max_pages = min(MODEL_CONFIG["max_pages_to_extract"], len(pdf.pages))
-                
-                for i in range(max_pages):
-                    page = pdf.pages[i]
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\n"
-                
-                if len(text) >= MODEL_CONFIG["min_text_length"]:
-                    features["content_features"] = self.extract_content_features(text)
-                else:
-                    features["content_features"] = {"text_length": len(text)}
-        except Exception as e:
-            print(f"Error extracting text from {pdf_path}: {e}")
-            features["content_features"] = {"error": str(e)}
+        if error is not None:
+            features["content_features"] = {"error": error}
+        elif metadata_features is not None and metadata_features["decisive"]:
+            # 元数据已能判定：用元数据补全文件名中缺失的标准信息，内容特征取自元数据文本
+            features["decided_by"] = "metadata"
+            filename_features = features["filename_features"]
+            for key in ("standard_type", "standard_code", "year"):
+                if not filename_features[key]:
+                    filename_features[key] = metadata_features[key]
+            metadata_text = self.metadata_text(metadata)
+            features["content_features"] = self.extract_content_features(metadata_text)
+            self._add_signature(features, metadata_text)
+        elif scanned:
+            # 扫描件没有文本层，内容特征为空，由预测器转入扫描件队列
+            features["scanned"] = True
+            features["content_features"] = {"text_length": 0}
+        else:
+            text = "".join(page_text + "\n" for page_text in pages)
+            if self.keep_text:
+                features["text"] = text
+            
+            if len(text) >= MODEL_CONFIG["min_text_length"]:
+                features["content_features"] = self.extract_content_features(text)
+                self._add_signature(features, text)
+            else:
+                features["content_features"] = {"text_length": len(text)}
+        
+        # 规范化的标准编号（含类型前缀，已知标准目录和按版本筛选使用）：依次取自文件名、元数据和首页文本
+        code = parse_code(filename)
+        if code is None and metadata_features is not None and metadata_features["decisive"]:
+            code = parse_code(self.metadata_title_text(metadata))
+        if code is None and pages and not scanned:
+            code = parse_code(pages[0][:CATALOG_CONFIG["first_page_chars"]])
+        if code is not None:
+            features["catalog_code"] = str(code)
         
         # 计算是否为标准文档的置信度
         features["is_standard"], features["confidence"] = self._calculate_standard_confidence(features)
         
         return features
     
+    def _add_signature(self, features: Dict[str, Any], text: str):
+        """计算近似重复检测用的 MinHash 签名"""
+        if self.minhasher is not None:
+            signature = self.minhasher.signature(text)
+            if signature is not None:
+                features["minhash"] = signature
+    
     def _calculate_standard_confidence(self, features: Dict[str, Any]) -> Tuple[bool, float]:
         """计算标准文档置信度"""
         confidence = 0.0
@@ -194,33 +567,38 @@ class StandardFeatureExtractor:
         all_features = []
         
         if not os.path.exists(standard_dir):
-            print(f"标准目录不存在: {standard_dir}")
+            logger.error(f"标准目录不存在: {standard_dir}")
             return all_features
         
         pdf_files = [f for f in os.listdir(standard_dir) if f.lower().endswith('.pdf')]
         
-        print(f"开始提取 {len(pdf_files)} 个标准文件的特征...")
+        logger.info(f"开始提取 {len(pdf_files)} 个标准文件的特征...")
         
-        for pdf_file in pdf_files:
-            pdf_path = os.path.join(standard_dir, pdf_file)
-            print(f"正在处理: {pdf_file}")
-            
-            features = self.extract_pdf_features(pdf_path)
-            all_features.append(features)
+        with ProgressReporter(logger, len(pdf_files), "特征提取") as progress:
+            for pdf_file in pdf_files:
+                pdf_path = os.path.join(standard_dir, pdf_file)
+                logger.debug("正在处理: %s", pdf_file)
+                
+                features = self.extract_pdf_features(pdf_path)
+                all_features.append(features)
+                progress.update()
         
         return all_features
     
     def save_features(self, features: List[Dict[str, Any]], output_path: str):
-        """保存特征到JSON文件"""
+        """保存特征（.npz 为列式特征存储，其余按JSON保存）"""
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(features, f, ensure_ascii=False, indent=2)
+        if output_path.endswith(".npz"):
+            FeatureStore(output_path).save(features)
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(features, f, ensure_ascii=False, indent=2)
         
-        print(f"特征已保存到: {output_path}")
-        print(f"总共提取了 {len(features)} 个文件的特征")
+        logger.info(f"特征已保存到: {output_path}")
+        logger.info(f"总共提取了 {len(features)} 个文件的特征")
         
         # 统计标准文档数量
         standard_count = sum(1 for f in features if f["is_standard"])
-        print(f"其中标准文档: {standard_count} 个")
-        print(f"非标准文档: {len(features) - standard_count} 个")
+        logger.info(f"其中标准文档: {standard_count} 个")
+        logger.info(f"非标准文档: {len(features) - standard_count} 个")
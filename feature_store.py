@@ -0,0 +1,244 @@
+import os
+import json
+import gzip
+import numpy as np
+from typing import Dict, List, Any, Optional, Sequence
+
+# 内容特征状态
+CONTENT_FULL = 0    # 完整内容特征
+CONTENT_SHORT = 1   # 文本过短，仅有长度
+CONTENT_ERROR = 2   # 提取失败
+
+# 数值列：按列连续存放在一个 (列数, 行数) 的 float64 矩阵中
+NUMERIC_COLUMNS = [
+    "text_length", "standard_keywords_count", "ev_keywords_count", "exclude_keywords_count",
+    "standard_sections_count", "ev_sections_count", "content_status",
+    "is_standard", "confidence", "ev_related", "standard_related"
+]
+
+# 字符串列：UTF-8 编码后拼接为一个字节块，按偏移量切分（None 以空字符串保存）
+STRING_COLUMNS = [
+    "file_path", "filename", "standard_type", "standard_code", "year", "error", "extra"
+]
+
+# 特征记录中由存储格式直接表示的顶层字段，其余字段压缩进 extra 列
+_KNOWN_KEYS = {"file_path", "filename_features", "content_features", "is_standard", "confidence"}
+
+SECTIONS_SUFFIX = ".sections.json.gz"
+
+
+def sections_path_for(store_path: str) -> str:
+    """根据数值文件路径得到段落旁路文件路径"""
+    base, _ = os.path.splitext(store_path)
+    return base + SECTIONS_SUFFIX
+
+
+class _SectionsSidecar:
+    """段落文本旁路文件，首次访问时才解压加载"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._rows = None
+
+    def get(self, index: int, key: int) -> List[Dict[str, Any]]:
+        if self._rows is None:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                self._rows = json.load(f)
+        return self._rows[index][key]
+
+
+class LazySections(Sequence):
+    """延迟加载的段落列表，长度直接取自数值列，无需读取旁路文件"""
+
+    def __init__(self, sidecar: _SectionsSidecar, index: int, key: int, length: int):
+        self._sidecar = sidecar
+        self._index = index
+        self._key = key
+        self._length = length
+        self._items = None
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if self._items is None:
+            self._items = self._sidecar.get(self._index, self._key)
+        return self._items
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i):
+        return self._load()[i]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __repr__(self) -> str:
+        return f"LazySections(len={self._length})"
+
+
+class FeatureStore:
+    """列式特征存储：数值特征保存为紧凑的 .npz 数组文件，段落文本保存为 gzip 压缩的旁路文件"""
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self.sections_path = sections_path_for(store_path)
+
+    def save(self, features: List[Dict[str, Any]]):
+        """保存特征列表"""
+        directory = os.path.dirname(self.store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        columns = {name: [] for name in NUMERIC_COLUMNS + STRING_COLUMNS}
+        sections = []
+
+        for feature in features:
+            filename_features = feature.get("filename_features", {})
+            content_features = feature.get("content_features", {})
+
+            if "error" in content_features:
+                status = CONTENT_ERROR
+            elif "standard_keywords_count" in content_features:
+                status = CONTENT_FULL
+            else:
+                status = CONTENT_SHORT
+
+            standard_sections = content_features.get("standard_sections", [])
+            ev_sections = content_features.get("ev_sections", [])
+
+            columns["text_length"].append(content_features.get("text_length", 0))
+            columns["standard_keywords_count"].append(content_features.get("standard_keywords_count", 0))
+            columns["ev_keywords_count"].append(content_features.get("ev_keywords_count", 0))
+            columns["exclude_keywords_count"].append(content_features.get("exclude_keywords_count", 0))
+            columns["standard_sections_count"].append(len(standard_sections))
+            columns["ev_sections_count"].append(len(ev_sections))
+            columns["content_status"].append(status)
+            columns["is_standard"].append(bool(feature.get("is_standard", False)))
+            columns["confidence"].append(float(feature.get("confidence", 0.0)))
+            columns["ev_related"].append(bool(filename_features.get("ev_related", False)))
+            columns["standard_related"].append(bool(filename_features.get("standard_related", False)))
+
+            columns["file_path"].append(feature.get("file_path") or "")
+            columns["filename"].append(filename_features.get("filename") or "")
+            columns["standard_type"].append(filename_features.get("standard_type") or "")
+            columns["standard_code"].append(filename_features.get("standard_code") or "")
+            columns["year"].append(filename_features.get("year") or "")
+            columns["error"].append(content_features.get("error", ""))
+
+            extra = {k: v for k, v in feature.items() if k not in _KNOWN_KEYS}
+            columns["extra"].append(json.dumps(extra, ensure_ascii=False, separators=(',', ':')) if extra else "")
+
+            sections.append([list(standard_sections), list(ev_sections)])
+
+        numeric = np.array([columns[name] for name in NUMERIC_COLUMNS], dtype=np.float64)
+        numeric = numeric.reshape(len(NUMERIC_COLUMNS), len(features))
+
+        encoded = []
+        offsets = np.zeros((len(STRING_COLUMNS), len(features) + 1), dtype=np.int64)
+        position = 0
+        for col, name in enumerate(STRING_COLUMNS):
+            for row, value in enumerate(columns[name]):
+                data = value.encode('utf-8')
+                encoded.append(data)
+                position += len(data)
+                offsets[col, row + 1] = position
+            if col + 1 < len(STRING_COLUMNS):
+                offsets[col + 1, 0] = position
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        with open(self.store_path, 'wb') as f:
+            np.savez(f, numeric=numeric, string_offsets=offsets, string_blob=blob,
+                     numeric_columns=np.array(NUMERIC_COLUMNS), string_columns=np.array(STRING_COLUMNS))
+
+        with gzip.open(self.sections_path, 'wt', encoding='utf-8') as f:
+            json.dump(sections, f, ensure_ascii=False, separators=(',', ':'))
+
+    def load_columns(self) -> Dict[str, Any]:
+        """只加载数值列和字符串列（均为按行的列表），不读取段落文本"""
+        if not os.path.exists(self.store_path):
+            raise FileNotFoundError(f"特征文件不存在: {self.store_path}")
+
+        with np.load(self.store_path, allow_pickle=False) as data:
+            numeric = data["numeric"]
+            offsets = data["string_offsets"]
+            blob = data["string_blob"].tobytes()
+            numeric_columns = [str(name) for name in data["numeric_columns"]]
+            string_columns = [str(name) for name in data["string_columns"]]
+
+        columns = {name: numeric[i].tolist() for i, name in enumerate(numeric_columns)}
+        for col, name in enumerate(string_columns):
+            bounds = offsets[col].tolist()
+            columns[name] = [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+        return columns
+
+    def load(self) -> List[Dict[str, Any]]:
+        """加载为与 JSON 格式相同结构的特征列表，段落文本按需加载"""
+        columns = self.load_columns()
+        sidecar = _SectionsSidecar(self.sections_path)
+
+        def _opt(name: str, i: int) -> Optional[str]:
+            return columns[name][i] or None
+
+        features = []
+        for i in range(len(columns["file_path"])):
+            status = int(columns["content_status"][i])
+            if status == CONTENT_ERROR:
+                content_features = {"error": columns["error"][i]}
+            elif status == CONTENT_SHORT:
+                content_features = {"text_length": int(columns["text_length"][i])}
+            else:
+                content_features = {
+                    "text_length": int(columns["text_length"][i]),
+                    "standard_keywords_count": int(columns["standard_keywords_count"][i]),
+                    "ev_keywords_count": int(columns["ev_keywords_count"][i]),
+                    "exclude_keywords_count": int(columns["exclude_keywords_count"][i]),
+                    "standard_sections": LazySections(sidecar, i, 0, int(columns["standard_sections_count"][i])),
+                    "ev_sections": LazySections(sidecar, i, 1, int(columns["ev_sections_count"][i])),
+                }
+
+            feature = {
+                "file_path": columns["file_path"][i],
+                "filename_features": {
+                    "filename": columns["filename"][i],
+                    "standard_type": _opt("standard_type", i),
+                    "standard_code": _opt("standard_code", i),
+                    "year": _opt("year", i),
+                    "ev_related": bool(columns["ev_related"][i]),
+                    "standard_related": bool(columns["standard_related"][i]),
+                },
+                "content_features": content_features,
+                "is_standard": bool(columns["is_standard"][i]),
+                "confidence": float(columns["confidence"][i]),
+            }
+
+            extra = columns["extra"][i]
+            if extra:
+                feature.update(json.loads(extra))
+
+            features.append(feature)
+
+        return features
+
+    def size_bytes(self) -> int:
+        """存储占用的总字节数"""
+        total = 0
+        for path in (self.store_path, self.sections_path):
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    @staticmethod
+    def convert_json(json_path: str, store_path: str) -> "FeatureStore":
+        """将旧的 standard_features.json 转换为列式特征存储"""
+        if not os.path.exists(json_path):
+            raise FileNotFoundError(f"特征文件不存在: {json_path}")
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            features = json.load(f)
+
+        store = FeatureStore(store_path)
+        store.save(features)
+
+        print(f"已转换 {len(features)} 个文件的特征: {json_path} -> {store_path}")
+        print(f"  JSON大小: {os.path.getsize(json_path) / 1024:.1f} KB")
+        print(f"  存储大小: {store.size_bytes() / 1024:.1f} KB")
+        return store
@@ -0,0 +1,250 @@
+import os
+import json
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+
+# 扁平化模型文件（位于模型目录中）
+FLAT_MODEL_FILES = {
+    "meta": "forest_meta.json",
+    "nodes": "forest_nodes.npy",
+    "values": "forest_values.npy",
+    "roots": "forest_roots.npy"
+}
+
+# 节点表：叶子节点的 left/right 为 -1，左右子节点为整个森林中的全局下标
+NODE_DTYPE = np.dtype([("left", "<i4"), ("right", "<i4"), ("feature", "<i4"), ("threshold", "<f8")])
+
+
+class FlatScaler:
+    """StandardScaler 的只读替代（只保存均值和缩放系数）"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class FlatForest:
+    """随机森林的扁平化表示：所有树的节点放在连续的NumPy数组中
+
+    以只读内存映射方式加载时，同一台机器上的所有预测进程共享同一份物理内存页，
+    加载时也无需导入 scikit-learn 或反序列化每棵树。预测结果与 RandomForestClassifier.predict_proba 一致。
+    """
+
+    def __init__(self, nodes: np.ndarray, values: np.ndarray, roots: np.ndarray, classes: np.ndarray,
+                 feature_importances: Optional[np.ndarray] = None, early_exit: bool = False):
+        self.nodes = nodes
+        self.values = values
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.feature_importances_ = feature_importances
+        # 预测时是否提前结束（由 predict_decided 使用，见模型压缩）
+        self.early_exit = early_exit
+        self._bounds = None
+        # 内存映射的结构化数组按字段访问，避免每次预测都复制
+        self._left = nodes["left"]
+        self._right = nodes["right"]
+        self._feature = nodes["feature"]
+        self._threshold = nodes["threshold"]
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """由训练好的 RandomForestClassifier 构建
+
+        也接受拟合正类概率的 RandomForestRegressor（蒸馏得到的小模型），叶子值转为 [1 - p, p]。
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        is_regressor = not hasattr(model, "classes_")
+        classes = np.array([0, 1]) if is_regressor else model.classes_
+        total = sum(tree.node_count for tree in trees)
+        nodes = np.empty(total, dtype=NODE_DTYPE)
+        values = np.empty((total, len(classes)), dtype=np.float64)
+        roots = np.empty(len(trees), dtype=np.int64)
+
+        offset = 0
+        for i, tree in enumerate(trees):
+            count = tree.node_count
+            block = nodes[offset:offset + count]
+            is_leaf = tree.children_left == -1
+            block["left"] = np.where(is_leaf, -1, tree.children_left + offset)
+            block["right"] = np.where(is_leaf, -1, tree.children_right + offset)
+            block["feature"] = np.where(is_leaf, 0, tree.feature)
+            block["threshold"] = tree.threshold
+            if is_regressor:
+                positive = np.clip(tree.value[:, 0, 0], 0.0, 1.0)
+                values[offset:offset + count] = np.column_stack([1.0 - positive, positive])
+            else:
+                # 叶子节点的类别比例（与 sklearn 对每棵树的归一化方式相同）
+                value = tree.value[:, 0, :]
+                values[offset:offset + count] = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-12)
+            roots[i] = offset
+            offset += count
+
+        importances = getattr(model, "feature_importances_", None)
+        return cls(nodes, values, roots, classes, importances)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _tree_spans(self):
+        """每棵树在节点表中的 (起始, 结束) 下标（各树的节点连续存放）"""
+        ends = list(self.roots[1:]) + [len(self.nodes)]
+        return [(int(start), int(end)) for start, end in zip(self.roots, ends)]
+
+    def subset(self, tree_indices, early_exit: bool = None) -> "FlatForest":
+        """按给定顺序只保留部分树（剪枝后的森林，树的顺序决定提前结束时的遍历顺序）"""
+        spans = self._tree_spans()
+        blocks = []
+        roots = np.empty(len(tree_indices), dtype=np.int64)
+        offset = 0
+        for i, tree in enumerate(tree_indices):
+            start, end = spans[tree]
+            block = np.array(self.nodes[start:end])
+            for key in ("left", "right"):
+                block[key] = np.where(block[key] >= 0, block[key] - start + offset, -1)
+            blocks.append((block, np.array(self.values[start:end])))
+            roots[i] = offset
+            offset += end - start
+        nodes = np.concatenate([b[0] for b in blocks])
+        values = np.concatenate([b[1] for b in blocks])
+        return FlatForest(nodes, values, roots, self.classes_, self.feature_importances_,
+                          self.early_exit if early_exit is None else early_exit)
+
+    def _apply_roots(self, X: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        current = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+        while True:
+            left = self._left[current]
+            active = left >= 0
+            if not active.any():
+                return current
+            go_left = X[rows, self._feature[current]] <= self._threshold[current]
+            current = np.where(active, np.where(go_left, left, self._right[current]), current)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """每个样本在每棵树中落入的叶子节点全局下标，形状 (n_samples, n_trees)"""
+        # sklearn 的树按 float32 比较特征值
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        return self._apply_roots(X, self.roots)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.values[self.apply(X)].mean(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _remaining_bounds(self):
+        """第 k 棵树之后剩余各树正类概率之和的下限和上限（由每棵树叶子节点的最小值和最大值累加）"""
+        if self._bounds is None:
+            positive = np.asarray(self.values[:, 1])
+            is_leaf = np.asarray(self._left) < 0
+            lows = np.empty(self.n_trees)
+            highs = np.empty(self.n_trees)
+            for i, (start, end) in enumerate(self._tree_spans()):
+                leaves = positive[start:end][is_leaf[start:end]]
+                lows[i], highs[i] = leaves.min(), leaves.max()
+            self._bounds = (np.concatenate([np.cumsum(lows[::-1])[::-1], [0.0]]),
+                            np.concatenate([np.cumsum(highs[::-1])[::-1], [0.0]]))
+        return self._bounds
+
+    def predict_decided(self, X: np.ndarray, threshold: float, chunk: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """提前结束的预测：剩余树无论怎样投票都不会改变"正类概率 >= threshold"的结论时即停止（只适用于二分类）
+
+        第一次在结论可能确定的最少树数处检查，之后每次遍历的树数加倍（至少 chunk 棵）。
+
+        返回 (正类概率, 每个样本遍历的树数)。与 threshold 比较的结论和完整遍历相同；
+        提前结束的样本，概率为已遍历树的平均值（限制在剩余树可能投票的范围内），是近似值。
+        """
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_trees = self.n_trees
+        rest_low, rest_high = self._remaining_bounds()
+        # 遍历少于 first 棵树时，任何投票都不可能确定结论，第一次检查从这里开始
+        limit = threshold * n_trees
+        prefix_low = rest_low[0] - rest_low
+        prefix_high = rest_high[0] - rest_high
+        feasible = (prefix_low + rest_high < limit) | (prefix_high + rest_low >= limit)
+        feasible[-1] = True
+        first = max(chunk, int(np.argmax(feasible[1:])) + 1)
+
+        total = np.zeros(X.shape[0])
+        probability = np.empty(X.shape[0])
+        evaluated = np.full(X.shape[0], n_trees, dtype=np.int64)
+        active = np.arange(X.shape[0])
+        start = 0
+        while start < n_trees:
+            # 每次检查都要按树深逐层遍历一遍，检查间隔加倍使检查次数只随树数对数增长
+            end = min(n_trees, first if start == 0 else start + max(chunk, start))
+            leaves = self._apply_roots(X[active], self.roots[start:end])
+            total[active] += self.values[leaves, 1].sum(axis=1)
+            lower = (total[active] + rest_low[end]) / n_trees
+            upper = (total[active] + rest_high[end]) / n_trees
+            decided = (lower >= threshold) | (upper < threshold) | (end == n_trees)
+            finished = active[decided]
+            probability[finished] = np.clip(total[finished] / end, lower[decided], upper[decided])
+            evaluated[finished] = end
+            active = active[~decided]
+            if not len(active):
+                break
+            start = end
+        return probability, evaluated
+
+    def save(self, model_dir: str, scaler=None, info: Optional[Dict[str, Any]] = None):
+        """保存为可内存映射的 .npy 文件（scaler 的均值和缩放系数写入元数据）"""
+        os.makedirs(model_dir, exist_ok=True)
+        for key, array in (("nodes", self.nodes), ("values", self.values), ("roots", self.roots)):
+            # 先写临时文件再替换：其他进程可能正以内存映射方式使用旧文件
+            path = os.path.join(model_dir, FLAT_MODEL_FILES[key])
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temp_path, path)
+
+        meta = {
+            "classes": self.classes_.tolist(),
+            "feature_importances": None if self.feature_importances_ is None else list(self.feature_importances_),
+            "scaler_mean": None if scaler is None else scaler.mean_.tolist(),
+            "scaler_scale": None if scaler is None else scaler.scale_.tolist(),
+            "early_exit": self.early_exit,
+            # 压缩得到的模型记录压缩方式（完整森林为 None）
+            "compaction": info
+        }
+        # 元数据最后写入：加载时以它的存在判断扁平化模型是否完整
+        meta_path = os.path.join(model_dir, FLAT_MODEL_FILES["meta"])
+        temp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, meta_path)
+
+
+def flat_model_exists(model_dir: str) -> bool:
+    """模型目录中是否有完整的扁平化模型，且不早于 standard_classifier.pkl"""
+    meta_path = os.path.join(model_dir, FLAT_MODEL_FILES["meta"])
+    if not all(os.path.exists(os.path.join(model_dir, name)) for name in FLAT_MODEL_FILES.values()):
+        return False
+    pickle_path = os.path.join(model_dir, "standard_classifier.pkl")
+    return not os.path.exists(pickle_path) or os.path.getmtime(meta_path) >= os.path.getmtime(pickle_path)
+
+
+def load_flat_model(model_dir: str, mmap: bool = True) -> Dict[str, Any]:
+    """加载扁平化模型，返回 {"model": FlatForest, "scaler": FlatScaler 或 None, "compaction": 压缩信息或 None}
+
+    mmap 为 True 时节点数组以只读内存映射方式打开，多个进程共享物理内存页。
+    """
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(model_dir, FLAT_MODEL_FILES["meta"]), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    nodes = np.load(os.path.join(model_dir, FLAT_MODEL_FILES["nodes"]), mmap_mode=mmap_mode)
+    values = np.load(os.path.join(model_dir, FLAT_MODEL_FILES["values"]), mmap_mode=mmap_mode)
+    roots = np.load(os.path.join(model_dir, FLAT_MODEL_FILES["roots"]), mmap_mode=mmap_mode)
+    importances = meta.get("feature_importances")
+
+    model = FlatForest(nodes, values, roots, np.asarray(meta["classes"]),
+                       None if importances is None else np.asarray(importances), meta.get("early_exit", False))
+    scaler = None
+    if meta.get("scaler_mean") is not None:
+        scaler = FlatScaler(meta["scaler_mean"], meta["scaler_scale"])
+    return {"model": model, "scaler": scaler, "compaction": meta.get("compaction")}
@@ -8,16 +8,28 @@ PDF标准文档识别系统
 
 import os
 import sys
+import json
 import argparse
 from pathlib import Path
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import STANDARD_PDFS_DIR, MODEL_DIR, OUTPUT_DIR
+from config import STANDARD_PDFS_DIR, MODEL_DIR, OUTPUT_DIR, FEATURES_FILE, LEGACY_FEATURES_FILE, MODEL_CONFIG, CACHE_CONFIG, OCR_CONFIG, PARALLEL_CONFIG, SCAN_CONFIG, DEDUP_CONFIG, LOG_CONFIG, PREFETCH_CONFIG, COMPACTION_CONFIG, OUTPUT_CONFIG, ARCHIVE_CONFIG, THROTTLE_CONFIG, PRIORITY_CONFIG, CATALOG_CONFIG
 from extractor import StandardFeatureExtractor
-from trainer import StandardModelTrainer
+from trainer import MODEL_BACKENDS, StandardModelTrainer, create_trainer
+from text_model import TEXT_MODEL_FILES
 from predictor import StandardPredictor
+from feature_store import FeatureStore
+from text_cache import TextCache
+from sharding import SHARD_BY_CHOICES, parse_shard_spec
+from utils import setup_logging
+from scanner import ORDER_CHOICES
+from concurrency import parse_concurrency
+from compaction import compact_forest, format_report, install_variant
+from output_mode import OUTPUT_MODES
+from throttle import IOThrottle, install as install_throttle
+from priority import parse_duration
 
 def check_dependencies():
     """检查依赖包"""
@@ -42,6 +54,31 @@ def check_dependencies():
     
     return True
 
+def create_text_cache():
+    """按配置创建文本缓存（未启用时返回None）"""
+    if not CACHE_CONFIG["enabled"]:
+        return None
+    return TextCache(CACHE_CONFIG["text_cache_dir"], CACHE_CONFIG["compress_level"])
+
+def check_model_files():
+    """检查模型文件是否存在（按 MODEL_CONFIG["backend"] 选择的模型类型）"""
+    if MODEL_CONFIG["backend"] == "text":
+        model_files = [os.path.join(MODEL_DIR, name) for name in TEXT_MODEL_FILES.values()]
+    else:
+        model_files = [
+            os.path.join(MODEL_DIR, "standard_classifier.pkl"),
+            os.path.join(MODEL_DIR, "scaler.pkl"),
+            os.path.join(MODEL_DIR, "feature_names.json")
+        ]
+    
+    for model_file in model_files:
+        if not os.path.exists(model_file):
+            print(f"错误: 模型文件不存在: {model_file}")
+            print("请先运行步骤1和步骤2训练模型")
+            return False
+    
+    return True
+
 def step1_extract_features():
     """步骤1: 提取标准文件特征"""
     print("=" * 60)
@@ -53,7 +90,7 @@ def step1_extract_features():
         return False
     
     # 创建特征提取器
-    extractor = StandardFeatureExtractor()
+    extractor = StandardFeatureExtractor(create_text_cache())
     
     # 提取所有标准文件的特征
     features = extractor.extract_all_standards(STANDARD_PDFS_DIR)
@@ -63,7 +100,7 @@ def step1_extract_features():
         return False
     
     # 保存特征到model目录
-    features_path = os.path.join(MODEL_DIR, "standard_features.json")
+    features_path = os.path.join(MODEL_DIR, FEATURES_FILE)
     extractor.save_features(features, features_path)
     
     return True
@@ -74,62 +111,155 @@ def step2_train_model():
     print("步骤2: 训练标准文档识别模型")
     print("=" * 60)
     
-    features_path = os.path.join(MODEL_DIR, "standard_features.json")
+    features_path = os.path.join(MODEL_DIR, FEATURES_FILE)
     if not os.path.exists(features_path):
-        print(f"错误: 特征文件不存在: {features_path}")
-        print("请先运行步骤1提取特征")
-        return False
+        legacy_path = os.path.join(MODEL_DIR, LEGACY_FEATURES_FILE)
+        if not os.path.exists(legacy_path):
+            print(f"错误: 特征文件不存在: {features_path}")
+            print("请先运行步骤1提取特征")
+            return False
+        print(f"未找到特征存储，使用旧版JSON特征文件: {legacy_path}")
+        print("可运行 python main.py --convert-features 转换为特征存储")
+        features_path = legacy_path
     
     # 创建模型训练器
-    trainer = StandardModelTrainer()
+    trainer = create_trainer()
     
-    # 加载特征
-    features = trainer.load_features(features_path)
-    
-    # 训练模型
-    model_info = trainer.train_model(features)
+    if MODEL_CONFIG["backend"] == "text":
+        # 哈希文本模型从特征文件中只取路径和标签，正文按批次从文本缓存流式读取
+        model_info = trainer.train_model(features_path)
+    else:
+        # 加载特征
+        features = trainer.load_features(features_path)
+        
+        # 训练模型
+        model_info = trainer.train_model(features)
     
     # 保存模型
     trainer.save_model(MODEL_DIR)
     
     return True
 
-def step3_predict_and_copy(target_dir: str = "I:"):
-    """步骤3: 预测并复制标准文档"""
+def step3_predict_and_copy(target_dir="I:", shard=None, shard_by: str = "hash"):
+    """步骤3: 预测并复制标准文档（target_dir 可以是多个目录；指定 shard 时只处理一个分片并保存分片结果）"""
     print("=" * 60)
     print("步骤3: 预测并复制标准文档")
     print("=" * 60)
     
     # 检查模型是否存在
-    model_files = [
-        os.path.join(MODEL_DIR, "standard_classifier.pkl"),
-        os.path.join(MODEL_DIR, "scaler.pkl"),
-        os.path.join(MODEL_DIR, "feature_names.json")
-    ]
-    
-    for model_file in model_files:
-        if not os.path.exists(model_file):
-            print(f"错误: 模型文件不存在: {model_file}")
-            print("请先运行步骤1和步骤2训练模型")
-            return False
+    if not check_model_files():
+        return False
     
     # 检查目标目录是否存在
-    if not os.path.exists(target_dir):
-        print(f"错误: 目标目录不存在: {target_dir}")
-        return False
+    target_dirs = [target_dir] if isinstance(target_dir, str) else target_dir
+    for path in target_dirs:
+        if not os.path.exists(path):
+            print(f"错误: 目标目录不存在: {path}")
+            return False
+    if len(target_dirs) == 1:
+        target_dir = target_dirs[0]
     
     # 创建预测器
-    predictor = StandardPredictor(MODEL_DIR)
+    predictor = StandardPredictor(MODEL_DIR, create_text_cache())
     
     # 加载模型
     predictor.load_model()
     
     # 预测并复制标准文档
-    results = predictor.predict_and_copy(target_dir, OUTPUT_DIR)
+    results = predictor.predict_and_copy(target_dir, OUTPUT_DIR, shard, shard_by)
     
     return True
 
-def run_full_pipeline(target_dir: str = "I:"):
+def merge_shards():
+    """合并各节点的分片结果并复制标准文档"""
+    print("=" * 60)
+    print("合并分片结果")
+    print("=" * 60)
+    
+    predictor = StandardPredictor(MODEL_DIR)
+    try:
+        predictor.merge_shards(OUTPUT_DIR)
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}")
+        return False
+    
+    return True
+
+def rescore(target_dir: str = None):
+    """从文本缓存重新评分（修改关键词配置后无需重新解析PDF）"""
+    print("=" * 60)
+    print("从文本缓存重新评分")
+    print("=" * 60)
+    
+    if not check_model_files():
+        return False
+    
+    text_cache = create_text_cache()
+    if text_cache is None:
+        print("错误: 文本缓存未启用")
+        return False
+    
+    predictor = StandardPredictor(MODEL_DIR, text_cache)
+    predictor.load_model()
+    
+    results = predictor.rescore_from_cache(OUTPUT_DIR, target_dir)
+    
+    return bool(results)
+
+def compact_model(variant: str = None):
+    """压缩随机森林：输出各变体的准确率与单文件延迟对照表，指定 variant 时安装该变体"""
+    print("=" * 60)
+    print("模型压缩")
+    print("=" * 60)
+    
+    if MODEL_CONFIG["backend"] != "forest":
+        print("错误: 模型压缩只适用于随机森林模型")
+        return False
+    if not check_model_files():
+        return False
+    
+    features_path = os.path.join(MODEL_DIR, FEATURES_FILE)
+    if not os.path.exists(features_path):
+        features_path = os.path.join(MODEL_DIR, LEGACY_FEATURES_FILE)
+    
+    # 从 .pkl 原模型压缩（已安装的扁平化模型可能是压缩后的变体）
+    trainer = StandardModelTrainer()
+    trainer.load_model(MODEL_DIR, mmap=False)
+    features = trainer.load_features(features_path)
+    
+    report, variants = compact_forest(trainer, features)
+    print(format_report(report))
+    
+    report_path = os.path.join(MODEL_DIR, COMPACTION_CONFIG["report_file"])
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n对照表已保存到: {report_path}")
+    
+    if variant:
+        try:
+            install_variant(MODEL_DIR, variant, variants, report, trainer.scaler)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return False
+        print(f"已安装模型变体: {variant}（预测时使用）")
+    else:
+        print("选定变体后用 --compact --compact-variant 名称 安装（加 +early 后缀开启提前结束）")
+    
+    return True
+
+def convert_features():
+    """将旧版JSON特征文件转换为列式特征存储"""
+    json_path = os.path.join(MODEL_DIR, LEGACY_FEATURES_FILE)
+    store_path = os.path.join(MODEL_DIR, FEATURES_FILE)
+    
+    if not os.path.exists(json_path):
+        print(f"错误: 特征文件不存在: {json_path}")
+        return False
+    
+    FeatureStore.convert_json(json_path, store_path)
+    return True
+
+def run_full_pipeline(target_dir="I:"):
     """运行完整的处理流程"""
     print("PDF标准文档识别系统")
     print("=" * 60)
@@ -166,29 +296,167 @@ def main():
     global OUTPUT_DIR
     
     parser = argparse.ArgumentParser(description="PDF标准文档识别系统")
-    parser.add_argument("--target", "-t", default="I:", 
-                       help="目标目录路径 (默认: I:)")
+    parser.add_argument("--target", "-t", action="append", default=None,
+                       help="目标目录路径，可多次指定以同时扫描多个磁盘 (默认: I:；--rescore 时用于筛选缓存中的文件)")
     parser.add_argument("--step", "-s", type=int, choices=[1, 2, 3],
                        help="运行指定步骤 (1: 提取特征, 2: 训练模型, 3: 预测复制)")
     parser.add_argument("--output", "-o", default=OUTPUT_DIR,
                        help=f"输出目录 (默认: {OUTPUT_DIR})")
+    parser.add_argument("--convert-features", action="store_true",
+                       help=f"将 {LEGACY_FEATURES_FILE} 转换为特征存储 {FEATURES_FILE}")
+    parser.add_argument("--rescore", action="store_true",
+                       help="仅使用文本缓存重新计算特征和预测结果，不解析PDF")
+    parser.add_argument("--no-text-cache", action="store_true",
+                       help="不使用文本缓存")
+    parser.add_argument("--shard", default=None, metavar="i/K",
+                       help="只处理第 i 个分片（共 K 个，i 从0开始），结果保存到输出目录的 shards/ 下")
+    parser.add_argument("--shard-by", choices=SHARD_BY_CHOICES, default="hash",
+                       help="分片方式: hash 按文件路径哈希, dir 按所在目录 (默认: hash)")
+    parser.add_argument("--merge-shards", action="store_true",
+                       help="合并输出目录中的所有分片结果并复制标准文档")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                       help="排除匹配的文件或目录（按名称或相对路径，可多次指定）")
+    parser.add_argument("--max-depth", type=int, default=SCAN_CONFIG["max_depth"],
+                       help="最大扫描深度（目标目录为0，默认不限制）")
+    parser.add_argument("--order", choices=ORDER_CHOICES, default=SCAN_CONFIG["order"],
+                       help="文件处理顺序：walk 目录遍历顺序，inode 按inode编号，extent 按磁盘物理位置（机械硬盘适用）")
+    parser.add_argument("--rescan", action="store_true",
+                       help="本次不使用目录列表缓存，重新列出所有目录")
+    parser.add_argument("--no-archives", action="store_true",
+                       help="不扫描ZIP压缩包中的PDF（默认扫描，结果路径写作 压缩包.zip!/成员.pdf）")
+    parser.add_argument("--workers", "-w", type=parse_concurrency, default=PARALLEL_CONFIG["workers"],
+                       help=f"预测使用的进程数 (默认: {PARALLEL_CONFIG['workers']})，大于1时大文件优先调度；"
+                            f"auto 按吞吐量、CPU利用率和I/O等待自动调整")
+    parser.add_argument("--device-limit", action="append", default=[], metavar="路径=N",
+                       help="多个目标目录时该路径所在设备同时在途的任务数（如慢速网络共享设为1，可多次指定）；"
+                            "未指定的设备平分其余进程")
+    parser.add_argument("--copy-threads", type=parse_concurrency, default=PARALLEL_CONFIG["copy_threads"],
+                       help=f"复制标准文档的线程数 (默认: {PARALLEL_CONFIG['copy_threads']})，auto 按复制速度自动调整")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default=OUTPUT_CONFIG["mode"],
+                       help="标准文档的输出方式：copy 复制，hardlink 硬链接，reflink 克隆，symlink 符号链接，"
+                            "manifest 只写清单 (默认: %(default)s)；不支持时自动退回复制")
+    parser.add_argument("--limit-read", type=float, default=None, metavar="MB/秒",
+                       help="限制读取源文件的速度（所有进程合计），在生产文件服务器上运行时使用")
+    parser.add_argument("--limit-opens", type=float, default=None, metavar="次/秒",
+                       help="限制每秒打开的源文件数（所有进程合计）")
+    parser.add_argument("--limit-copy", type=float, default=None, metavar="MB/秒",
+                       help="限制输出标准文档时写入的速度")
+    parser.add_argument("--prioritize", action="store_true",
+                       help="按各目录上次运行的命中率排列文件，标准文档集中的目录和像标准编号的文件名先处理")
+    parser.add_argument("--time-budget", default=None, metavar="时长",
+                       help="预测阶段的时间预算，如 90m、2h 或秒数；到时停止处理新文件，保存已得到的结果并估计覆盖率"
+                            "（自动按目录优先级排列）")
+    parser.add_argument("--ocr-engine", default=None, metavar="模块名:函数名",
+                       help="扫描件使用的OCR插件 (默认取 config.py 中的 OCR_CONFIG)")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                       help="输出每个文件的预测/分类结果（默认只输出进度汇总）")
+    parser.add_argument("--log-json", default=None, metavar="FILE",
+                       help="同时把日志写入 JSON Lines 文件（含进度和速度等结构化字段）")
+    parser.add_argument("--no-prefetch", action="store_true",
+                       help="不预读后续文件（源文件在本地高速磁盘上时可关闭）")
+    parser.add_argument("--model-backend", choices=MODEL_BACKENDS, default=MODEL_CONFIG["backend"],
+                       help="模型类型：forest 手工特征随机森林，text 字符n-gram哈希文本模型（步骤2训练、步骤3预测均适用）")
+    parser.add_argument("--compact", action="store_true",
+                       help="压缩随机森林模型（剪枝、去除无用特征、蒸馏），输出准确率与单文件延迟对照表")
+    parser.add_argument("--compact-variant", default=None, metavar="名称",
+                       help="与 --compact 同用：安装对照表中的变体，如 prune-20 或 distil-10x6+early")
+    parser.add_argument("--dedup", action="store_true",
+                       help="近似重复的标准文档每组只复制一个代表文件（优先正式版、新年份）")
+    parser.add_argument("--latest-only", action="store_true",
+                       help="同一标准编号的多个版本（如 GB/T 27930-2015 和 GB/T 27930-2023）只复制最新版本")
     
     args = parser.parse_args()
     
     # 更新输出目录
     OUTPUT_DIR = args.output
     
-    if args.step:
+    if args.verbose:
+        LOG_CONFIG["level"] = "DEBUG"
+        LOG_CONFIG["json_level"] = "DEBUG"
+    setup_logging(json_file=args.log_json)
+    
+    if args.no_text_cache:
+        CACHE_CONFIG["enabled"] = False
+    
+    MODEL_CONFIG["backend"] = args.model_backend
+    PARALLEL_CONFIG["workers"] = args.workers
+    PARALLEL_CONFIG["copy_threads"] = args.copy_threads
+    for spec in args.device_limit:
+        path, _, limit = spec.rpartition("=")
+        if not path or not limit.isdigit() or int(limit) < 1:
+            parser.error(f"--device-limit 格式应为 路径=正整数，实际为: {spec}")
+        PARALLEL_CONFIG["device_limits"] = dict(PARALLEL_CONFIG["device_limits"], **{path: int(limit)})
+    OUTPUT_CONFIG["mode"] = args.output_mode
+    SCAN_CONFIG["exclude_globs"] = SCAN_CONFIG["exclude_globs"] + args.exclude
+    SCAN_CONFIG["max_depth"] = args.max_depth
+    SCAN_CONFIG["order"] = args.order
+    if args.rescan:
+        SCAN_CONFIG["listing_cache_file"] = None
+    if args.no_archives:
+        ARCHIVE_CONFIG["enabled"] = False
+    
+    if args.prioritize:
+        PRIORITY_CONFIG["enabled"] = True
+    if args.time_budget:
+        try:
+            PRIORITY_CONFIG["time_budget"] = parse_duration(args.time_budget)
+        except ValueError:
+            parser.error(f"--time-budget 格式应为秒数或带 s/m/h 后缀的时长，实际为: {args.time_budget}")
+    
+    if args.ocr_engine:
+        OCR_CONFIG["engine"] = args.ocr_engine
+    
+    if args.no_prefetch:
+        PREFETCH_CONFIG["enabled"] = False
+    
+    for value, key, scale in ((args.limit_read, "read_bytes_per_second", 1024 * 1024),
+                              (args.limit_opens, "opens_per_second", 1),
+                              (args.limit_copy, "copy_bytes_per_second", 1024 * 1024)):
+        if value is not None:
+            if value <= 0:
+                parser.error("限速值应大于0")
+            THROTTLE_CONFIG[key] = value * scale
+    install_throttle(IOThrottle.from_config())
+    
+    if args.dedup:
+        DEDUP_CONFIG["copy_representative_only"] = True
+    if args.latest_only:
+        CATALOG_CONFIG["latest_only"] = True
+    
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard_spec(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.compact_variant and not args.compact:
+        parser.error("--compact-variant 需要与 --compact 同时使用")
+    targets = args.target or ["I:"]
+    if len(targets) > 1 and (shard is not None or args.rescore):
+        parser.error("--shard 和 --rescore 只支持一个 --target")
+    
+    if args.convert_features:
+        success = convert_features()
+    elif args.compact:
+        success = compact_model(args.compact_variant)
+    elif args.merge_shards:
+        success = merge_shards()
+    elif shard is not None:
+        success = step3_predict_and_copy(targets[0], shard, args.shard_by)
+    elif args.rescore:
+        success = rescore(args.target[0] if args.target else None)
+    elif args.step:
         # 运行指定步骤
         if args.step == 1:
             success = step1_extract_features()
         elif args.step == 2:
             success = step2_train_model()
         elif args.step == 3:
-            success = step3_predict_and_copy(args.target)
+            success = step3_predict_and_copy(targets)
     else:
         # 运行完整流程
-        success = run_full_pipeline(args.target)
+        success = run_full_pipeline(targets)
     
     if success:
         print("处理成功完成!")
@@ -0,0 +1,185 @@
+import os
+import json
+import errno
+import shutil
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from config import OUTPUT_CONFIG, THROTTLE_CONFIG
+from archive import is_member_path, extract_member
+import throttle
+
+# 输出方式：copy 复制，hardlink 硬链接，reflink 共享数据块的克隆（写时复制），
+# symlink 符号链接，manifest 不放置文件、只写清单；压缩包成员无论哪种方式都只解压该成员（方法记为 extract）
+OUTPUT_MODES = ("copy", "hardlink", "reflink", "symlink", "manifest")
+
+# 各输出方式依次尝试的方法（不支持时自动退回下一个，最后总是复制）
+_FALLBACKS = {
+    "copy": ("copy",),
+    "hardlink": ("hardlink", "copy"),
+    "reflink": ("reflink", "copy_file_range", "copy"),
+    "symlink": ("symlink", "copy"),
+}
+
+# Linux ioctl FICLONE：目标文件共享源文件的数据块（btrfs、XFS 等支持）
+FICLONE = 0x40049409
+
+# 这些错误表示该方法在这对文件系统之间不可用（跨文件系统、文件系统不支持等），同一对设备不再尝试
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL,
+                       errno.ENOTTY, errno.ENOSYS}
+
+
+def _copy(source: str, target: str, size: int) -> int:
+    if not throttle.limited("copy"):
+        shutil.copy2(source, target)
+        return size
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        throttle.copy_stream(src, dst)
+    shutil.copystat(source, target)
+    return size
+
+
+def _hardlink(source: str, target: str, size: int) -> int:
+    os.link(source, target)
+    return 0
+
+
+def _symlink(source: str, target: str, size: int) -> int:
+    os.symlink(os.path.abspath(source), target)
+    return 0
+
+
+def _reflink(source: str, target: str, size: int) -> int:
+    import fcntl
+
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, target)
+    return 0
+
+
+def _copy_file_range(source: str, target: str, size: int) -> int:
+    """内核内复制（不经过用户态缓冲区；部分文件系统和NFS上由存储端完成或共享数据块）"""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range 不可用")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        # 限速时分块复制，每块按复制限额等待
+        chunk = THROTTLE_CONFIG["chunk_bytes"] if throttle.limited("copy") else remaining
+        while remaining > 0:
+            throttle.acquire("copy", min(chunk, remaining))
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), min(chunk, remaining))
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(source, target)
+    # 无法得知文件系统是否共享了数据块，按写入全部字节计
+    return size
+
+
+_METHODS = {
+    "copy": _copy,
+    "hardlink": _hardlink,
+    "symlink": _symlink,
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+}
+
+
+class FilePlacer:
+    """按输出方式把源文件放到输出目录，统计每种方法放置的文件数和实际写入的字节数
+
+    所选方式不可用时（如硬链接跨文件系统、文件系统不支持克隆、没有创建符号链接的权限）自动退回复制，
+    同一对源/目标设备上失败过的方法之后不再尝试。可在多个复制线程中同时使用。
+    """
+
+    def __init__(self, mode: str = None):
+        self.mode = mode or OUTPUT_CONFIG["mode"]
+        if self.mode not in OUTPUT_MODES:
+            raise ValueError(f"未知的输出方式: {self.mode}，可选: {', '.join(OUTPUT_MODES)}")
+        self.files = Counter()
+        self.bytes_written = Counter()
+        self.source_bytes = 0
+        self.manifest_bytes = 0
+        self._unsupported = set()
+        self._lock = threading.Lock()
+
+    def place(self, source: str, target: str) -> Tuple[str, int]:
+        """放置一个文件（目标已存在时替换），返回 (实际使用的方法, 写入的字节数)"""
+        if is_member_path(source):
+            if os.path.lexists(target):
+                os.remove(target)
+            written = extract_member(source, target)
+            self.record("extract", written, written)
+            return "extract", written
+
+        stat = os.stat(source)
+        target_device = os.stat(os.path.dirname(os.path.abspath(target))).st_dev
+        if os.path.lexists(target):
+            os.remove(target)
+
+        for method in _FALLBACKS[self.mode]:
+            key = (method, stat.st_dev, target_device)
+            if key in self._unsupported:
+                continue
+            try:
+                written = _METHODS[method](source, target, stat.st_size)
+            except OSError as e:
+                if method == "copy":
+                    raise
+                if os.path.lexists(target):
+                    os.remove(target)
+                if e.errno in _UNSUPPORTED_ERRNOS or getattr(e, "winerror", None) is not None:
+                    with self._lock:
+                        self._unsupported.add(key)
+                continue
+            self.record(method, stat.st_size, written)
+            return method, written
+
+    def record(self, method: str, source_bytes: int, written: int = 0):
+        """记录一个已放置（或只写入清单）的文件"""
+        with self._lock:
+            self.files[method] += 1
+            self.bytes_written[method] += written
+            self.source_bytes += source_bytes
+
+    def write_manifest(self, path: str, entries: List[Dict[str, Any]]):
+        """写出清单（JSON Lines，每行一个文件：源路径、输出路径、方法、写入字节数）"""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+        self.manifest_bytes = os.path.getsize(path)
+
+    def summary(self) -> Dict[str, Any]:
+        """各方法的文件数和写入字节数（写入运行报告）"""
+        total = sum(self.bytes_written.values()) + self.manifest_bytes
+        return {
+            "mode": self.mode,
+            "files": dict(self.files),
+            "bytes_written": dict(self.bytes_written),
+            "manifest_bytes": self.manifest_bytes,
+            "total_bytes_written": total,
+            "source_bytes": self.source_bytes,
+            "bytes_saved": max(0, self.source_bytes - total)
+        }
+
+    def describe(self) -> str:
+        """一行汇总：各方法的文件数、写入量和源文件总量"""
+        summary = self.summary()
+        methods = ", ".join(f"{method} {count} 个" for method, count in summary["files"].items()) or "0 个"
+        return (f"{methods}; 写入 {summary['total_bytes_written'] / 1024 / 1024:.1f} MB "
+                f"(源文件 {summary['source_bytes'] / 1024 / 1024:.1f} MB)")
+
+
+def manifest_path_for(output_dir: str) -> str:
+    return os.path.join(output_dir, OUTPUT_CONFIG["manifest_file"])
+
+
+def manifest_entry(source: str, target: Optional[str], method: Optional[str], written: int = 0,
+                   error: str = None) -> Dict[str, Any]:
+    entry = {"source": source, "target": target, "method": method, "bytes_written": written}
+    if error:
+        entry["error"] = error
+    return entry
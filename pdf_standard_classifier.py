@@ -1,13 +1,25 @@
 import os
-import shutil
-import pdfplumber
 import re
-from tqdm import tqdm
+from extractor import StandardFeatureExtractor
+from scanner import create_scanner
+from output_mode import FilePlacer, manifest_path_for, manifest_entry
+from text_model import category_model_exists, load_category_model
+from config import CATEGORY_MODEL_CONFIG
+from utils import get_logger, ProgressReporter
 
 # 设置根目录
 ROOT_DIR = "I:"  # 修改为你的PDF存放目录（支持整个硬盘）
 OUTPUT_DIR = "./标准分类"
 
+logger = get_logger("classifier")
+
+# 文本提取器（设置 text_cache 后复用已缓存的PDF文本）
+TEXT_EXTRACTOR = StandardFeatureExtractor()
+
+# 文档类别模型（首次分类时从 CATEGORY_MODEL_CONFIG["model_dir"] 加载；没有训练过时为None，只用关键词规则）
+_category_model = None
+_category_model_loaded = False
+
 # 定义更细粒度的分类及关键词
 CATEGORIES = {
     # 标准文档类
@@ -252,20 +264,52 @@ def ensure_output_dirs():
     for category in CATEGORIES:
         os.makedirs(os.path.join(OUTPUT_DIR, category), exist_ok=True)
 
+def set_text_cache(text_cache):
+    """设置文本缓存，之后的文本提取优先读取缓存"""
+    TEXT_EXTRACTOR.text_cache = text_cache
+
+def set_category_model(model):
+    """设置分类使用的类别模型（None 为只用关键词规则；没有覆盖全部类别的模型不使用）"""
+    global _category_model, _category_model_loaded
+    _category_model = model if model is not None and _covers_categories(model) else None
+    _category_model_loaded = True
+
+def _covers_categories(model):
+    """模型能否在全部类别之间选择：缺少的类别永远不会被预测，属于这些类别的文档会被归入其他类别"""
+    missing = [category for category in CATEGORIES if category not in model.classes_]
+    if missing:
+        logger.warning(f"类别模型缺少 {len(missing)} 个类别（{'、'.join(missing)}），只使用关键词规则")
+    return not missing
+
+def get_category_model():
+    """分类使用的类别模型；未启用、模型目录中没有或没有覆盖全部类别时返回None"""
+    global _category_model, _category_model_loaded
+    if not _category_model_loaded:
+        _category_model_loaded = True
+        model_dir = CATEGORY_MODEL_CONFIG["model_dir"]
+        if CATEGORY_MODEL_CONFIG["enabled"] and category_model_exists(model_dir):
+            try:
+                model = load_category_model(model_dir)[0]
+                if _covers_categories(model):
+                    _category_model = model
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"类别模型加载失败，只使用关键词规则: {e}")
+    return _category_model
+
 def extract_text_from_pdf(pdf_path, max_pages=3):
     """从PDF提取文本"""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ''
-            # 只取前几页进行判断
-            for page in pdf.pages[:max_pages]:
-                page_text = page.extract_text() or ''
-                text += page_text + ' '
-            return text.strip()
+        # 只取前几页进行判断
+        pages = TEXT_EXTRACTOR.extract_pages_text(pdf_path, max_pages)
+        return pages_to_text(pages)
     except Exception as e:
-        print(f"❌ 无法读取 {pdf_path}: {e}")
+        logger.warning(f"❌ 无法读取 {pdf_path}: {e}")
         return ""
 
+def pages_to_text(pages):
+    """将逐页文本拼接为分类用文本"""
+    return ''.join(page_text + ' ' for page_text in pages).strip()
+
 def check_exact_matches(filename):
     """检查精确匹配"""
     return EXACT_MATCHES.get(filename, None)
@@ -330,21 +374,49 @@ def classify_pdf(pdf_path):
     if not text:
         return None
     
-    # 获取文件名
-    filename = os.path.basename(pdf_path)
-    
+    return classify_text(os.path.basename(pdf_path), text)
+
+def classify_text(filename, text):
+    """根据文件名和已提取的文本分类（不访问PDF文件）"""
+    return classify_texts([(filename, text)])[0]
+
+def classify_override(filename, text):
+    """规则覆盖层：精确匹配和高置信度的特殊规则，不匹配时返回None"""
     # 首先检查精确匹配
     exact_match = check_exact_matches(filename)
     if exact_match:
         return exact_match, 1.0  # 最高置信度
     
-    # 获取文件名（不含扩展名）
-    filename_no_ext = os.path.splitext(filename)[0]
-    
-    # 检查特殊规则
-    special_category, special_confidence = check_special_rules(filename_no_ext, text)
+    # 检查特殊规则（文件名不含扩展名）
+    special_category, special_confidence = check_special_rules(os.path.splitext(filename)[0], text)
     if special_category and special_confidence > 0.7:
         return special_category, special_confidence
+    return None
+
+def classify_texts(documents):
+    """批量分类 [(文件名, 文本), ...]，返回 [(类别, 置信度), ...]
+    
+    规则覆盖层先生效；其余文档由类别模型一次批量打分，模型未训练、没有覆盖全部类别，或最可能的类别领先第二名
+    不到 CATEGORY_MODEL_CONFIG["min_margin"] 时按关键词规则分类。
+    """
+    results = [classify_override(filename, text) for filename, text in documents]
+    pending = [i for i, result in enumerate(results) if result is None]
+    
+    model = get_category_model() if pending else None
+    if model is not None:
+        predictions = model.predict_margin([(documents[i][1], documents[i][0]) for i in pending])
+        for i, (category, probability, margin) in zip(pending, predictions):
+            if margin >= CATEGORY_MODEL_CONFIG["min_margin"]:
+                results[i] = category, probability
+    
+    return [result if result is not None else classify_by_rules(*documents[i])
+            for i, result in enumerate(results)]
+
+def classify_by_rules(filename, text):
+    """关键词规则分类：文件名关键词、各类别关键词置信度，最后宽松匹配技术文档"""
+    
+    # 获取文件名（不含扩展名）
+    filename_no_ext = os.path.splitext(filename)[0]
     
     # 文件名关键词匹配
     filename_lower = filename_no_ext.lower()
@@ -400,6 +472,17 @@ def classify_pdf(pdf_path):
     
     return best_category, best_confidence
 
+def iter_classified(pdf_paths):
+    """按批次提取文本并分类，逐个产出 (路径, (类别, 置信度))；无法读取文本的文件结果为None"""
+    batch_size = max(1, CATEGORY_MODEL_CONFIG["batch_size"])
+    for start in range(0, len(pdf_paths), batch_size):
+        batch = pdf_paths[start:start + batch_size]
+        texts = [extract_text_from_pdf(pdf_path) for pdf_path in batch]
+        readable = [i for i, text in enumerate(texts) if text]
+        classified = dict(zip(readable, classify_texts([(os.path.basename(batch[i]), texts[i]) for i in readable])))
+        for i, pdf_path in enumerate(batch):
+            yield pdf_path, classified.get(i)
+
 def classify_all_pdfs(root_dir):
     """主函数：遍历并分类PDF"""
     ensure_output_dirs()
@@ -407,35 +490,50 @@ def classify_all_pdfs(root_dir):
     # 统计信息
     stats = {category: 0 for category in CATEGORIES}
     total_files = 0
+    placer = FilePlacer()
+    manifest = []
     
-    for dirpath, _, filenames in tqdm(os.walk(root_dir), desc="扫描PDF文件"):
-        for fname in filenames:
-            if fname.lower().endswith(".pdf"):
-                total_files += 1
-                full_path = os.path.join(dirpath, fname)
-                
-                result = classify_pdf(full_path)
-                if result:
-                    category, confidence = result
-                    if category:
-                        dest_path = os.path.join(OUTPUT_DIR, category, fname)
-                        try:
-                            shutil.copy2(full_path, dest_path)
-                            stats[category] += 1
-                            print(f"✅ {fname} → {category} (置信度: {confidence:.2f})")
-                        except Exception as e:
-                            print(f"❌ 复制失败 {fname}: {e}")
+    # 跳过系统目录和输出目录（避免重复分类已复制的文件）
+    scanner = create_scanner()
+    pdf_files = scanner.scan(root_dir, exclude_paths=[OUTPUT_DIR])
+    
+    progress = ProgressReporter(logger, len(pdf_files), "分类PDF文件", sum(scanner.file_sizes.values()))
+    for full_path, result in iter_classified(pdf_files):
+        fname = os.path.basename(full_path)
+        total_files += 1
+        
+        if result:
+            category, confidence = result
+            if category:
+                dest_path = os.path.join(OUTPUT_DIR, category, fname)
+                try:
+                    if placer.mode == "manifest":
+                        placer.record("manifest", scanner.file_sizes.get(full_path, 0))
+                        manifest.append(dict(manifest_entry(full_path, None, "manifest"), category=category))
                     else:
-                        print(f"⏩ 无匹配类别：{fname}")
-                else:
-                    print(f"❌ 无法处理：{fname}")
+                        manifest.append(dict(manifest_entry(full_path, dest_path, *placer.place(full_path, dest_path)),
+                                             category=category))
+                    stats[category] += 1
+                    logger.debug("✅ %s → %s (置信度: %.2f)", fname, category, confidence,
+                                 extra={"fields": {"event": "classification", "file_path": full_path,
+                                                   "category": category, "confidence": confidence}})
+                except Exception as e:
+                    logger.warning(f"❌ 复制失败 {fname}: {e}")
+            else:
+                logger.debug("⏩ 无匹配类别：%s", fname)
+        else:
+            logger.warning(f"❌ 无法处理：{fname}")
+        progress.update(1, scanner.file_sizes.get(full_path, 0))
+    progress.close()
+    placer.write_manifest(manifest_path_for(OUTPUT_DIR), manifest)
     
     # 打印统计信息
-    print(f"\n📊 分类统计:")
-    print(f"总文件数: {total_files}")
+    logger.info(f"\n📊 分类统计:")
+    logger.info(f"总文件数: {total_files}")
     for category, count in stats.items():
         if count > 0:
-            print(f"{category}: {count} 个文件")
+            logger.info(f"{category}: {count} 个文件")
+    logger.info(f"输出方式 {placer.mode}: {placer.describe()}")
 
 if __name__ == "__main__":
     classify_all_pdfs(ROOT_DIR)
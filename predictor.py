@@ -1,44 +1,112 @@
 import os
-import shutil
+import time
 import json
-from typing import Dict, List, Any, Tuple
-from tqdm import tqdm
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Union
 from extractor import StandardFeatureExtractor
-from trainer import StandardModelTrainer
-from config import MODEL_CONFIG, OUTPUT_DIR
+from trainer import create_trainer
+from text_cache import TextCache
+from pdf_standard_classifier import classify_texts, pages_to_text
+from sharding import filter_shard, write_shard_result, load_shard_results
+from scanner import create_scanner
+from result_index import ResultIndex, index_path_for
+from scheduler import (estimate_cost, plan_tasks, summarize_run, file_size, device_of, device_limits,
+                       interleave_devices, summarize_devices)
+from dedup import group_results
+from catalog import StandardCatalog, superseded_versions, result_code
+from prefetch import Prefetcher
+from concurrency import ConcurrencyController, default_max_workers, iter_windowed, iter_device_windowed, until_deadline
+from priority import DirectoryPriority, prioritize, estimate_coverage
+from output_mode import FilePlacer, manifest_path_for, manifest_entry
+import throttle
+from utils import get_logger, setup_logging, logging_settings, ProgressReporter
+from config import MODEL_CONFIG, OUTPUT_DIR, PARALLEL_CONFIG, INDEX_CONFIG, DEDUP_CONFIG, PREFETCH_CONFIG, AUTOTUNE_CONFIG, PRIORITY_CONFIG, CATALOG_CONFIG, CATEGORY_MODEL_CONFIG
+
+logger = get_logger("predictor")
+
+# 工作进程中的预测器（由 _init_worker 创建）
+_WORKER_PREDICTOR = None
+
+def _init_worker(model_dir: str, text_cache: Optional[TextCache], result_index: Optional[ResultIndex],
+                 log_settings: Dict[str, Any], backend: str = None, io_throttle: throttle.IOThrottle = None):
+    """工作进程初始化：沿用主进程的日志设置、模型类型和限速器，加载一次模型，之后处理的所有任务共用"""
+    global _WORKER_PREDICTOR
+    setup_logging(**log_settings)
+    throttle.install(io_throttle)
+    _WORKER_PREDICTOR = StandardPredictor(model_dir, text_cache, backend)
+    _WORKER_PREDICTOR.result_index = result_index
+    _WORKER_PREDICTOR.load_model()
+
+def _predict_task(pdf_paths: List[str]) -> List[Dict[str, Any]]:
+    """工作进程：依次预测一个任务（单个大文件或一批小文件），结果由工作进程直接写入索引"""
+    records = list(_WORKER_PREDICTOR.iter_predict_paths(pdf_paths))
+    _WORKER_PREDICTOR.index_results(records)
+    return records
 
 class StandardPredictor:
     """标准文档预测器"""
     
-    def __init__(self, model_dir: str):
+    def __init__(self, model_dir: str, text_cache: Optional[TextCache] = None, backend: str = None):
         self.model_dir = model_dir
-        self.extractor = StandardFeatureExtractor()
-        self.trainer = StandardModelTrainer()
+        self.backend = backend or MODEL_CONFIG["backend"]
+        self.extractor = StandardFeatureExtractor(text_cache)
+        self.trainer = create_trainer(self.backend)
+        # 哈希文本模型需要正文，提取特征时保留（预测后即从特征中移除）
+        self.extractor.keep_text = self.trainer.needs_text
         self.loaded = False
+        self.file_sizes = {}
+        # 多个目标目录时每个文件所在的设备号，以及每个设备上的目标目录
+        self.file_devices = {}
+        self.device_roots = {}
+        # 按目录优先级排列时每个文件的估计命中概率（用于估计覆盖率）
+        self.priority_scores = None
+        self.last_run_metrics = None
+        self.result_index = None
+        self.worker_controller = None
+        # 上次预测实际使用的进程数（单进程处理时为1）
+        self.workers_used = 1
     
     def load_model(self):
         """加载训练好的模型"""
         try:
             self.trainer.load_model(self.model_dir)
             self.loaded = True
-            print("模型加载成功")
+            logger.info("模型加载成功")
         except Exception as e:
-            print(f"模型加载失败: {e}")
+            logger.error(f"模型加载失败: {e}")
             raise
     
-    def scan_pdf_files(self, root_dir: str) -> List[str]:
-        """扫描指定目录下的所有PDF文件"""
+    def scan_pdf_files(self, root_dir, exclude_paths: List[str] = ()) -> List[str]:
+        """扫描指定目录（或多个目录）下的所有PDF文件（跳过系统目录和 exclude_paths，如输出目录）
+
+        多个目录时记录每个文件所在的设备，预测时各设备分别排队；同一文件只保留一次。
+        """
+        root_dirs = [root_dir] if isinstance(root_dir, str) else list(root_dir)
+        scanner = create_scanner()
         pdf_files = []
-        
-        print(f"正在扫描目录: {root_dir}")
-        
-        for root, dirs, files in os.walk(root_dir):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    pdf_path = os.path.join(root, file)
-                    pdf_files.append(pdf_path)
-        
-        print(f"找到 {len(pdf_files)} 个PDF文件")
+        self.file_sizes = {}
+        self.file_devices = {}
+        self.device_roots = {}
+        for root in root_dirs:
+            logger.info(f"正在扫描目录: {root}")
+            
+            # 扫描时顺便记录文件大小，供并行调度估算开销（Windows 下目录项自带大小，无需额外 stat）
+            device = device_of(root)
+            self.device_roots.setdefault(device, []).append(root)
+            found = [path for path in scanner.scan(root, exclude_paths) if path not in self.file_devices]
+            for path in found:
+                self.file_devices[path] = device
+                self.file_sizes[path] = scanner.file_sizes[path]
+            pdf_files.extend(found)
+            
+            stats = scanner.stats
+            logger.info(f"找到 {len(found)} 个PDF文件 (列出 {stats['dirs_listed']} 个目录, "
+                  f"{stats['dirs_cached']} 个目录未变化使用缓存, 跳过 {stats['dirs_skipped']} 个目录)")
+        if len(root_dirs) > 1:
+            logger.info(f"共 {len(pdf_files)} 个PDF文件，位于 {len(self.device_roots)} 个设备上")
+        if scanner.order != "walk":
+            logger.info(f"处理顺序: 按{'inode编号' if scanner.order == 'inode' else '磁盘物理位置'}排序")
         return pdf_files
     
     def predict_single_file(self, pdf_path: str) -> Tuple[bool, float, Dict[str, Any]]:
@@ -49,108 +117,582 @@ class StandardPredictor:
         # 提取特征
         features = self.extractor.extract_pdf_features(pdf_path)
         
-        # 使用模型预测
-        prediction, probability = self.trainer.predict(features)
-        
-        # 判断是否为标准文档
-        is_standard = prediction == 1 and probability >= MODEL_CONFIG["min_confidence"]
+        is_standard, probability = self.predict_features(features)
         
         return is_standard, probability, features
     
-    def predict_batch_files(self, pdf_files: List[str], output_dir: str = None) -> List[Dict[str, Any]]:
-        """批量预测PDF文件"""
-        if not self.loaded:
-            raise ValueError("模型未加载，请先调用 load_model()")
+    def predict_features(self, features: Dict[str, Any]) -> Tuple[bool, float]:
+        """根据已提取的特征判断是否为标准文档"""
+        return self.predict_features_batch([features])[0]
+    
+    def predict_features_batch(self, features_list: List[Dict[str, Any]]) -> List[Tuple[bool, float]]:
+        """批量判断是否为标准文档：需要模型的文件整批调用一次模型（特征中保留的正文随后移除）"""
+        decisions = [None] * len(features_list)
+        pending = []
+        for i, features in enumerate(features_list):
+            # 元数据已能直接判定（文档信息/XMP/书签中含标准类型和编号）
+            if features.get("decided_by") == "metadata":
+                decisions[i] = (features["is_standard"], features["confidence"])
+            else:
+                pending.append(i)
         
-        results = []
-        standard_files = []
+        # 使用模型预测
+        predictions = self.trainer.predict_batch([features_list[i] for i in pending])
+        for i, (prediction, probability) in zip(pending, predictions):
+            # 判断是否为标准文档
+            decisions[i] = (prediction == 1 and probability >= MODEL_CONFIG["min_confidence"], probability)
         
-        print(f"开始预测 {len(pdf_files)} 个PDF文件...")
+        for features in features_list:
+            features.pop("text", None)
+        return decisions
+    
+    def predict_path(self, pdf_path: str, data: Optional[bytes] = None) -> Dict[str, Any]:
+        """提取并预测单个文件，返回结果记录（扫描件只带 scanned 标记）
         
-        for pdf_path in tqdm(pdf_files, desc="预测进度"):
-            try:
-                is_standard, probability, features = self.predict_single_file(pdf_path)
-                
+        data 为预读到内存的文件内容；seconds 为处理耗时，io_seconds 为其中读取文件的阻塞时间。
+        """
+        return self._predict_extracted([self._extract_path(pdf_path, data)])[0]
+    
+    def _extract_path(self, pdf_path: str, data: Optional[bytes] = None) -> Dict[str, Any]:
+        """提取单个文件的特征，返回尚未经模型判定的结果记录"""
+        start = time.perf_counter()
+        io_start = self.extractor.io_stats.seconds
+        try:
+            features = self.extractor.extract_pdf_features(pdf_path, data)
+            
+            if features.get("scanned"):
+                result = {"file_path": pdf_path, "scanned": True}
+            else:
                 result = {
                     "file_path": pdf_path,
                     "filename": os.path.basename(pdf_path),
-                    "is_standard": is_standard,
-                    "confidence": probability,
                     "features": features
                 }
-                
-                results.append(result)
-                
-                if is_standard:
-                    standard_files.append(result)
-                    print(f"✓ 标准文档: {os.path.basename(pdf_path)} (置信度: {probability:.3f})")
-                else:
-                    print(f"✗ 非标准: {os.path.basename(pdf_path)} (置信度: {probability:.3f})")
-                    
-            except Exception as e:
-                print(f"预测失败 {pdf_path}: {e}")
-                results.append({
-                    "file_path": pdf_path,
-                    "filename": os.path.basename(pdf_path),
-                    "is_standard": False,
-                    "confidence": 0.0,
-                    "error": str(e)
-                })
+        except Exception as e:
+            result = self._error_result(pdf_path, e)
+        
+        result["seconds"] = time.perf_counter() - start
+        result["io_seconds"] = self.extractor.io_stats.seconds - io_start
+        return result
+    
+    @staticmethod
+    def _error_result(pdf_path: str, error: Exception) -> Dict[str, Any]:
+        logger.warning(f"预测失败 {pdf_path}: {error}")
+        return {
+            "file_path": pdf_path,
+            "filename": os.path.basename(pdf_path),
+            "is_standard": False,
+            "confidence": 0.0,
+            "error": str(error)
+        }
+    
+    def _predict_extracted(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """对一批已提取特征的结果整批调用模型，模型耗时平均计入各文件的 seconds"""
+        pending = [i for i, r in enumerate(results) if "features" in r]
+        if not pending:
+            return results
+        
+        start = time.perf_counter()
+        try:
+            decisions = self.predict_features_batch([results[i]["features"] for i in pending])
+        except Exception:
+            # 整批失败时逐个预测，只有出错的文件记为失败
+            decisions = []
+            for i in pending:
+                try:
+                    decisions.append(self.predict_features(results[i]["features"]))
+                except Exception as e:
+                    decisions.append(e)
+        share = (time.perf_counter() - start) / len(pending)
+        
+        for i, decision in zip(pending, decisions):
+            result = results[i]
+            if isinstance(decision, Exception):
+                predicted = self._error_result(result["file_path"], decision)
+            else:
+                predicted = {
+                    "file_path": result["file_path"],
+                    "filename": result["filename"],
+                    "is_standard": decision[0],
+                    "confidence": decision[1],
+                    "features": result["features"]
+                }
+            predicted["seconds"] = result["seconds"] + share
+            predicted["io_seconds"] = result["io_seconds"]
+            results[i] = predicted
+        return results
+    
+    def _iter_extracted(self, pdf_paths: List[str], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """按顺序提取多个文件的特征；启用预读时后续文件由I/O线程提前读入内存，等待预读的时间计入 io_seconds
+
+        到达 deadline（time.monotonic 时刻）后不再开始提取，已预读的文件一并丢弃。
+        """
+        if not PREFETCH_CONFIG["enabled"] or (isinstance(pdf_paths, list) and len(pdf_paths) <= 1):
+            for pdf_path in until_deadline(pdf_paths, deadline):
+                yield self._extract_path(pdf_path)
+            return
+        
+        prefetcher = Prefetcher(until_deadline(pdf_paths, deadline), should_read=self.extractor.needs_pdf,
+                                file_sizes=self.file_sizes)
+        for pdf_path, data, wait in prefetcher:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            result = self._extract_path(pdf_path, data)
+            result["seconds"] += wait
+            result["io_seconds"] += wait
+            yield result
+    
+    def iter_predict_paths(self, pdf_paths: List[str], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """按顺序预测多个文件：每提取 predict_batch_size 个文件整批调用一次模型；到达 deadline 后不再开始新的文件"""
+        batch_size = max(1, MODEL_CONFIG["predict_batch_size"])
+        batch = []
+        for result in self._iter_extracted(pdf_paths, deadline):
+            batch.append(result)
+            if len(batch) >= batch_size:
+                yield from self._predict_extracted(batch)
+                batch = []
+        if batch:
+            yield from self._predict_extracted(batch)
+    
+    def index_results(self, results: List[Dict[str, Any]], scanned_files: List[Dict[str, Any]] = ()):
+        """将预测结果（及扫描件记录）写入结果索引（未启用索引时不做任何事）"""
+        if self.result_index is None:
+            return
+        rows = self.simplify_results([r for r in results if not r.get("scanned")])
+        rows.extend(dict(record, scanned=True) for record in scanned_files)
+        rows.extend({"file_path": r["file_path"], "scanned": True} for r in results if r.get("scanned"))
+        self.result_index.upsert(rows)
+    
+    def _budget_summary(self, pdf_files: List[str], processed: List[str], time_budget: float) -> Dict[str, Any]:
+        """时间预算内处理的文件数、文件覆盖率和按估计命中概率加权的标准文档覆盖率"""
+        return {
+            "time_budget": time_budget,
+            "stopped_early": len(processed) < len(pdf_files),
+            "files_processed": len(processed),
+            "files_total": len(pdf_files),
+            "file_coverage": len(processed) / len(pdf_files) if pdf_files else 1.0,
+            "estimated_standard_coverage": estimate_coverage(processed, self.priority_scores)
+            if self.priority_scores is not None else None
+        }
+    
+    def prioritize_files(self, pdf_files: List[str], output_dir: str = None) -> List[str]:
+        """按目录的历史命中率和文件名排列文件（没有命中记录时从输出目录中上次的 prediction_results.json 导入）"""
+        history = DirectoryPriority(PRIORITY_CONFIG["stats_file"])
+        if not history.dirs and output_dir:
+            history.load_results(os.path.join(output_dir, "prediction_results.json"))
+        
+        def looks_standard(filename: str) -> bool:
+            features = self.extractor.extract_filename_features(filename)
+            return bool(features["standard_type"] or features["standard_code"])
+        
+        self.priority_scores = history.scores(pdf_files, looks_standard)
+        ordered = prioritize(pdf_files, self.priority_scores)
+        logger.info(f"按目录优先级排列: 记录了 {len(history.dirs)} 个目录的命中率, "
+                    f"估计共有 {sum(self.priority_scores.values()):.0f} 个标准文档")
+        return ordered
+    
+    def record_hit_rates(self, results: List[Dict[str, Any]], partial: bool = False):
+        """把本次运行各目录的命中情况写入目录命中记录（供下次按优先级排列）"""
+        if not PRIORITY_CONFIG["stats_file"]:
+            return
+        history = DirectoryPriority(PRIORITY_CONFIG["stats_file"])
+        history.update(results, partial)
+        try:
+            history.save()
+        except OSError as e:
+            logger.warning(f"写入目录命中记录失败: {e}")
+    
+    @staticmethod
+    def _throttle_status():
+        """进度汇总中附加的限速用量（未限速时为None）"""
+        io_throttle = throttle.current()
+        return io_throttle.usage_line if io_throttle is not None else None
+    
+    def estimate_costs(self, pdf_files: List[str]) -> Dict[str, float]:
+        """根据文件大小和文本缓存中的页数估算每个文件的处理开销"""
+        text_cache = self.extractor.text_cache
+        settings = self.extractor.extraction_settings()
+        costs = {}
+        for pdf_path in pdf_files:
+            entry = text_cache.peek(pdf_path, settings) if text_cache is not None else None
+            costs[pdf_path] = estimate_cost(file_size(pdf_path, self.file_sizes), entry)
+        return costs
+    
+    def _iter_predictions(self, pdf_files: List[str], workers: Union[int, str],
+                          deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """逐个产出预测结果：单进程按扫描顺序处理；多进程按估算开销从大到小调度（按优先级排列时保持顺序）
+
+        workers 为 "auto" 时进程池按上限创建，由 ConcurrencyController 根据吞吐量、CPU利用率和I/O等待
+        调整同时运行的任务数（即实际工作的进程数）。到达 deadline（time.monotonic 时刻）后不再开始新的文件，
+        已开始的文件处理完后结束。
+        """
+        total_bytes = sum(self.file_sizes.get(pdf_path, 0) for pdf_path in pdf_files)
+        self.worker_controller = None
+        if workers == "auto" and len(pdf_files) > 1:
+            max_workers = default_max_workers()
+            self.worker_controller = ConcurrencyController("预测进程", os.cpu_count() or 1, 1, max_workers, logger=logger)
+            workers = max_workers
+        elif workers == "auto":
+            workers = 1
+        self.workers_used = workers if len(pdf_files) > 1 else 1
+        if workers <= 1 or len(pdf_files) <= 1:
+            # 多个设备的文件轮流处理，预读线程同时读取各个设备
+            with ProgressReporter(logger, len(pdf_files), "预测进度", total_bytes, status=self._throttle_status()) as progress:
+                for result in self.iter_predict_paths(interleave_devices(pdf_files, self.file_devices), deadline):
+                    self.index_results([result])
+                    progress.update(1, self.file_sizes.get(result["file_path"], 0))
+                    yield result
+            return
+        
+        # 文件位于多个设备上时每个设备单独排队（任务不跨设备），慢速设备只占用自己的份额
+        queues = {}
+        for pdf_path in pdf_files:
+            queues.setdefault(self.file_devices.get(pdf_path, -1), []).append(pdf_path)
+        for device, paths in queues.items():
+            if PARALLEL_CONFIG["size_aware"]:
+                queues[device] = plan_tasks(self.estimate_costs(paths), keep_order=self.priority_scores is not None)
+            else:
+                queues[device] = [[pdf_path] for pdf_path in paths]
+        tasks = [task for device_tasks in queues.values() for task in device_tasks]
+        controller = self.worker_controller
+        if controller is not None:
+            logger.info(f"并行预测: 自适应进程数 (初始 {controller.value}, 上限 {workers}), {len(tasks)} 个任务 "
+                  f"(其中 {sum(1 for t in tasks if len(t) > 1)} 个小文件批次)")
+            window = lambda: controller.value
+        else:
+            logger.info(f"并行预测: {workers} 个进程, {len(tasks)} 个任务 "
+                  f"(其中 {sum(1 for t in tasks if len(t) > 1)} 个小文件批次)")
+            # 在途任务数不超过进程数，任务逐个提交，到达时间预算后不再提交新的任务
+            window = lambda: workers
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.model_dir, self.extractor.text_cache, self.result_index,
+                                           logging_settings(), self.backend, throttle.current())) as executor:
+            if len(queues) > 1:
+                limits = device_limits(PARALLEL_CONFIG["device_limits"])
+                logger.info(f"按设备排队: {len(queues)} 个设备, " + ", ".join(
+                    f"{'/'.join(self.device_roots.get(device, ['?']))} {len(queues[device])} 个任务"
+                    + (f" (上限 {limits[device]})" if device in limits else "") for device in queues))
+                queues = {device: until_deadline(device_tasks, deadline) for device, device_tasks in queues.items()}
+                submitted = ((task, future) for _, task, future in
+                             iter_device_windowed(executor, _predict_task, queues, window, limits))
+            else:
+                submitted = iter_windowed(executor, _predict_task, until_deadline(tasks, deadline), window)
+            with ProgressReporter(logger, len(pdf_files), "预测进度", total_bytes, status=self._throttle_status()) as progress:
+                for _, future in submitted:
+                    records = future.result()
+                    nbytes = sum(self.file_sizes.get(r["file_path"], 0) for r in records)
+                    progress.update(len(records), nbytes)
+                    if controller is not None:
+                        controller.update(len(records), nbytes)
+                    yield from records
+    
+    def predict_batch_files(self, pdf_files: List[str], output_dir: str = None,
+                            shard: Dict[str, Any] = None, workers: Union[int, str] = None,
+                            time_budget: float = None) -> List[Dict[str, Any]]:
+        """批量预测PDF文件（指定 shard 时结果保存为分片结果文件，由 merge_shards 合并）
+
+        time_budget（秒，默认取 PRIORITY_CONFIG）用完时停止开始新的文件，只保存已处理文件的结果，
+        运行指标的 budget 一项记录处理了多少文件和估计的标准文档覆盖率。
+        """
+        if not self.loaded:
+            raise ValueError("模型未加载，请先调用 load_model()")
+        if workers is None:
+            workers = PARALLEL_CONFIG["workers"]
+        if time_budget is None:
+            time_budget = PRIORITY_CONFIG["time_budget"]
+        deadline = time.monotonic() + time_budget if time_budget else None
+        
+        # 结果索引随预测逐个写入（分片运行时各节点可能不在同一台机器上，由合并时统一写入）
+        if output_dir and shard is None and INDEX_CONFIG["enabled"]:
+            self.result_index = ResultIndex(index_path_for(output_dir))
+        
+        results = []
+        standard_files = []
+        scanned_queue = []
+        completions = []
+        
+        logger.info(f"开始预测 {len(pdf_files)} 个PDF文件...")
+        
+        io_seconds = 0.0
+        start = time.perf_counter()
+        for result in self._iter_predictions(pdf_files, workers, deadline):
+            pdf_path = result["file_path"]
+            completions.append((time.perf_counter() - start, result.pop("seconds"), pdf_path))
+            io_seconds += result.pop("io_seconds", 0.0)
+            
+            # 扫描件没有文本层，转入扫描件队列，不参与本轮预测和统计
+            if result.get("scanned"):
+                scanned_queue.append(pdf_path)
+                continue
+            
+            results.append(result)
+            
+            if "error" in result:
+                continue
+            if result["is_standard"]:
+                standard_files.append(result)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s %s (置信度: %.3f)", "✓ 标准文档:" if result["is_standard"] else "✗ 非标准:",
+                             os.path.basename(pdf_path), result["confidence"],
+                             extra={"fields": {"event": "prediction", "file_path": pdf_path,
+                                               "is_standard": result["is_standard"],
+                                               "confidence": result["confidence"]}})
+        
+        run_metrics = summarize_run(completions, time.perf_counter() - start, self.workers_used)
+        if len(self.device_roots) > 1:
+            run_metrics["devices"] = summarize_devices(completions, self.file_devices, self.device_roots,
+                                                       self.file_sizes, device_limits(PARALLEL_CONFIG["device_limits"]))
+        if self.worker_controller is not None:
+            run_metrics["final_workers"] = self.worker_controller.value
+            run_metrics["autotune"] = self.worker_controller.summary()
+        busy_seconds = sum(seconds for _, seconds, _ in completions)
+        run_metrics["prefetch"] = PREFETCH_CONFIG["enabled"]
+        run_metrics["io_wait_seconds"] = io_seconds
+        run_metrics["io_wait_ratio"] = io_seconds / busy_seconds if busy_seconds > 0 else 0.0
+        if throttle.current() is not None:
+            run_metrics["throttle"] = throttle.current().summary()
+        if time_budget:
+            run_metrics["budget"] = self._budget_summary(pdf_files, [path for _, _, path in completions], time_budget)
+        self.last_run_metrics = run_metrics
+        
+        # 处理扫描件队列（配置了OCR插件时识别后再预测）
+        ocr_results, scanned_files = self.process_scanned_queue(scanned_queue)
+        results.extend(ocr_results)
+        standard_files.extend(r for r in ocr_results if r["is_standard"])
+        self.index_results(ocr_results, scanned_files)
+        
+        metadata_decided = sum(1 for r in results if r.get("features", {}).get("decided_by") == "metadata")
         
-        print(f"\n预测完成:")
-        print(f"  总文件数: {len(pdf_files)}")
-        print(f"  标准文档: {len(standard_files)}")
-        print(f"  非标准文档: {len(pdf_files) - len(standard_files)}")
+        logger.info(f"\n预测完成:")
+        logger.info(f"  总文件数: {len(pdf_files)}")
+        logger.info(f"  标准文档: {len(standard_files)}")
+        logger.info(f"  非标准文档: {len(results) - len(standard_files)}")
+        logger.info(f"  元数据直接判定: {metadata_decided}")
+        logger.info(f"  扫描件: {len(scanned_queue)} (OCR识别 {len(ocr_results)}, 待处理 {len(scanned_files)})")
+        logger.info(f"  耗时: {run_metrics['wall_seconds']:.1f} 秒 ({run_metrics['files_per_second']:.1f} 文件/秒), "
+              f"单文件 p50/p95/最大: {run_metrics['latency_p50']:.2f}/{run_metrics['latency_p95']:.2f}/"
+              f"{run_metrics['latency_max']:.2f} 秒")
+        logger.info(f"  尾部延迟: 95%文件完成后又等待 {run_metrics['tail_seconds']:.1f} 秒")
+        logger.info(f"  I/O等待: {io_seconds:.1f} 秒 (占处理时间 {run_metrics['io_wait_ratio']:.1%}, "
+                    f"预读{'开启' if PREFETCH_CONFIG['enabled'] else '关闭'})")
+        if "throttle" in run_metrics:
+            logger.info(f"  限速: {throttle.format_summary(run_metrics['throttle'])}")
+        if "budget" in run_metrics:
+            budget = run_metrics["budget"]
+            logger.info(f"  时间预算 {budget['time_budget']:g} 秒{'已用完' if budget['stopped_early'] else '内完成'}: "
+                        f"处理 {budget['files_processed']}/{budget['files_total']} 个文件 "
+                        f"({budget['file_coverage']:.1%})"
+                        + (f", 估计覆盖 {budget['estimated_standard_coverage']:.1%} 的标准文档"
+                           if budget["estimated_standard_coverage"] is not None else ""))
+        for device in run_metrics.get("devices", []):
+            logger.info(f"  设备 {', '.join(device['roots'])}: {device['files']} 个文件 "
+                        f"({device['bytes'] / 1024 / 1024:.1f} MB), {device['finish_seconds']:.1f} 秒时完成")
+        if self.worker_controller is not None:
+            changes = sum(1 for d in self.worker_controller.decisions if d["from"] != d["to"])
+            logger.info(f"  自适应进程数: 最终 {self.worker_controller.value} 个 (调整 {changes} 次)")
         
         # 保存预测结果
-        if output_dir:
-            self.save_prediction_results(results, output_dir)
+        if output_dir and shard is not None:
+            path = write_shard_result(output_dir, shard["index"], shard["count"], shard["by"],
+                                      shard["root_dir"], self.simplify_results(results), scanned_files)
+            logger.info(f"分片结果已保存到: {path}")
+        elif output_dir:
+            self.save_prediction_results(results, output_dir, scanned_files, run_metrics)
+        
+        if self.result_index is not None:
+            logger.info(f"结果索引: {self.result_index.db_path} (python result_index.py --db \"{self.result_index.db_path}\" 查询)")
         
         return results
     
-    def copy_standard_files(self, results: List[Dict[str, Any]], output_dir: str):
-        """复制标准文档到输出目录"""
+    def process_scanned_queue(self, scanned_queue: List[str],
+                              cache_only: bool = False) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """处理扫描件队列，返回 (OCR后的预测结果, 未能识别的扫描件记录)
+        
+        未配置OCR插件时所有扫描件都记录为待处理；cache_only 时只使用缓存中的OCR结果。
+        """
+        ocr_results = []
+        scanned_files = []
+        
+        if scanned_queue and self.extractor.ocr_available:
+            logger.info(f"开始OCR识别 {len(scanned_queue)} 个扫描件...")
+        
+        for pdf_path in scanned_queue:
+            filename = os.path.basename(pdf_path)
+            record = {
+                "file_path": pdf_path,
+                "filename": filename,
+                "standard_type": self.extractor.extract_filename_features(filename)["standard_type"]
+            }
+            
+            if not self.extractor.ocr_available:
+                scanned_files.append(record)
+                continue
+            
+            if cache_only:
+                pages = self.extractor.extract_ocr_pages(pdf_path, cache_only=True)
+                if pages is None:
+                    scanned_files.append(record)
+                    continue
+                features = self.extractor.build_features_from_pages(pdf_path, pages)
+                features["text_source"] = "ocr"
+            else:
+                features = self.extractor.extract_ocr_features(pdf_path)
+            
+            if "error" in features["content_features"]:
+                record["error"] = features["content_features"]["error"]
+                scanned_files.append(record)
+                continue
+            
+            is_standard, probability = self.predict_features(features)
+            ocr_results.append({
+                "file_path": pdf_path,
+                "filename": filename,
+                "is_standard": is_standard,
+                "confidence": probability,
+                "features": features
+            })
+        
+        return ocr_results, scanned_files
+    
+    def find_duplicates(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在标准文档中查找近似重复组（每组一个代表文件）"""
+        return group_results([r for r in results if r["is_standard"]], self.file_sizes)
+    
+    def known_catalog(self, output_dir: str, standard_files: List[Dict[str, Any]]) -> StandardCatalog:
+        """已知标准目录：保存的目录文件、参考目录（默认 pdfs/标准）和输出目录中以前的预测结果，补充本次的标准文档后保存"""
+        catalog = StandardCatalog.build(None, [os.path.join(output_dir, "prediction_results.json")],
+                                        CATALOG_CONFIG["catalog_file"])
+        for result in standard_files:
+            code = result_code(result)
+            if code is not None:
+                catalog.add(code, result["file_path"])
+        if CATALOG_CONFIG["catalog_file"]:
+            try:
+                catalog.save(CATALOG_CONFIG["catalog_file"])
+            except OSError as e:
+                logger.warning(f"保存已知标准目录失败: {e}")
+        logger.info(f"已知标准目录: {len(catalog)} 个标准")
+        return catalog
+    
+    def copy_standard_files(self, results: List[Dict[str, Any]], output_dir: str, dedup: bool = None,
+                            threads=None, mode: str = None, latest_only: bool = None) -> Optional[Dict[str, Any]]:
+        """把标准文档放到输出目录；dedup 为 True 时近似重复的文件每组只放置代表文件，
+        latest_only 为 True 时（默认取 CATALOG_CONFIG）同一标准编号只放置最新版本，已知标准目录中已有更新版本的也跳过
+
+        mode 为输出方式（默认取 OUTPUT_CONFIG["mode"]）：复制、硬链接、克隆、符号链接或只写清单，
+        不支持时自动退回复制。threads 为复制线程数（默认取 PARALLEL_CONFIG["copy_threads"]），
+        "auto" 时按复制速度自动调整。返回各方法的文件数和写入字节数（同时写入 prediction_stats.json）。
+        """
+        if dedup is None:
+            dedup = DEDUP_CONFIG["copy_representative_only"]
+        if latest_only is None:
+            latest_only = CATALOG_CONFIG["latest_only"]
+        if threads is None:
+            threads = PARALLEL_CONFIG["copy_threads"]
+        placer = FilePlacer(mode)
         standard_files = [r for r in results if r["is_standard"]]
         
         if not standard_files:
-            print("没有找到标准文档")
-            return
+            logger.info("没有找到标准文档")
+            return None
         
         os.makedirs(output_dir, exist_ok=True)
         
-        print(f"开始复制 {len(standard_files)} 个标准文档到 {output_dir}...")
+        if latest_only:
+            versions = superseded_versions(standard_files, self.file_sizes, self.known_catalog(output_dir, standard_files))
+            skipped = {s["file_path"] for item in versions for s in item["superseded"]}
+            standard_files = [r for r in standard_files if r["file_path"] not in skipped]
+            logger.info(f"旧版本: {len(versions)} 个标准有更新版本, 跳过 {len(skipped)} 个文件, "
+                  f"节省 {sum(item['bytes_saved'] for item in versions) / 1024 / 1024:.1f} MB 复制")
         
-        copied_count = 0
-        for result in tqdm(standard_files, desc="复制进度"):
-            try:
-                source_path = result["file_path"]
-                filename = result["filename"]
-                
-                # 处理文件名冲突
-                target_path = os.path.join(output_dir, filename)
-                counter = 1
-                while os.path.exists(target_path):
-                    name, ext = os.path.splitext(filename)
-                    target_path = os.path.join(output_dir, f"{name}_{counter}{ext}")
-                    counter += 1
-                
-                # 复制文件
-                shutil.copy2(source_path, target_path)
-                copied_count += 1
-                
-            except Exception as e:
-                print(f"复制失败 {result['filename']}: {e}")
-        
-        print(f"复制完成，成功复制 {copied_count} 个文件")
-    
-    def save_prediction_results(self, results: List[Dict[str, Any]], output_dir: str):
-        """保存预测结果"""
-        os.makedirs(output_dir, exist_ok=True)
+        if dedup:
+            groups = self.find_duplicates(standard_files)
+            skipped = {d["file_path"] for group in groups for d in group["duplicates"]}
+            standard_files = [r for r in standard_files if r["file_path"] not in skipped]
+            logger.info(f"近似重复: {len(groups)} 组, 跳过 {len(skipped)} 个文件, "
+                  f"节省 {sum(g['bytes_saved'] for g in groups) / 1024 / 1024:.1f} MB 复制")
         
-        # 保存详细结果
-        results_path = os.path.join(output_dir, "prediction_results.json")
+        manifest_path = manifest_path_for(output_dir)
+        if placer.mode == "manifest":
+            # 只写清单，不放置文件
+            entries = []
+            for result in standard_files:
+                placer.record("manifest", file_size(result["file_path"], self.file_sizes))
+                entries.append(manifest_entry(result["file_path"], None, "manifest"))
+            placer.write_manifest(manifest_path, entries)
+            logger.info(f"已写出 {len(entries)} 个标准文档的清单: {manifest_path}")
+            return self._record_output_summary(output_dir, placer)
+        
+        logger.info(f"开始{'复制' if placer.mode == 'copy' else f'放置（{placer.mode}）'} "
+                    f"{len(standard_files)} 个标准文档到 {output_dir}...")
+        
+        # 处理文件名冲突：目标路径在提交复制前按顺序确定，多线程复制时结果与单线程相同
+        copies = []
+        reserved = set()
+        for result in standard_files:
+            filename = result["filename"]
+            target_path = os.path.join(output_dir, filename)
+            counter = 1
+            while target_path in reserved or os.path.lexists(target_path):
+                name, ext = os.path.splitext(filename)
+                target_path = os.path.join(output_dir, f"{name}_{counter}{ext}")
+                counter += 1
+            reserved.add(target_path)
+            copies.append((result["file_path"], target_path))
+        
+        controller = None
+        if threads == "auto":
+            controller = ConcurrencyController("复制线程", min(4, AUTOTUNE_CONFIG["max_copy_threads"]), 1,
+                                               AUTOTUNE_CONFIG["max_copy_threads"], by_bytes=True, logger=logger)
+            threads = AUTOTUNE_CONFIG["max_copy_threads"]
+            window = lambda: controller.value
+        else:
+            threads = max(1, threads)
+            window = lambda: threads
+        
+        placed = {}
+        progress = ProgressReporter(logger, len(standard_files), "复制进度" if placer.mode == "copy" else "输出进度",
+                                    sum(self.file_sizes.get(r["file_path"], 0) for r in standard_files),
+                                    status=self._throttle_status())
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for (source_path, target_path), future in iter_windowed(executor, lambda paths: placer.place(*paths),
+                                                                    copies, window):
+                nbytes = file_size(source_path, self.file_sizes)
+                try:
+                    placed[target_path] = manifest_entry(source_path, target_path, *future.result())
+                except Exception as e:
+                    logger.warning(f"复制失败 {os.path.basename(source_path)}: {e}")
+                    placed[target_path] = manifest_entry(source_path, target_path, None, error=str(e))
+                progress.update(1, nbytes)
+                if controller is not None:
+                    controller.update(1, nbytes)
         
-        # 简化结果以便JSON序列化
+        progress.close()
+        placer.write_manifest(manifest_path, [placed[target_path] for _, target_path in copies])
+        logger.info(f"输出完成: {placer.describe()}"
+                    + (f" (复制线程最终 {controller.value} 个)" if controller is not None else ""))
+        return self._record_output_summary(output_dir, placer)
+    
+    def _record_output_summary(self, output_dir: str, placer: FilePlacer) -> Dict[str, Any]:
+        """把输出方式的统计写入 prediction_stats.json（output 一项）和本次运行指标"""
+        summary = placer.summary()
+        if throttle.current() is not None:
+            summary["throttle"] = throttle.current().summary()
+            logger.info(f"限速: {throttle.format_summary(summary['throttle'])}")
+        if self.last_run_metrics is not None:
+            self.last_run_metrics["output"] = summary
+        stats_path = os.path.join(output_dir, "prediction_stats.json")
+        if os.path.exists(stats_path):
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+            stats["output"] = summary
+            with open(stats_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+        return summary
+    
+    def simplify_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """简化结果以便JSON序列化"""
         simplified_results = []
         for result in results:
             simplified_result = {
@@ -160,72 +702,258 @@ class StandardPredictor:
                 "confidence": result["confidence"]
             }
             
+            if "category" in result:
+                simplified_result["category"] = result["category"]
+                simplified_result["category_confidence"] = result["category_confidence"]
+            
             # 添加特征信息（简化）
             if "features" in result:
                 features = result["features"]
                 simplified_result["standard_type"] = features.get("filename_features", {}).get("standard_type")
+                simplified_result["standard_code"] = features.get("filename_features", {}).get("standard_code")
+                simplified_result["year"] = features.get("filename_features", {}).get("year")
                 simplified_result["ev_related"] = features.get("filename_features", {}).get("ev_related")
                 simplified_result["text_length"] = features.get("content_features", {}).get("text_length", 0)
+                simplified_result["decided_by"] = features.get("decided_by", "text")
+                if "catalog_code" in features:
+                    simplified_result["catalog_code"] = features["catalog_code"]
+                if "text_source" in features:
+                    simplified_result["text_source"] = features["text_source"]
+                if "minhash" in features:
+                    simplified_result["minhash"] = features["minhash"]
+            elif "minhash" in result:
+                simplified_result["minhash"] = result["minhash"]
             
             if "error" in result:
                 simplified_result["error"] = result["error"]
             
             simplified_results.append(simplified_result)
         
+        return simplified_results
+    
+    def save_prediction_results(self, results: List[Dict[str, Any]], output_dir: str,
+                                scanned_files: List[Dict[str, Any]] = None,
+                                run_metrics: Dict[str, Any] = None):
+        """保存预测结果（扫描件单独保存，不计入统计）"""
+        self.write_prediction_outputs(self.simplify_results(results), output_dir, scanned_files, run_metrics)
+    
+    def write_prediction_outputs(self, results: List[Dict[str, Any]], output_dir: str,
+                                 scanned_files: List[Dict[str, Any]] = None,
+                                 run_metrics: Dict[str, Any] = None):
+        """写出（已简化的）详细结果、标准文档列表、扫描件列表、近似重复组和统计信息"""
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 近似重复组（签名只用于分组，不写入结果文件）
+        duplicate_groups = self.find_duplicates(results)
+        results = [{k: v for k, v in r.items() if k != "minhash"} for r in results]
+        
+        # 保存详细结果
+        results_path = os.path.join(output_dir, "prediction_results.json")
         with open(results_path, 'w', encoding='utf-8') as f:
-            json.dump(simplified_results, f, ensure_ascii=False, indent=2)
+            json.dump(results, f, ensure_ascii=False, indent=2)
         
         # 保存标准文档列表
-        standard_files = [r for r in simplified_results if r["is_standard"]]
+        standard_files = [r for r in results if r["is_standard"]]
         standard_list_path = os.path.join(output_dir, "standard_files.json")
         with open(standard_list_path, 'w', encoding='utf-8') as f:
             json.dump(standard_files, f, ensure_ascii=False, indent=2)
         
+        # 保存近似重复组
+        duplicates_path = os.path.join(output_dir, "duplicate_groups.json")
+        with open(duplicates_path, 'w', encoding='utf-8') as f:
+            json.dump(duplicate_groups, f, ensure_ascii=False, indent=2)
+        
+        # 保存扫描件队列
+        scanned_files = scanned_files or []
+        scanned_list_path = os.path.join(output_dir, "scanned_files.json")
+        with open(scanned_list_path, 'w', encoding='utf-8') as f:
+            json.dump(scanned_files, f, ensure_ascii=False, indent=2)
+        
         # 生成统计报告
+        metadata_decided = sum(1 for r in results if r.get("decided_by") == "metadata")
         stats = {
             "total_files": len(results),
             "standard_files": len(standard_files),
             "non_standard_files": len(results) - len(standard_files),
             "standard_ratio": len(standard_files) / len(results) if results else 0,
+            "metadata_decided": metadata_decided,
+            "metadata_decided_ratio": metadata_decided / len(results) if results else 0,
+            "scanned_files": len(scanned_files),
+            "ocr_files": sum(1 for r in results if r.get("text_source") == "ocr"),
+            "duplicate_groups": len(duplicate_groups),
+            "duplicate_files": sum(len(g["duplicates"]) for g in duplicate_groups),
+            "duplicate_bytes": sum(g["bytes_saved"] for g in duplicate_groups),
             "confidence_stats": {
-                "min": min(r["confidence"] for r in results),
-                "max": max(r["confidence"] for r in results),
+                "min": min((r["confidence"] for r in results), default=0.0),
+                "max": max((r["confidence"] for r in results), default=0.0),
                 "avg": sum(r["confidence"] for r in results) / len(results) if results else 0
             }
         }
+        if run_metrics is not None:
+            stats["run_metrics"] = run_metrics
         
         stats_path = os.path.join(output_dir, "prediction_stats.json")
         with open(stats_path, 'w', encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
         
-        print(f"预测结果已保存到: {output_dir}")
-        print(f"  - 详细结果: {results_path}")
-        print(f"  - 标准文档列表: {standard_list_path}")
-        print(f"  - 统计信息: {stats_path}")
+        logger.info(f"预测结果已保存到: {output_dir}")
+        logger.info(f"  - 详细结果: {results_path}")
+        logger.info(f"  - 标准文档列表: {standard_list_path}")
+        logger.info(f"  - 扫描件列表: {scanned_list_path}")
+        logger.info(f"  - 近似重复组: {duplicates_path}")
+        logger.info(f"  - 统计信息: {stats_path}")
         
         # 打印统计信息
-        print(f"\n统计信息:")
-        print(f"  总文件数: {stats['total_files']}")
-        print(f"  标准文档: {stats['standard_files']}")
-        print(f"  非标准文档: {stats['non_standard_files']}")
-        print(f"  标准文档比例: {stats['standard_ratio']:.2%}")
-        print(f"  置信度范围: {stats['confidence_stats']['min']:.3f} - {stats['confidence_stats']['max']:.3f}")
-        print(f"  平均置信度: {stats['confidence_stats']['avg']:.3f}")
-    
-    def predict_and_copy(self, root_dir: str, output_dir: str = None):
-        """预测并复制标准文档的完整流程"""
+        logger.info(f"\n统计信息:")
+        logger.info(f"  总文件数: {stats['total_files']}")
+        logger.info(f"  标准文档: {stats['standard_files']}")
+        logger.info(f"  非标准文档: {stats['non_standard_files']}")
+        logger.info(f"  标准文档比例: {stats['standard_ratio']:.2%}")
+        logger.info(f"  元数据直接判定: {stats['metadata_decided']} ({stats['metadata_decided_ratio']:.2%})")
+        logger.info(f"  扫描件（未计入）: {stats['scanned_files']}, OCR识别: {stats['ocr_files']}")
+        logger.info(f"  近似重复: {stats['duplicate_groups']} 组 {stats['duplicate_files']} 个文件, "
+              f"去重可节省 {stats['duplicate_bytes'] / 1024 / 1024:.1f} MB")
+        logger.info(f"  置信度范围: {stats['confidence_stats']['min']:.3f} - {stats['confidence_stats']['max']:.3f}")
+        logger.info(f"  平均置信度: {stats['confidence_stats']['avg']:.3f}")
+    
+    def rescore_from_cache(self, output_dir: str, root_dir: str = None) -> List[Dict[str, Any]]:
+        """仅使用文本缓存重新计算内容特征、置信度、预测结果和分类（不解析PDF）"""
+        if not self.loaded:
+            raise ValueError("模型未加载，请先调用 load_model()")
+        
+        text_cache = self.extractor.text_cache
+        if text_cache is None:
+            raise ValueError("未配置文本缓存，无法重新评分")
+        
+        max_pages = MODEL_CONFIG["max_pages_to_extract"]
+        settings = self.extractor.extraction_settings()
+        # 先只列出条目文件，再逐个读取，内存中不同时保留所有文件的逐页文本
+        entry_paths = text_cache.entry_paths(settings, root_dir)
+        
+        logger.info(f"从文本缓存重新评分 {len(entry_paths)} 个PDF文件...")
+        
+        results = []
+        scanned_queue = []
+        # 细分类别（与 pdf_standard_classifier 相同的规则和类别模型，取前3页），每 batch_size 个文件批量分类
+        to_classify = []
+        batch_size = max(1, CATEGORY_MODEL_CONFIG["batch_size"])
+        
+        def classify_pending():
+            categories = classify_texts([(result["filename"], text) for result, text in to_classify])
+            for (result, _), (category, category_confidence) in zip(to_classify, categories):
+                result["category"] = category
+                result["category_confidence"] = category_confidence
+            to_classify.clear()
+        
+        progress = ProgressReporter(logger, len(entry_paths), "重新评分")
+        for entry_path in entry_paths:
+            progress.update()
+            entry = text_cache.read_entry(entry_path)
+            if entry is None:
+                continue
+            pdf_path = entry["file_path"]
+            pages = entry["pages"]
+            
+            if self.extractor.detect_scanned and entry.get("scanned", False):
+                scanned_queue.append(pdf_path)
+                continue
+            
+            features = self.extractor.build_features_from_pages(pdf_path, pages[:max_pages],
+                                                                 metadata=entry.get("metadata"))
+            is_standard, probability = self.predict_features(features)
+            
+            result = {
+                "file_path": pdf_path,
+                "filename": os.path.basename(pdf_path),
+                "is_standard": is_standard,
+                "confidence": probability,
+                "features": features
+            }
+            
+            text = pages_to_text(pages[:3])
+            if text:
+                to_classify.append((result, text))
+                if len(to_classify) >= batch_size:
+                    classify_pending()
+            
+            results.append(result)
+        
+        classify_pending()
+        progress.close()
+        
+        # 扫描件只使用缓存中的OCR结果
+        ocr_results, scanned_files = self.process_scanned_queue(scanned_queue, cache_only=True)
+        results.extend(ocr_results)
+        
+        if results or scanned_files:
+            self.save_prediction_results(results, output_dir, scanned_files)
+            if INDEX_CONFIG["enabled"]:
+                self.result_index = ResultIndex(index_path_for(output_dir))
+                self.index_results(results, scanned_files)
+        else:
+            logger.info("文本缓存中没有可重新评分的文件")
+        
+        return results
+    
+    def merge_shards(self, output_dir: str = None, copy: bool = True) -> List[Dict[str, Any]]:
+        """合并各节点的分片结果为 prediction_results.json/prediction_stats.json，并复制标准文档（无需加载模型）"""
+        if output_dir is None:
+            output_dir = OUTPUT_DIR
+        
+        results, scanned_files = load_shard_results(output_dir)
+        logger.info(f"合并分片结果: {len(results)} 个文件, {len(scanned_files)} 个扫描件")
+        
+        self.write_prediction_outputs(results, output_dir, scanned_files)
+        
+        if INDEX_CONFIG["enabled"]:
+            index = ResultIndex(index_path_for(output_dir))
+            index.upsert(results)
+            index.upsert(dict(record, scanned=True) for record in scanned_files)
+            index.close()
+        
+        if copy:
+            self.copy_standard_files(results, output_dir)
+        
+        return results
+    
+    def predict_and_copy(self, root_dir, output_dir: str = None,
+                         shard: Tuple[int, int] = None, shard_by: str = "hash"):
+        """预测并复制标准文档的完整流程
+        
+        root_dir 可以是多个目录（如本地磁盘、U盘和网络共享），结果合并写入同一个输出目录。
+        开启目录优先级或指定时间预算时按各目录的历史命中率排列文件，运行后更新命中记录。
+        指定 shard=(i, K) 时只处理第 i 个分片（按路径哈希或目录划分，只支持单个目录），结果保存为分片结果文件，
+        不复制文件；所有分片完成后用 merge_shards 合并并复制。
+        """
         if output_dir is None:
             output_dir = OUTPUT_DIR
         
-        # 扫描PDF文件
-        pdf_files = self.scan_pdf_files(root_dir)
+        # 扫描PDF文件（输出目录在目标目录内时跳过，避免重复扫描已复制的文件）
+        pdf_files = self.scan_pdf_files(root_dir, exclude_paths=[output_dir])
+        
+        if shard is not None:
+            shard_index, num_shards = shard
+            pdf_files = filter_shard(pdf_files, root_dir, shard_index, num_shards, shard_by)
+            logger.info(f"分片 {shard_index}/{num_shards}（按{'目录' if shard_by == 'dir' else '路径哈希'}划分）: "
+                  f"{len(pdf_files)} 个文件")
+            
+            # 空分片也要写出结果文件，合并时据此确认所有分片都已完成
+            shard_info = {"index": shard_index, "count": num_shards, "by": shard_by, "root_dir": root_dir}
+            return self.predict_batch_files(pdf_files, output_dir, shard=shard_info)
         
         if not pdf_files:
-            print("未找到PDF文件")
+            logger.info("未找到PDF文件")
             return
         
+        # 按目录的历史命中率排列（指定时间预算时总是排列，到时停止后已处理的是最可能为标准文档的部分）
+        self.priority_scores = None
+        if PRIORITY_CONFIG["enabled"] or PRIORITY_CONFIG["time_budget"]:
+            pdf_files = self.prioritize_files(pdf_files, output_dir)
+        
         # 批量预测
         results = self.predict_batch_files(pdf_files, output_dir)
+        budget = self.last_run_metrics.get("budget") if self.last_run_metrics else None
+        self.record_hit_rates(results, partial=bool(budget and budget["stopped_early"]))
         
         # 复制标准文档
         self.copy_standard_files(results, output_dir)
@@ -0,0 +1,173 @@
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Callable, BinaryIO
+from config import PREFETCH_CONFIG
+from archive import is_member_path, open_member
+import throttle
+
+
+def _open_file(path: str) -> BinaryIO:
+    """打开源文件（基准测试中替换为模拟慢速设备的实现）；压缩包成员从压缩包中解压读取"""
+    throttle.acquire("open")
+    if is_member_path(path):
+        return open_member(path)
+    return open(path, 'rb')
+
+
+class IOStats:
+    """累计读取源文件的阻塞时间、调用次数和字节数"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.bytes = 0
+
+    def add(self, seconds: float, nbytes: int = 0):
+        self.seconds += seconds
+        self.calls += 1
+        self.bytes += nbytes
+
+
+class TimedFile:
+    """记录 read/seek 阻塞时间的文件包装（未预读的文件由解析器直接读取时使用）"""
+
+    def __init__(self, path: str, stats: IOStats):
+        start = time.perf_counter()
+        self._raw = _open_file(path)
+        self._stats = stats
+        stats.add(time.perf_counter() - start)
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self._raw.read(size)
+        throttle.acquire("read", len(data))
+        self._stats.add(time.perf_counter() - start, len(data))
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        start = time.perf_counter()
+        position = self._raw.seek(offset, whence)
+        self._stats.add(time.perf_counter() - start)
+        return position
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+    def close(self):
+        self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+def open_source(path: str, data: Optional[bytes], stats: IOStats) -> BinaryIO:
+    """解析器使用的文件对象：已预读时从内存读取，否则直接读取文件并计时"""
+    if data is not None:
+        return io.BytesIO(data)
+    return TimedFile(path, stats)
+
+
+def read_file(path: str) -> bytes:
+    """整个文件顺序读入内存（大块读取，慢速设备上远少于解析器的随机小读取次数；限速时分块读取）"""
+    with _open_file(path) as f:
+        if not throttle.limited("read"):
+            return f.read()
+        buffer = io.BytesIO()
+        throttle.copy_stream(f, buffer, "read")
+        return buffer.getvalue()
+
+
+def advise_file(path: str) -> None:
+    """超过单文件上限的文件不读入内存，只提示内核预读（posix_fadvise WILLNEED，不支持的平台和压缩包成员不做任何事）"""
+    if not hasattr(os, "posix_fadvise") or is_member_path(path):
+        return None
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+    return None
+
+
+class Prefetcher:
+    """预读：I/O线程池按处理顺序提前把后续文件读入内存，解析器直接使用内存中的内容
+
+    同时在途的文件数不超过 depth，已读入（含正在解析）的字节数不超过 max_bytes（至少保留一个文件）；
+    should_read 返回 False 的文件（如文本缓存已命中）不读取。
+    迭代产出 (文件路径, 文件内容或None, 等待预读完成的秒数)。
+    """
+
+    def __init__(self, paths: Iterable[str], should_read: Callable[[str], bool] = None,
+                 file_sizes: Dict[str, int] = None, depth: int = None, max_bytes: int = None,
+                 max_file_bytes: int = None, threads: int = None):
+        self.paths = paths
+        self.should_read = should_read
+        self.file_sizes = file_sizes or {}
+        self.depth = depth or PREFETCH_CONFIG["depth"]
+        self.max_bytes = max_bytes or PREFETCH_CONFIG["max_bytes"]
+        self.max_file_bytes = min(max_file_bytes or PREFETCH_CONFIG["max_file_bytes"], self.max_bytes)
+        self.threads = threads or PREFETCH_CONFIG["threads"]
+
+    def _size(self, path: str) -> int:
+        if path in self.file_sizes:
+            return self.file_sizes[path]
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def __iter__(self) -> Iterator[Tuple[str, Optional[bytes], float]]:
+        paths = iter(self.paths)
+        pending = deque()
+        buffered = 0
+        upcoming = None
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            def fill():
+                nonlocal buffered, upcoming
+                while len(pending) < self.depth:
+                    if upcoming is None:
+                        upcoming = next(paths, None)
+                        if upcoming is None:
+                            return
+                    path = upcoming
+                    if self.should_read is not None and not self.should_read(path):
+                        pending.append((path, None, 0))
+                    else:
+                        size = self._size(path)
+                        if size > self.max_file_bytes:
+                            pending.append((path, executor.submit(advise_file, path), 0))
+                        elif buffered and buffered + size > self.max_bytes:
+                            # 内存上限已满，等前面的文件处理完再继续预读
+                            return
+                        else:
+                            buffered += size
+                            pending.append((path, executor.submit(read_file, path), size))
+                    upcoming = None
+
+            try:
+                fill()
+                while pending:
+                    path, future, size = pending.popleft()
+                    data = None
+                    wait = 0.0
+                    if future is not None:
+                        start = time.perf_counter()
+                        try:
+                            data = future.result()
+                        except OSError:
+                            # 读取失败时交给解析器直接打开文件，由它报告错误
+                            data = None
+                        wait = time.perf_counter() - start
+                    fill()
+                    yield path, data, wait
+                    buffered -= size
+                    fill()
+            finally:
+                # 调用方提前结束（如到达时间预算）时，尚未开始的预读不再执行
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
@@ -0,0 +1,147 @@
+import os
+import json
+import math
+from typing import Dict, Any, Callable, Iterable, List, Optional
+from config import PRIORITY_CONFIG
+
+
+def parse_duration(text: str) -> float:
+    """解析时长参数：秒数，或带 s/m/h 后缀，如 90m、2h、1.5h"""
+    text = text.strip().lower()
+    scale = {"s": 1, "m": 60, "h": 3600}.get(text[-1:], None)
+    value = float(text[:-1] if scale else text) * (scale or 1)
+    if value <= 0:
+        raise ValueError(f"时长应大于0，实际为: {text}")
+    return value
+
+
+def _dir_key(path: str) -> str:
+    return os.path.normcase(os.path.dirname(path))
+
+
+def _ancestors(directory: str) -> List[str]:
+    """从最上层到 directory 本身的各级目录"""
+    chain = []
+    while directory and directory not in chain:
+        chain.append(directory)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return list(reversed(chain))
+
+
+class DirectoryPriority:
+    """按历史命中率排列待处理的文件：标准文档集中的目录和像标准编号的文件名排在前面
+
+    每个目录记录上次运行时其中的文件数和标准文档数；估计命中率时从最上层目录逐级向下收缩：
+    每一级的命中率为 (该子树的标准文档数 + prior_weight × 上一级的命中率) / (该子树的文件数 + prior_weight)，
+    没有记录的目录沿用最近一级有记录的上级目录。文件名像标准编号时按 filename_boost 提高估计值。
+    """
+
+    def __init__(self, stats_path: Optional[str] = None, prior_weight: float = None,
+                 default_rate: float = None, filename_boost: float = None):
+        self.stats_path = stats_path
+        self.prior_weight = PRIORITY_CONFIG["prior_weight"] if prior_weight is None else prior_weight
+        self.default_rate = PRIORITY_CONFIG["default_rate"] if default_rate is None else default_rate
+        self.filename_boost = PRIORITY_CONFIG["filename_boost"] if filename_boost is None else filename_boost
+        # {目录: [文件数, 标准文档数]}（只记录直接位于该目录中的文件）
+        self.dirs = {}
+        self._subtree = None
+        if stats_path and os.path.exists(stats_path):
+            try:
+                with open(stats_path, 'r', encoding='utf-8') as f:
+                    self.dirs = json.load(f).get("dirs", {})
+            except (OSError, ValueError):
+                self.dirs = {}
+
+    def load_results(self, results_path: str) -> bool:
+        """从以前的 prediction_results.json 导入各目录的命中情况（没有统计文件时使用）"""
+        try:
+            with open(results_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.update(results)
+        return True
+
+    def update(self, results: Iterable[Dict[str, Any]], partial: bool = False):
+        """用本次运行的结果更新各目录的记录
+
+        完整运行时直接替换出现过的目录的记录；partial（按时间预算提前结束）时目录中的文件可能没有处理完，
+        每项取本次与原记录中较大的值。
+        """
+        counts = {}
+        for result in results:
+            if "error" in result or result.get("scanned"):
+                continue
+            entry = counts.setdefault(_dir_key(result["file_path"]), [0, 0])
+            entry[0] += 1
+            entry[1] += 1 if result.get("is_standard") else 0
+        for directory, (files, hits) in counts.items():
+            previous = self.dirs.get(directory)
+            if partial and previous is not None:
+                files, hits = max(files, previous[0]), max(hits, previous[1])
+            self.dirs[directory] = [files, hits]
+        self._subtree = None
+
+    def save(self):
+        if not self.stats_path:
+            return
+        directory = os.path.dirname(self.stats_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.stats_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dirs": self.dirs}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, self.stats_path)
+
+    def _subtree_counts(self) -> Dict[str, List[int]]:
+        """各目录整个子树的 [文件数, 标准文档数]"""
+        if self._subtree is None:
+            subtree = {}
+            for directory, (files, hits) in self.dirs.items():
+                for ancestor in _ancestors(directory):
+                    entry = subtree.setdefault(ancestor, [0, 0])
+                    entry[0] += files
+                    entry[1] += hits
+            self._subtree = subtree
+        return self._subtree
+
+    def directory_rate(self, directory: str) -> float:
+        """目录中文件为标准文档的估计概率"""
+        subtree = self._subtree_counts()
+        rate = self.default_rate
+        for ancestor in _ancestors(os.path.normcase(directory)):
+            if ancestor in subtree:
+                files, hits = subtree[ancestor]
+                rate = (hits + self.prior_weight * rate) / (files + self.prior_weight)
+        return rate
+
+    def scores(self, pdf_files: List[str], looks_standard: Callable[[str], bool]) -> Dict[str, float]:
+        """每个文件为标准文档的估计概率（同一目录只计算一次命中率）"""
+        rates = {}
+        scores = {}
+        for path in pdf_files:
+            directory = os.path.dirname(path)
+            if directory not in rates:
+                rates[directory] = self.directory_rate(directory)
+            score = rates[directory]
+            if looks_standard(os.path.basename(path)):
+                score += (1.0 - score) * self.filename_boost
+            scores[path] = score
+        return scores
+
+
+def prioritize(pdf_files: List[str], scores: Dict[str, float]) -> List[str]:
+    """按估计概率从高到低排列（相同时保持原顺序）"""
+    return sorted(pdf_files, key=lambda path: -scores.get(path, 0.0))
+
+
+def estimate_coverage(processed: Iterable[str], scores: Dict[str, float]) -> float:
+    """已处理的文件估计覆盖了全部标准文档的多大比例（按每个文件的估计概率加权）"""
+    # fsum 与求和顺序无关（集合的遍历顺序随字符串哈希变化），全部处理完时恰好为 1.0
+    total = math.fsum(scores.values())
+    if total <= 0:
+        return 0.0
+    return math.fsum(scores.get(path, 0.0) for path in set(processed)) / total
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF标准文档识别系统 - 结果索引
+将预测结果和标准信息写入带索引的SQLite数据库，按标准编号、类型、年份等快速查询，
+无需重新扫描或加载 prediction_results.json
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from typing import Dict, List, Any, Optional, Iterable
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import OUTPUT_DIR, INDEX_CONFIG
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    file_path TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    is_standard INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    standard_type TEXT,
+    standard_code TEXT,
+    year TEXT,
+    category TEXT,
+    category_confidence REAL,
+    decided_by TEXT,
+    text_source TEXT,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_code ON results(standard_code);
+CREATE INDEX IF NOT EXISTS idx_results_type_year ON results(standard_type, year);
+CREATE INDEX IF NOT EXISTS idx_results_standard ON results(is_standard, confidence);
+CREATE INDEX IF NOT EXISTS idx_results_filename ON results(filename);
+"""
+
+COLUMNS = [
+    "file_path", "filename", "is_standard", "confidence", "standard_type", "standard_code", "year",
+    "category", "category_confidence", "decided_by", "text_source", "scanned", "error", "indexed_at"
+]
+
+
+def index_path_for(output_dir: str) -> str:
+    """输出目录中的索引数据库路径"""
+    return os.path.join(output_dir, INDEX_CONFIG["db_file"])
+
+
+class ResultIndex:
+    """预测结果的SQLite索引
+
+    使用WAL模式，同一台机器上的多个进程（并行预测的工作进程、本地分片）可同时写入；
+    连接在首次使用时按进程创建，对象本身可以传给工作进程。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {"db_path": self.db_path}
+
+    def __setstate__(self, state):
+        self.__init__(state["db_path"])
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def upsert(self, results: Iterable[Dict[str, Any]]):
+        """写入或更新（已简化的）预测结果，同一文件路径只保留最新一条"""
+        now = time.time()
+        rows = []
+        for result in results:
+            rows.append((
+                result["file_path"],
+                result.get("filename") or os.path.basename(result["file_path"]),
+                int(bool(result.get("is_standard", False))),
+                float(result.get("confidence", 0.0)),
+                result.get("standard_type"),
+                result.get("standard_code"),
+                result.get("year"),
+                result.get("category"),
+                result.get("category_confidence"),
+                result.get("decided_by"),
+                result.get("text_source"),
+                int(bool(result.get("scanned", False))),
+                result.get("error"),
+                now
+            ))
+        if not rows:
+            return
+
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def query(self, code: Optional[str] = None, standard_type: Optional[str] = None,
+              year: Optional[str] = None, name: Optional[str] = None, standard_only: bool = False,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按条件查询；code 匹配完整编号或编号主体（如 27930 匹配 27930-2023）"""
+        conditions = []
+        params = []
+        if code:
+            conditions.append("(standard_code = ? OR standard_code GLOB ?)")
+            params.extend([code, f"{code}-*"])
+        if standard_type:
+            conditions.append("standard_type = ?")
+            params.append(standard_type)
+        if year:
+            conditions.append("year = ?")
+            params.append(year)
+        if name:
+            conditions.append("filename LIKE ?")
+            params.append(f"%{name}%")
+        if standard_only:
+            conditions.append("is_standard = 1")
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY standard_type, standard_code, file_path"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        return [dict(zip(COLUMNS, row)) for row in self.conn.execute(sql, params)]
+
+    def summary(self) -> Dict[str, Any]:
+        """按标准类型和年份汇总"""
+        total, standard, scanned = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(is_standard), 0), COALESCE(SUM(scanned), 0) FROM results").fetchone()
+        by_type = self.conn.execute(
+            "SELECT COALESCE(standard_type, '-'), COALESCE(year, '-'), COUNT(*) FROM results "
+            "WHERE is_standard = 1 GROUP BY standard_type, year ORDER BY standard_type, year").fetchall()
+        return {"total_files": total, "standard_files": standard, "scanned_files": scanned,
+                "by_type_year": by_type}
+
+
+def parse_code(text: str):
+    """解析查询的标准编号：可以是 27930、27930-2023，或 GB/T 27930-2023 这样带类型的完整写法"""
+    if re.fullmatch(r'[\d\-]+', text):
+        return None, text
+    from extractor import StandardFeatureExtractor
+    features = StandardFeatureExtractor(use_metadata=False).extract_filename_features(text)
+    return features["standard_type"], features["standard_code"] or text
+
+
+def main():
+    """查询命令行"""
+    parser = argparse.ArgumentParser(description="PDF标准文档识别系统 - 结果查询")
+    parser.add_argument("--db", default=index_path_for(OUTPUT_DIR), help="索引数据库路径")
+    parser.add_argument("--code", help="标准编号，如 27930、27930-2023 或 \"GB/T 27930\"")
+    parser.add_argument("--type", dest="standard_type", help="标准类型，如 GB、DB、NB、T、QGDW")
+    parser.add_argument("--year", help="年份")
+    parser.add_argument("--name", help="文件名包含的文字")
+    parser.add_argument("--standard-only", action="store_true", help="只显示判定为标准文档的文件")
+    parser.add_argument("--limit", type=int, default=None, help="最多显示的条数")
+    parser.add_argument("--summary", action="store_true", help="按标准类型和年份汇总")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"错误: 索引数据库不存在: {args.db}")
+        print("请先运行步骤3预测，或指定 --db")
+        sys.exit(1)
+
+    index = ResultIndex(args.db)
+
+    if args.summary:
+        start = time.perf_counter()
+        summary = index.summary()
+        elapsed = time.perf_counter() - start
+        print(f"总文件数: {summary['total_files']}, 标准文档: {summary['standard_files']}, "
+              f"扫描件: {summary['scanned_files']}")
+        for standard_type, year, count in summary["by_type_year"]:
+            print(f"  {standard_type:<6}{year:<6}{count:>8}")
+        print(f"\n查询耗时: {elapsed * 1000:.1f} ms")
+        return
+
+    standard_type = args.standard_type
+    code = args.code
+    if code:
+        parsed_type, code = parse_code(code)
+        standard_type = standard_type or parsed_type
+
+    start = time.perf_counter()
+    rows = index.query(code, standard_type, args.year, args.name, args.standard_only, args.limit)
+    elapsed = time.perf_counter() - start
+
+    for row in rows:
+        mark = "✓" if row["is_standard"] else ("□" if row["scanned"] else "✗")
+        label = " ".join(filter(None, [row["standard_type"], row["standard_code"]])) or "-"
+        print(f"{mark} {label:<18} {row['confidence']:.3f}  {row['file_path']}")
+    print(f"\n共 {len(rows)} 条, 查询耗时: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
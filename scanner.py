@@ -0,0 +1,286 @@
+import os
+import json
+import gzip
+import time
+import struct
+import fnmatch
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from config import SCAN_CONFIG, ARCHIVE_CONFIG
+from archive import member_path, container_path, list_zip_members
+from utils import get_logger
+
+logger = get_logger("scanner")
+
+# 文件处理顺序：walk 为目录遍历顺序，inode 按inode编号，extent 按文件第一个数据块的物理位置（Linux FIEMAP）
+ORDER_CHOICES = ("walk", "inode", "extent")
+
+# 目录列表缓存格式版本（文件项为 [文件名, 大小, inode]）
+LISTING_CACHE_VERSION = 2
+
+# Linux FIEMAP：struct fiemap 头部32字节，每个 fiemap_extent 56字节
+_FS_IOC_FIEMAP = 0xC020660B
+_FIEMAP_HEADER = struct.Struct("=QQLLLL")
+_FIEMAP_EXTENT = struct.Struct("=QQQQQLLLL")
+# 位置未知的数据块（如尚未写回磁盘的延迟分配）：FIEMAP_EXTENT_UNKNOWN | FIEMAP_EXTENT_DELALLOC
+_FIEMAP_EXTENT_UNKNOWN = 0x2 | 0x4
+
+
+def physical_offset(path: str) -> Optional[int]:
+    """文件第一个数据块在设备上的物理位置（字节）
+
+    平台或文件系统不支持 FIEMAP、文件为空或数据块位置尚未确定时返回None。
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    request = bytearray(_FIEMAP_HEADER.pack(0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0) + bytes(_FIEMAP_EXTENT.size))
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.ioctl(fd, _FS_IOC_FIEMAP, request, True)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    mapped_extents = _FIEMAP_HEADER.unpack_from(request)[3]
+    if mapped_extents == 0:
+        return None
+    extent = _FIEMAP_EXTENT.unpack_from(request, _FIEMAP_HEADER.size)
+    if extent[5] & _FIEMAP_EXTENT_UNKNOWN:
+        return None
+    return extent[1]
+
+
+def order_files(pdf_files: List[str], order: str, inodes: Dict[str, int] = None) -> List[str]:
+    """按处理顺序排列文件
+
+    机械硬盘上按inode或物理位置顺序读取接近顺序读，大幅减少寻道；
+    extent 顺序需要逐个打开文件查询，查询失败的文件按inode排在后面；
+    压缩包成员按压缩包的位置排列，同一压缩包的成员保持在压缩包中的顺序（排序是稳定的）。
+    """
+    if order == "walk":
+        return list(pdf_files)
+    if order not in ORDER_CHOICES:
+        raise ValueError(f"未知的文件顺序: {order}，可选: {', '.join(ORDER_CHOICES)}")
+
+    inodes = inodes or {}
+
+    def inode_of(path: str) -> int:
+        if path not in inodes:
+            try:
+                inodes[path] = os.stat(container_path(path)).st_ino
+            except OSError:
+                inodes[path] = 0
+        return inodes[path]
+
+    if order == "inode":
+        return sorted(pdf_files, key=inode_of)
+
+    keys = {}
+    offsets = {}
+    for path in pdf_files:
+        container = container_path(path)
+        if container not in offsets:
+            offsets[container] = physical_offset(container)
+        offset = offsets[container]
+        keys[path] = (0, offset) if offset is not None else (1, inode_of(path))
+    return sorted(pdf_files, key=keys.__getitem__)
+
+
+class PDFScanner:
+    """PDF文件扫描器
+
+    跳过系统目录、版本库目录和输出目录，支持包含/排除通配符和最大深度；
+    可选的目录列表缓存按目录修改时间判断，目录项没有变化的目录直接使用上次的列表，无需重新列出。
+    匹配 archive_globs 的ZIP压缩包展开为其中的PDF成员（只读取中央目录），成员列表按压缩包的大小和修改时间缓存。
+    """
+
+    # 修改时间距扫描开始不足该秒数的目录不写入缓存（FAT等文件系统时间精度为2秒）
+    RACY_SECONDS = 2.0
+
+    def __init__(self, exclude_dirs: Iterable[str] = (), include_globs: Iterable[str] = ("*.pdf",),
+                 exclude_globs: Iterable[str] = (), max_depth: Optional[int] = None,
+                 listing_cache_path: Optional[str] = None, order: str = "walk",
+                 archive_globs: Iterable[str] = ()):
+        self.exclude_dirs = [pattern.lower() for pattern in exclude_dirs]
+        self.include_globs = [pattern.lower() for pattern in include_globs]
+        self.exclude_globs = [pattern.lower() for pattern in exclude_globs]
+        self.archive_globs = [pattern.lower() for pattern in archive_globs]
+        self.max_depth = max_depth
+        self.listing_cache_path = listing_cache_path
+        self.order = order
+        self.file_sizes = {}
+        self.inodes = {}
+        self.stats = {}
+
+    @staticmethod
+    def _matches(value: str, patterns: List[str]) -> bool:
+        value = value.lower()
+        return any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+    def _is_excluded_dir(self, name: str, relative: str) -> bool:
+        return self._matches(name, self.exclude_dirs) or self._matches(relative, self.exclude_globs)
+
+    def _is_excluded_file(self, name: str, relative: str) -> bool:
+        return self._matches(name, self.exclude_globs) or self._matches(relative, self.exclude_globs)
+
+    def _load_listing_cache(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """返回 (目录列表, 压缩包成员列表)"""
+        if not self.listing_cache_path or not os.path.exists(self.listing_cache_path):
+            return {}, {}
+        try:
+            with gzip.open(self.listing_cache_path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, {}
+        # 包含规则或缓存格式变化后缓存的文件列表不再适用
+        if data.get("include_globs") != self.include_globs or data.get("version") != LISTING_CACHE_VERSION \
+                or data.get("archive_globs", []) != self.archive_globs:
+            return {}, {}
+        return data.get("dirs", {}), data.get("archives", {})
+
+    def _save_listing_cache(self, listings: Dict[str, Any], archives: Dict[str, Any]):
+        directory = os.path.dirname(self.listing_cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = json.dumps({"version": LISTING_CACHE_VERSION, "include_globs": self.include_globs,
+                           "archive_globs": self.archive_globs, "dirs": listings, "archives": archives},
+                          ensure_ascii=False, separators=(',', ':'))
+        temp_path = f"{self.listing_cache_path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wb', compresslevel=6) as f:
+            f.write(data.encode('utf-8'))
+        os.replace(temp_path, self.listing_cache_path)
+
+    def _list_dir(self, path: str) -> Tuple[List[str], List[List[Any]]]:
+        """列出目录：返回 (子目录名, [[PDF或压缩包文件名, 大小, inode], ...])"""
+        subdirs = []
+        files = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif self._matches(entry.name, self.include_globs) or \
+                            (self.archive_globs and self._matches(entry.name, self.archive_globs)):
+                        files.append([entry.name, entry.stat().st_size, entry.inode()])
+                except OSError:
+                    continue
+        return subdirs, files
+
+    def scan(self, root_dir: str, exclude_paths: Iterable[str] = ()) -> List[str]:
+        """扫描 root_dir 下的PDF文件；exclude_paths 中的目录（如输出目录）及其子目录自动跳过"""
+        excluded = {os.path.normcase(os.path.abspath(path)) for path in exclude_paths if path}
+        cached, cached_archives = self._load_listing_cache()
+        listings = {}
+        archives = {}
+        scan_start = time.time()
+
+        self.file_sizes = {}
+        self.inodes = {}
+        self.stats = {"dirs_listed": 0, "dirs_cached": 0, "dirs_skipped": 0, "archives": 0, "archive_members": 0}
+        pdf_files = []
+
+        root_key = os.path.normcase(os.path.abspath(root_dir))
+        pending = [(root_key, root_dir, "", 0)]
+        while pending:
+            key, path, relative, depth = pending.pop()
+            if key in excluded:
+                self.stats["dirs_skipped"] += 1
+                continue
+
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                entry = cached.get(key)
+                if entry is not None and entry["mtime_ns"] == mtime_ns:
+                    subdirs, files = entry["dirs"], entry["files"]
+                    self.stats["dirs_cached"] += 1
+                else:
+                    subdirs, files = self._list_dir(path)
+                    self.stats["dirs_listed"] += 1
+            except OSError:
+                continue
+
+            if mtime_ns / 1e9 < scan_start - self.RACY_SECONDS:
+                listings[key] = {"mtime_ns": mtime_ns, "dirs": subdirs, "files": files}
+
+            for name, size, inode in files:
+                file_relative = f"{relative}/{name}" if relative else name
+                if self.exclude_globs and self._is_excluded_file(name, file_relative):
+                    continue
+                file_path = os.path.join(path, name)
+                if self.archive_globs and self._matches(name, self.archive_globs):
+                    members = self._archive_members(os.path.join(key, os.path.normcase(name)), file_path,
+                                                    cached_archives, archives, scan_start)
+                    for member, member_size in members:
+                        member_name = member.rsplit("/", 1)[-1]
+                        if self.exclude_globs and self._is_excluded_file(
+                                member_name, f"{file_relative}!/{member}"):
+                            continue
+                        pdf_files.append(member_path(file_path, member))
+                        self.file_sizes[pdf_files[-1]] = member_size
+                        self.inodes[pdf_files[-1]] = inode
+                    self.stats["archives"] += 1
+                    self.stats["archive_members"] += len(members)
+                    continue
+                pdf_files.append(file_path)
+                self.file_sizes[file_path] = size
+                self.inodes[file_path] = inode
+
+            if self.max_depth is not None and depth >= self.max_depth:
+                continue
+            for name in reversed(subdirs):
+                dir_relative = f"{relative}/{name}" if relative else name
+                if self._is_excluded_dir(name, dir_relative):
+                    self.stats["dirs_skipped"] += 1
+                    continue
+                pending.append((os.path.join(key, os.path.normcase(name)), os.path.join(path, name),
+                                dir_relative, depth + 1))
+
+        if self.listing_cache_path:
+            # 保留其他扫描根目录的缓存条目
+            root_prefix = root_key.rstrip(os.sep) + os.sep
+            for key, value in cached.items():
+                if key not in listings and key != root_key and not key.startswith(root_prefix):
+                    listings[key] = value
+            for key, value in cached_archives.items():
+                if key not in archives and not key.startswith(root_prefix):
+                    archives[key] = value
+            try:
+                # 所有目录和压缩包都命中缓存时无需重写
+                if listings.keys() != cached.keys() or self.stats["dirs_listed"] or archives != cached_archives:
+                    self._save_listing_cache(listings, archives)
+            except OSError as e:
+                logger.warning(f"写入目录列表缓存失败: {e}")
+
+        return order_files(pdf_files, self.order, self.inodes)
+
+    def _archive_members(self, key: str, path: str, cached: Dict[str, Any],
+                         archives: Dict[str, Any], scan_start: float) -> List[List[Any]]:
+        """压缩包中的PDF成员 [[成员路径, 大小], ...]；压缩包大小和修改时间未变时使用缓存的列表"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+        entry = cached.get(key)
+        if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                     "members": list_zip_members(path, self.include_globs)}
+        if stat.st_mtime < scan_start - self.RACY_SECONDS:
+            archives[key] = entry
+        return entry["members"]
+
+
+def create_scanner() -> PDFScanner:
+    """按 SCAN_CONFIG 创建扫描器"""
+    return PDFScanner(
+        exclude_dirs=SCAN_CONFIG["exclude_dirs"],
+        include_globs=SCAN_CONFIG["include_globs"],
+        exclude_globs=SCAN_CONFIG["exclude_globs"],
+        max_depth=SCAN_CONFIG["max_depth"],
+        listing_cache_path=SCAN_CONFIG["listing_cache_file"],
+        order=SCAN_CONFIG["order"],
+        archive_globs=ARCHIVE_CONFIG["globs"] if ARCHIVE_CONFIG["enabled"] else ()
+    )
@@ -0,0 +1,152 @@
+import os
+from itertools import zip_longest
+from typing import Dict, List, Any, Optional, Tuple
+from config import MODEL_CONFIG, PARALLEL_CONFIG
+from archive import container_path
+
+
+def estimate_cost(size: int, cache_entry: Optional[Dict[str, Any]] = None) -> float:
+    """估算处理一个文件的开销（折算为字节）
+
+    文本缓存中已有足够页数的文件几乎只剩固定开销；已知总页数时按实际需要解析的页数比例折算文件大小。
+    """
+    overhead = PARALLEL_CONFIG["file_overhead_bytes"]
+    if cache_entry is None:
+        return overhead + size
+
+    max_pages = MODEL_CONFIG["max_pages_to_extract"]
+    pages = cache_entry.get("pages", [])
+    total_pages = cache_entry.get("total_pages")
+    if total_pages is None or cache_entry.get("scanned") or len(pages) >= min(max_pages, total_pages):
+        # 元数据直接判定、扫描件或缓存页数足够：不需要再解析PDF
+        return overhead
+    if total_pages > 0:
+        return overhead + size * min(max_pages, total_pages) / total_pages
+    return overhead + size
+
+
+def plan_tasks(costs: Dict[str, float], keep_order: bool = False) -> List[List[str]]:
+    """按估算开销从大到小排列任务，开销小的文件打包成批次
+
+    大文件最先提交，避免排在最后拖慢整个运行；小文件成批提交以减少进程间通信开销。
+    小文件保持传入的顺序打包（按inode或物理位置排序后，同一批次内的文件在磁盘上相邻）。
+    keep_order 时（如按目录优先级排列后）大文件不提前，所有任务保持传入的顺序。
+    """
+    small_cost = PARALLEL_CONFIG["small_file_bytes"]
+    batch_max_files = PARALLEL_CONFIG["batch_max_files"]
+    batch_max_cost = PARALLEL_CONFIG["batch_max_bytes"]
+
+    tasks = []
+    batch = []
+    batch_cost = 0.0
+    if not keep_order:
+        for path in sorted((p for p in costs if costs[p] >= small_cost), key=lambda p: (-costs[p], p)):
+            tasks.append([path])
+    for path in costs:
+        cost = costs[path]
+        if cost >= small_cost:
+            if keep_order:
+                tasks.append([path])
+            continue
+        batch.append(path)
+        batch_cost += cost
+        if len(batch) >= batch_max_files or batch_cost >= batch_max_cost:
+            tasks.append(batch)
+            batch, batch_cost = [], 0.0
+    if batch:
+        tasks.append(batch)
+    return tasks
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize_run(completions: List[Tuple[float, float, str]], wall_seconds: float,
+                  workers: int) -> Dict[str, Any]:
+    """汇总运行指标：completions 为 (完成时刻, 单文件耗时, 文件路径)，时刻从运行开始计，workers 为实际使用的进程数
+
+    tail_seconds 为95%的文件完成后到运行结束的时间，反映被个别慢文件拖住的尾部延迟。
+    """
+    latencies = sorted(seconds for _, seconds, _ in completions)
+    finish_times = sorted(finished for finished, _, _ in completions)
+    p95_finish = _percentile(finish_times, 0.95)
+    slowest = sorted(completions, key=lambda c: c[1], reverse=True)[:5]
+
+    return {
+        "workers": workers,
+        "files": len(completions),
+        "wall_seconds": wall_seconds,
+        "files_per_second": len(completions) / wall_seconds if wall_seconds > 0 else 0.0,
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "p95_finish_seconds": p95_finish,
+        "tail_seconds": max(0.0, wall_seconds - p95_finish),
+        "slowest_files": [{"file_path": path, "seconds": seconds} for _, seconds, path in slowest]
+    }
+
+
+def file_size(path: str, known_sizes: Dict[str, int]) -> int:
+    """文件大小（优先使用扫描时记录的大小）"""
+    if path in known_sizes:
+        return known_sizes[path]
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def device_of(path: str) -> int:
+    """路径所在的设备号（压缩包成员取压缩包所在的设备）；无法访问时为 -1"""
+    try:
+        return os.stat(container_path(path)).st_dev
+    except OSError:
+        return -1
+
+
+def device_limits(limits_by_path: Dict[str, int]) -> Dict[int, int]:
+    """把按路径配置的设备并发上限换算为按设备号（同一设备上配置了多个路径时取最小值）"""
+    limits = {}
+    for path, limit in limits_by_path.items():
+        device = device_of(path)
+        if device != -1:
+            limits[device] = min(limit, limits.get(device, limit))
+    return limits
+
+
+def interleave_devices(pdf_files: List[str], file_devices: Dict[str, int]) -> List[str]:
+    """各设备的文件轮流排列（设备内保持原顺序），单进程预读时多个设备同时读取"""
+    queues = {}
+    for path in pdf_files:
+        queues.setdefault(file_devices.get(path, -1), []).append(path)
+    if len(queues) <= 1:
+        return list(pdf_files)
+    ordered = []
+    for group in zip_longest(*queues.values()):
+        ordered.extend(path for path in group if path is not None)
+    return ordered
+
+
+def summarize_devices(completions: List[Tuple[float, float, str]], file_devices: Dict[str, int],
+                      device_roots: Dict[int, List[str]], known_sizes: Dict[str, int],
+                      limits: Dict[int, int] = None) -> List[Dict[str, Any]]:
+    """各设备的文件数、字节数、并发上限和完成时刻（整个运行在最慢的设备完成时结束）"""
+    limits = limits or {}
+    devices = {}
+    for finished, seconds, path in completions:
+        device = file_devices.get(path, -1)
+        entry = devices.setdefault(device, {"files": 0, "bytes": 0, "busy_seconds": 0.0, "finish_seconds": 0.0})
+        entry["files"] += 1
+        entry["bytes"] += known_sizes.get(path, 0)
+        entry["busy_seconds"] += seconds
+        entry["finish_seconds"] = max(entry["finish_seconds"], finished)
+    summary = []
+    for device, entry in sorted(devices.items(), key=lambda item: item[1]["finish_seconds"]):
+        summary.append(dict(entry, device=device, roots=device_roots.get(device, []), limit=limits.get(device),
+                            files_per_second=entry["files"] / entry["finish_seconds"]
+                            if entry["finish_seconds"] > 0 else 0.0))
+    return summary
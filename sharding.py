@@ -0,0 +1,105 @@
+import os
+import re
+import json
+import glob
+import hashlib
+from typing import Dict, List, Any, Tuple
+
+SHARD_BY_CHOICES = ("hash", "dir")
+SHARD_DIR = "shards"
+
+
+def parse_shard_spec(spec: str) -> Tuple[int, int]:
+    """解析 "i/K" 形式的分片参数（i 从0开始）"""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec)
+    if not match:
+        raise ValueError(f"分片参数格式应为 i/K，实际为: {spec}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片编号应满足 0 <= i < K，实际为: {spec}")
+    return index, count
+
+
+def shard_key(pdf_path: str, root_dir: str, shard_by: str = "hash") -> str:
+    """分片键：相对扫描根目录的路径（按目录分片时取所在目录），各节点挂载位置不同也能得到相同结果"""
+    relative = os.path.relpath(pdf_path, root_dir).replace(os.sep, "/")
+    if shard_by == "dir":
+        return os.path.dirname(relative)
+    if shard_by == "hash":
+        return relative
+    raise ValueError(f"未知的分片方式: {shard_by}，可选: {', '.join(SHARD_BY_CHOICES)}")
+
+
+def shard_of(pdf_path: str, root_dir: str, num_shards: int, shard_by: str = "hash") -> int:
+    """文件所属分片编号（确定性哈希，与进程和机器无关）"""
+    digest = hashlib.sha1(shard_key(pdf_path, root_dir, shard_by).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def filter_shard(pdf_files: List[str], root_dir: str, shard_index: int, num_shards: int,
+                 shard_by: str = "hash") -> List[str]:
+    """只保留属于指定分片的文件"""
+    return [path for path in pdf_files if shard_of(path, root_dir, num_shards, shard_by) == shard_index]
+
+
+def shard_result_path(output_dir: str, shard_index: int, num_shards: int) -> str:
+    """分片结果文件路径"""
+    return os.path.join(output_dir, SHARD_DIR, f"shard_{shard_index:03d}_of_{num_shards:03d}.json")
+
+
+def write_shard_result(output_dir: str, shard_index: int, num_shards: int, shard_by: str, root_dir: str,
+                       results: List[Dict[str, Any]], scanned_files: List[Dict[str, Any]]) -> str:
+    """保存分片结果（先写临时文件再原子替换，避免合并时读到写了一半的文件）"""
+    path = shard_result_path(output_dir, shard_index, num_shards)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    data = {
+        "shard_index": shard_index,
+        "num_shards": num_shards,
+        "shard_by": shard_by,
+        "root_dir": root_dir,
+        "results": results,
+        "scanned_files": scanned_files
+    }
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
+
+
+def load_shard_results(output_dir: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """读取并检查所有分片结果，返回合并后的 (预测结果, 扫描件记录)
+
+    分片数量或分片方式不一致、有分片缺失时抛出 ValueError。
+    """
+    paths = sorted(glob.glob(os.path.join(output_dir, SHARD_DIR, "shard_*_of_*.json")))
+    if not paths:
+        raise FileNotFoundError(f"没有找到分片结果: {os.path.join(output_dir, SHARD_DIR)}")
+
+    shards = {}
+    layouts = set()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        layouts.add((data["num_shards"], data["shard_by"]))
+        shards[data["shard_index"]] = data
+
+    if len(layouts) != 1:
+        raise ValueError(f"分片结果的分片数量或分片方式不一致: {sorted(layouts)}")
+
+    num_shards, _ = layouts.pop()
+    missing = [i for i in range(num_shards) if i not in shards]
+    if missing:
+        raise ValueError(f"缺少分片结果: {', '.join(f'{i}/{num_shards}' for i in missing)}")
+
+    results = []
+    scanned_files = []
+    for index in range(num_shards):
+        results.extend(shards[index]["results"])
+        scanned_files.extend(shards[index]["scanned_files"])
+
+    results.sort(key=lambda r: r["file_path"])
+    scanned_files.sort(key=lambda r: r["file_path"])
+    return results, scanned_files
@@ -7,17 +7,49 @@
 
 import os
 import sys
+import json
 import tempfile
 import shutil
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from pathlib import Path
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import STANDARD_PDFS_DIR, MODEL_DIR, OUTPUT_DIR
+from config import STANDARD_PDFS_DIR, MODEL_DIR, OUTPUT_DIR, MODEL_CONFIG
 from extractor import StandardFeatureExtractor
-from trainer import StandardModelTrainer
+from trainer import StandardModelTrainer, HashedTextModelTrainer
 from predictor import StandardPredictor
+from feature_store import FeatureStore
+from text_cache import TextCache
+from benchmark import write_test_pdf
+from sharding import filter_shard
+from scheduler import plan_tasks, interleave_devices
+from scanner import PDFScanner
+from result_index import ResultIndex
+from dedup import group_results
+from catalog import parse_code, StandardCatalog, superseded_versions
+from evaluate import load_labels, load_label_sets, parse_variant, evaluate, score
+from category_model import CategoryModelTrainer, collect_examples
+from text_model import load_category_model
+from pdf_standard_classifier import CATEGORIES, classify_texts, classify_by_rules, set_category_model
+from utils import get_logger, setup_logging, ProgressReporter
+from prefetch import Prefetcher, read_file
+import throttle
+from throttle import IOThrottle
+from concurrency import ConcurrencyController, iter_windowed, iter_device_windowed, until_deadline
+from priority import DirectoryPriority, prioritize, estimate_coverage, parse_duration
+from text_model import NgramHasher
+from compaction import compact_forest, install_variant
+from output_mode import FilePlacer, OUTPUT_MODES
+from config import ARCHIVE_CONFIG, CATALOG_CONFIG, PARALLEL_CONFIG, PREFETCH_CONFIG
+from archive import member_path, open_member
+from config import COMPACTION_CONFIG
+from config import SCAN_CONFIG
 
 def test_dependencies():
     """测试依赖包"""
@@ -80,6 +112,23 @@ def test_extractor():
                 print("✗ 特征提取失败")
                 return False
         
+        # 大文档模式（逐页惰性解析、逐页释放）与构建完整页面列表的提取结果一致
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = os.path.join(temp_dir, "large.pdf")
+            write_test_pdf(pdf_path, 8)
+            saved = MODEL_CONFIG["large_document_pages"]
+            try:
+                MODEL_CONFIG["large_document_pages"] = 0
+                lazy = extractor.extract_pages_text(pdf_path, 3)
+                MODEL_CONFIG["large_document_pages"] = sys.maxsize
+                eager = extractor.extract_pages_text(pdf_path, 3)
+            finally:
+                MODEL_CONFIG["large_document_pages"] = saved
+            if lazy != eager or len(lazy) != 3:
+                print("✗ 大文档模式的提取结果与完整解析不一致")
+                return False
+            print("✓ 大文档模式逐页提取结果一致")
+        
         return True
         
     except Exception as e:
@@ -115,6 +164,1158 @@ def test_trainer():
         print(f"✗ 模型训练器测试失败: {e}")
         return False
 
+def test_flat_model():
+    """测试扁平化模型：内存映射加载后的预测与 .pkl 模型一致"""
+    print("\n测试扁平化模型...")
+    
+    trainer = StandardModelTrainer()
+    features = trainer.load_features(os.path.join(MODEL_DIR, "standard_features.json"))
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        trainer.train_model(features)
+        trainer.save_model(temp_dir)
+        
+        pickled = StandardModelTrainer()
+        pickled.load_model(temp_dir, mmap=False)
+        mapped = StandardModelTrainer()
+        mapped.load_model(temp_dir, mmap=True)
+        
+        if not isinstance(mapped.model.nodes, np.memmap):
+            print("✗ 扁平化模型没有以内存映射方式加载")
+            return False
+        for feature in features:
+            if pickled.predict(feature) != mapped.predict(feature):
+                print(f"✗ 预测结果不一致: {feature['file_path']}")
+                return False
+        del mapped
+    
+    print(f"✓ {len(features)} 个文件的预测结果与 .pkl 模型一致")
+    return True
+
+def test_text_model():
+    """测试哈希文本模型：流式训练、内存映射加载后批量预测"""
+    print("\n测试哈希文本模型...")
+    
+    standard_text = "中华人民共和国国家标准 范围 规范性引用文件 术语和定义 本标准规定了{}的技术要求"
+    other_text = "关于{}的会议纪要 参会人员 会议时间 议题讨论 下一步工作安排"
+    topics = ["充电桩", "换电站", "储能系统", "配电网", "车载终端", "通信协议", "连接装置", "安全防护"]
+    texts = {}
+    features = []
+    for i in range(80):
+        is_standard = i % 2 == 0
+        name = f"GB-T {1000 + i}-2024 {topics[i % 8]}.pdf" if is_standard else f"{topics[i % 8]}工作纪要{i}.pdf"
+        path = f"/data/{name}"
+        texts[path] = (standard_text if is_standard else other_text).format(topics[i % 8])
+        features.append({"file_path": path, "is_standard": is_standard,
+                         "filename_features": {"filename": name}, "content_features": {}})
+    
+    read_paths = []
+    def text_source(path):
+        read_paths.append(path)
+        return texts.get(path)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        features_path = os.path.join(temp_dir, "features.json")
+        with open(features_path, 'w', encoding='utf-8') as f:
+            json.dump(features, f, ensure_ascii=False)
+        
+        trainer = HashedTextModelTrainer(text_source=text_source)
+        trainer.hasher = NgramHasher(n_features=2 ** 16)
+        info = trainer.train_model(features_path, test_size=0.25)
+        if info["accuracy"] < 0.9:
+            print(f"✗ 留出集准确率过低: {info['accuracy']:.3f}")
+            return False
+        trainer.save_model(temp_dir)
+        
+        loaded = HashedTextModelTrainer()
+        loaded.load_model(temp_dir, mmap=True)
+        if not isinstance(loaded.model.coef, np.memmap) or loaded.hasher.n_features != 2 ** 16:
+            print("✗ 系数没有以内存映射方式加载或哈希参数未恢复")
+            return False
+        
+        batch = [dict(feature, text=texts[feature["file_path"]]) for feature in features]
+        predictions = loaded.predict_batch(batch)
+        if [p[1] for p in predictions] != [loaded.predict(feature)[1] for feature in batch]:
+            print("✗ 批量预测与逐个预测不一致")
+            return False
+        correct = sum(p[0] == int(f["is_standard"]) for p, f in zip(predictions, features))
+        if correct < len(features) * 0.9:
+            print(f"✗ 预测正确 {correct}/{len(features)}")
+            return False
+        del loaded
+    
+    print(f"✓ 留出集准确率 {info['accuracy']:.3f}，全部样本预测正确 {correct}/{len(features)}，"
+          f"共读取正文 {len(read_paths)} 次")
+    return True
+
+def test_compaction():
+    """测试模型压缩：剪枝/蒸馏变体可安装加载，提前结束与完整遍历的判定结论相同"""
+    print("\n测试模型压缩...")
+    
+    trainer = StandardModelTrainer()
+    features = trainer.load_features(os.path.join(MODEL_DIR, "standard_features.json"))
+    saved_config = dict(COMPACTION_CONFIG)
+    COMPACTION_CONFIG.update(transfer_size=500, eval_size=300, latency_repeat=10)
+    
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            trainer.train_model(features)
+            trainer.save_model(temp_dir)
+            teacher = StandardModelTrainer()
+            teacher.load_model(temp_dir, mmap=False)
+            report, variants = compact_forest(teacher, features)
+            
+            X = teacher.scaler.transform(teacher.extract_training_features(features)[0])
+            expected = teacher.model.predict_proba(X)[:, 1]
+            if not np.allclose(variants["full"].predict_proba(X)[:, 1], expected):
+                print("✗ 重新排序后的完整森林预测结果与原模型不一致")
+                return False
+            
+            threshold = report["threshold"]
+            for name, forest in variants.items():
+                full = forest.predict_proba(X)[:, 1] >= threshold
+                early, evaluated = forest.predict_decided(X, threshold)
+                if not ((early >= threshold) == full).all() or evaluated.max() > forest.n_trees:
+                    print(f"✗ {name} 提前结束的判定结论与完整遍历不同")
+                    return False
+            print(f"✓ {len(variants)} 个变体提前结束的判定结论与完整遍历相同")
+            
+            install_variant(temp_dir, "prune-10+early", variants, report, teacher.scaler)
+            installed = StandardModelTrainer()
+            installed.load_model(temp_dir, mmap=True)
+            if installed.model.n_trees != 10 or not installed.model.early_exit \
+                    or installed.model_info["compaction"]["variant"] != "prune-10+early":
+                print("✗ 安装的变体加载后不一致")
+                return False
+            expected = variants["prune-10"].predict_proba(X)[:, 1] >= threshold
+            decided = [p[0] == 1 for p in installed.predict_batch(features)]
+            if decided != expected.tolist():
+                print("✗ 安装的变体预测结论不一致")
+                return False
+            del installed
+    finally:
+        COMPACTION_CONFIG.update(saved_config)
+    
+    print(f"✓ 已安装 prune-10+early，对照表共 {len(report['rows'])} 行")
+    return True
+
+def test_feature_store():
+    """测试列式特征存储"""
+    print("\n测试特征存储...")
+    
+    features_path = os.path.join(MODEL_DIR, "standard_features.json")
+    if not os.path.exists(features_path):
+        print("✗ 特征文件不存在，请先运行特征提取")
+        return False
+    
+    trainer = StandardModelTrainer()
+    features = trainer.load_features(features_path)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store_path = os.path.join(temp_dir, "standard_features.npz")
+        FeatureStore.convert_json(features_path, store_path)
+        loaded = trainer.load_features(store_path)
+        
+        if len(loaded) != len(features):
+            print(f"✗ 特征数量不一致: {len(loaded)} != {len(features)}")
+            return False
+        
+        X_json, y_json = trainer.extract_training_features(features)
+        X_store, y_store = trainer.extract_training_features(loaded)
+        if not (X_json == X_store).all() or not (y_json == y_store).all():
+            print("✗ 特征向量不一致")
+            return False
+        print(f"✓ 特征向量一致，维度: {X_store.shape}")
+        
+        # 段落文本按需加载
+        for original, restored in zip(features, loaded):
+            sections = original["content_features"].get("standard_sections")
+            if sections and list(restored["content_features"]["standard_sections"]) != sections:
+                print(f"✗ 段落文本不一致: {original['file_path']}")
+                return False
+        print("✓ 段落文本一致")
+    
+    return True
+
+def test_text_cache():
+    """测试文本缓存与重新评分"""
+    print("\n测试文本缓存...")
+    
+    pdf_files = [f for f in os.listdir(STANDARD_PDFS_DIR) if f.lower().endswith('.pdf')]
+    if not pdf_files:
+        print("✗ 没有找到标准PDF文件")
+        return False
+    test_file = os.path.join(STANDARD_PDFS_DIR, pdf_files[0])
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TextCache(os.path.join(temp_dir, "text"))
+        extractor = StandardFeatureExtractor(cache)
+        
+        first = extractor.extract_pdf_features(test_file)
+        second = extractor.extract_pdf_features(test_file)
+        if cache.hits != 1 or cache.misses != 1:
+            print(f"✗ 缓存命中统计异常: {cache.stats()}")
+            return False
+        if first != second:
+            print("✗ 缓存前后特征不一致")
+            return False
+        print(f"✓ 缓存命中后特征一致: {pdf_files[0]}")
+        
+        entries = list(cache.iter_entries(extractor.extraction_settings()))
+        if len(entries) != 1:
+            print(f"✗ 缓存条目数量异常: {len(entries)}")
+            return False
+        
+        rebuilt = extractor.build_features_from_pages(test_file, entries[0]["pages"],
+                                                      metadata=entries[0].get("metadata"))
+        if rebuilt != first:
+            print("✗ 从缓存重建的特征不一致")
+            return False
+        print("✓ 从缓存重建特征成功")
+        
+        # 按目录筛选时比较路径组成部分：与目录同名前缀的兄弟目录不算在内
+        pdf_dir = os.path.dirname(os.path.abspath(test_file))
+        settings = extractor.extraction_settings()
+        if len(list(cache.iter_entries(settings, pdf_dir))) != 1 or list(cache.iter_entries(settings, pdf_dir[:-1])):
+            print("✗ 按目录筛选缓存条目不正确")
+            return False
+        
+        # 同一进程的多个线程同时写入同一个键
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: cache.put(test_file, settings, entries[0]["pages"], entries[0]["total_pages"]),
+                          range(32)))
+        leftovers = [name for _, _, names in os.walk(cache.cache_dir) for name in names if name.endswith(".tmp")]
+        if leftovers or len(cache.entry_paths(settings)) != 1:
+            print(f"✗ 多线程写入同一条目出错: {leftovers}")
+            return False
+        print("✓ 按目录筛选和多线程并发写入正确")
+        
+        # 列出条目只读索引，不解压条目；其他提取设置的条目不在其中
+        cache.put(test_file, dict(settings, max_pages=settings.get("max_pages", 0) + 1), ["其他设置"], 1)
+        def no_reads(entry_path):
+            raise AssertionError(f"列出条目时读取了 {entry_path}")
+        cache.read_entry = no_reads
+        try:
+            listed = cache.entry_paths(settings)
+            all_settings = cache.entry_paths()
+        except AssertionError as e:
+            print(f"✗ {e}")
+            return False
+        finally:
+            del cache.read_entry
+        if len(listed) != 1 or len(all_settings) != 1 or cache.read_entry(listed[0])["pages"] != entries[0]["pages"]:
+            print(f"✗ 按索引列出的条目不正确: {listed}, {all_settings}")
+            return False
+        print("✓ 按索引列出条目，不解压条目文件")
+    
+    return True
+
+def test_metadata_tier():
+    """测试元数据快速通道"""
+    print("\n测试元数据快速通道...")
+    
+    extractor = StandardFeatureExtractor(use_metadata=True)
+    empty = {"title": "", "subject": "", "keywords": "", "xmp": "", "outline": []}
+    
+    placeholder = dict(empty, title="标题", subject="科目", keywords="关键字")
+    if extractor.extract_metadata_features(placeholder)["decisive"]:
+        print("✗ 占位元数据不应直接判定")
+        return False
+    
+    metadata = dict(empty, title="GB/T 27930-2023 非车载传导式充电机与电动汽车之间的数字通信协议",
+                    outline=["前言", "1 范围", "2 规范性引用文件", "3 术语和定义"])
+    features = extractor.build_features_from_pages("/tmp/未命名.pdf", [], metadata=metadata)
+    if features.get("decided_by") != "metadata":
+        print("✗ 含标准编号的元数据未能直接判定")
+        return False
+    if features["filename_features"]["standard_type"] != "GB":
+        print("✗ 未从元数据补全标准类型")
+        return False
+    print(f"✓ 元数据直接判定: 标准文档={features['is_standard']}, 置信度={features['confidence']:.3f}")
+    
+    # 书签和关键字中引用的标准编号只作为特征，不直接判定
+    report = dict(empty, title="充电桩测试报告", keywords="GB/T 18487.1-2015",
+                  outline=["1 概述", "2 规范性引用文件 GB/T 27930-2023", "3 测试结果"])
+    features = extractor.build_features_from_pages("/tmp/报告.pdf", ["测试报告正文"], metadata=report)
+    if features.get("decided_by") == "metadata" or not features["metadata_features"]["standard_type"]:
+        print("✗ 书签中引用的标准编号不应直接判定")
+        return False
+    xmp = StandardFeatureExtractor._parse_xmp(
+        '<dc:title><rdf:Alt><rdf:li xml:lang="x-default">NB/T 33001-2018 电动汽车非车载传导式充电机技术条件</rdf:li>'
+        '</rdf:Alt></dc:title><dc:description><rdf:Alt><rdf:li>引用 GB/T 27930</rdf:li></rdf:Alt></dc:description>'
+        .encode('utf-8'), ("dc:title",), keywords=False)
+    if not extractor.extract_metadata_features(dict(empty, xmp_title=xmp))["decisive"]:
+        print("✗ XMP dc:title 中的标准编号未能直接判定")
+        return False
+    print("✓ 只有标题、主题和 dc:title 能直接判定，书签引用交给模型")
+    
+    return True
+
+def _fake_ocr(pdf_path, max_pages):
+    """测试用OCR插件"""
+    return ["GB/T 27930-2023 电动汽车非车载传导式充电机与电池管理系统之间的通信协议 技术要求 标准 规范 范围 术语和定义"] * max_pages
+
+def test_scanned_detection():
+    """测试扫描件检测与OCR插件"""
+    print("\n测试扫描件检测...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scanned_pdf = os.path.join(temp_dir, "scanned.pdf")
+        text_pdf = os.path.join(temp_dir, "text.pdf")
+        write_test_pdf(scanned_pdf, 3, scanned=True)
+        write_test_pdf(text_pdf, 3)
+        
+        extractor = StandardFeatureExtractor(TextCache(os.path.join(temp_dir, "text")), use_metadata=False)
+        
+        features = extractor.extract_pdf_features(scanned_pdf)
+        if not features.get("scanned"):
+            print("✗ 未识别出扫描件")
+            return False
+        if extractor.extract_pdf_features(text_pdf).get("scanned"):
+            print("✗ 文本PDF被误判为扫描件")
+            return False
+        if not extractor.extract_pdf_features(scanned_pdf).get("scanned"):
+            print("✗ 缓存命中后扫描件标记丢失")
+            return False
+        print("✓ 扫描件检测正确")
+        
+        extractor.ocr_engine_spec = "test_system:_fake_ocr"
+        features = extractor.extract_ocr_features(scanned_pdf)
+        if features.get("text_source") != "ocr" or "standard_keywords_count" not in features["content_features"]:
+            print("✗ OCR插件结果未用于特征提取")
+            return False
+        print(f"✓ OCR插件识别成功: 置信度={features['confidence']:.3f}")
+    
+    return True
+
+def test_sharding():
+    """测试分片扫描与合并（本地启动K个进程处理同一目录）"""
+    print("\n测试分片扫描...")
+    
+    num_shards = 3
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = os.path.join(temp_dir, "target")
+        output_dir = os.path.join(temp_dir, "output")
+        pdf_files = []
+        for sub in ("", "a", "a/b", "c"):
+            os.makedirs(os.path.join(root_dir, sub), exist_ok=True)
+            for i in range(3):
+                pdf_path = os.path.join(root_dir, sub, f"GB-T 2793{i}-2023 测试{i}.pdf")
+                write_test_pdf(pdf_path, 2, lines_per_page=5)
+                pdf_files.append(pdf_path)
+        
+        for shard_by in ("hash", "dir"):
+            parts = [filter_shard(pdf_files, root_dir, i, num_shards, shard_by) for i in range(num_shards)]
+            if sorted(sum(parts, [])) != sorted(pdf_files):
+                print(f"✗ 分片划分不完整或有重叠: {shard_by}")
+                return False
+        print("✓ 分片划分覆盖全部文件且互不重叠")
+        
+        if not os.path.exists(os.path.join(MODEL_DIR, "standard_classifier.pkl")):
+            print("⚠ 模型文件不存在，跳过多进程测试")
+            return True
+        
+        main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+        processes = [
+            subprocess.Popen([sys.executable, main_script, "--shard", f"{i}/{num_shards}", "--target", root_dir,
+                              "--output", output_dir, "--no-text-cache"],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for i in range(num_shards)
+        ]
+        if any(process.wait() != 0 for process in processes):
+            print("✗ 分片进程运行失败")
+            return False
+        
+        merge = subprocess.run([sys.executable, main_script, "--merge-shards", "--output", output_dir],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if merge.returncode != 0:
+            print("✗ 合并分片结果失败")
+            return False
+        
+        with open(os.path.join(output_dir, "prediction_results.json"), 'r', encoding='utf-8') as f:
+            merged = json.load(f)
+        if sorted(r["file_path"] for r in merged) != sorted(pdf_files):
+            print("✗ 合并结果与文件列表不一致")
+            return False
+        print(f"✓ {num_shards} 个进程分片处理并合并成功: {len(merged)} 个文件")
+    
+    return True
+
+def test_scheduler():
+    """测试按文件开销调度"""
+    print("\n测试并行调度...")
+    
+    costs = {f"small_{i}.pdf": 100 * 1024 for i in range(40)}
+    costs["large.pdf"] = 400 * 1024 * 1024
+    costs["medium.pdf"] = 8 * 1024 * 1024
+    
+    tasks = plan_tasks(costs)
+    if tasks[0] != ["large.pdf"] or tasks[1] != ["medium.pdf"]:
+        print(f"✗ 大文件没有优先调度: {tasks[:2]}")
+        return False
+    if sorted(sum(tasks, [])) != sorted(costs):
+        print("✗ 调度任务遗漏或重复文件")
+        return False
+    if len(tasks) >= len(costs):
+        print("✗ 小文件没有打包成批次")
+        return False
+    print(f"✓ {len(costs)} 个文件调度为 {len(tasks)} 个任务，大文件优先")
+    
+    # 多个设备分别排队：慢速设备限制为1个在途任务，快速设备不被它拖住
+    running = {"slow": 0, "fast": 0}
+    peak = {"slow": 0, "fast": 0}
+    lock = threading.Lock()
+    
+    def work(item):
+        device, delay = item
+        with lock:
+            running[device] += 1
+            peak[device] = max(peak[device], running[device])
+        time.sleep(delay)
+        with lock:
+            running[device] -= 1
+        return device
+    
+    queues = {"slow": [("slow", 0.05)] * 6, "fast": [("fast", 0.005)] * 40}
+    finished = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for device, _, future in iter_device_windowed(executor, work, queues, lambda: 4, {"slow": 1}):
+            finished.append(future.result())
+    if peak["slow"] != 1 or peak["fast"] != 3 or finished.index("slow") < finished.index("fast"):
+        print(f"✗ 按设备排队的并发不正确: {peak}")
+        return False
+    if finished[-1] != "slow" or finished.count("fast") != 40:
+        print("✗ 快速设备被慢速设备拖住")
+        return False
+    if interleave_devices(["a1", "a2", "a3", "b1"], {"a1": 1, "a2": 1, "a3": 1, "b1": 2}) != ["a1", "b1", "a2", "a3"]:
+        print("✗ 单进程时各设备的文件没有轮流排列")
+        return False
+    print(f"✓ 按设备排队: 慢速设备最多 {peak['slow']} 个在途任务，快速设备使用其余 {peak['fast']} 个进程")
+    
+    return True
+
+def test_dedup():
+    """测试近似重复检测：修订稿与正式版分为一组，代表文件取正式版"""
+    print("\n测试近似重复检测...")
+    
+    extractor = StandardFeatureExtractor(use_metadata=False)
+    body = "".join(f"第{i}条 电动汽车传导充电系统的充电接口应满足第{i + 1}项技术要求。\n" for i in range(60))
+    other = "".join(f"第{i}条 锂离子动力蓄电池单体的热失控试验按附录{i}进行。\n" for i in range(60))
+    documents = {
+        "GB-T 27930-2023 通信协议.pdf": body,
+        "GB-T 27930-2023 通信协议（征求意见稿）.pdf": body.replace("技术要求", "要求", 3),
+        "GB 38031-2020 电池安全要求.pdf": other
+    }
+    
+    results = []
+    for filename, text in documents.items():
+        features = extractor.build_features_from_pages(f"/data/{filename}", [text])
+        if "minhash" not in features:
+            print(f"✗ 没有计算签名: {filename}")
+            return False
+        results.append({"file_path": f"/data/{filename}", "filename": filename, "is_standard": True,
+                        "confidence": 0.9, "features": features})
+    
+    sizes = {r["file_path"]: 1000 for r in results}
+    groups = group_results(results, sizes)
+    if len(groups) != 1 or len(groups[0]["duplicates"]) != 1:
+        print(f"✗ 重复组不正确: {groups}")
+        return False
+    if groups[0]["representative"] != "/data/GB-T 27930-2023 通信协议.pdf" or groups[0]["bytes_saved"] != 1000:
+        print(f"✗ 代表文件或节省字节数不正确: {groups[0]}")
+        return False
+    print(f"✓ 找到 1 组重复，相似度 {groups[0]['duplicates'][0]['similarity']:.2f}，代表文件为正式版")
+    
+    return True
+
+def test_logging():
+    """测试日志：逐文件日志默认关闭，进度汇总限频，JSON日志带结构化字段"""
+    print("\n测试日志...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, "log.jsonl")
+        setup_logging(level="INFO", json_file=json_path, json_level="INFO")
+        try:
+            logger = get_logger("test")
+            logger.debug("逐文件日志", extra={"fields": {"event": "prediction"}})
+            with ProgressReporter(logger, 1000, "测试进度", total_bytes=1000 * 1024, interval=3600) as progress:
+                for _ in range(1000):
+                    progress.update(1, 1024)
+        finally:
+            setup_logging()
+        
+        with open(json_path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+    
+    events = [r.get("event") for r in records]
+    if events != ["progress_done"]:
+        print(f"✗ 日志记录不正确: {events}")
+        return False
+    if records[0]["done"] != 1000 or records[0]["bytes"] != 1000 * 1024:
+        print(f"✗ 进度汇总不正确: {records[0]}")
+        return False
+    print(f"✓ 1000 次更新只输出 {len(records)} 条汇总: {records[0]['message']}")
+    
+    return True
+
+def test_prefetch():
+    """测试预读：按原顺序产出、内容正确，跳过不需要读取的文件，超过单文件上限的文件不读入内存"""
+    print("\n测试预读...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = []
+        for i in range(12):
+            path = os.path.join(temp_dir, f"doc_{i:02d}.pdf")
+            with open(path, 'wb') as f:
+                f.write(bytes([i]) * (1000 * (i + 1)))
+            paths.append(path)
+        
+        skipped = {paths[3], paths[7]}
+        prefetcher = Prefetcher(paths, should_read=lambda p: p not in skipped, depth=4,
+                                max_bytes=20000, max_file_bytes=10000, threads=2)
+        for (path, data, _), expected in zip(prefetcher, paths):
+            if path != expected:
+                print(f"✗ 预读顺序不正确: {path}")
+                return False
+            index = paths.index(path)
+            should_buffer = path not in skipped and 1000 * (index + 1) <= 10000
+            if should_buffer != (data is not None):
+                print(f"✗ 是否读入内存不正确: {os.path.basename(path)}")
+                return False
+            if data is not None and data != bytes([index]) * (1000 * (index + 1)):
+                print(f"✗ 预读内容不正确: {os.path.basename(path)}")
+                return False
+    
+    print(f"✓ {len(paths)} 个文件按顺序预读，跳过 {len(skipped)} 个，大文件只提示系统预读")
+    return True
+
+def test_autotune():
+    """测试自适应并发：吞吐量最高的并发数处停止增加，I/O等待偏高时减少，窗口限制同时在途的任务数"""
+    print("\n测试自适应并发...")
+    
+    class FakeSampler:
+        def __init__(self, cpu, iowait):
+            self.usage = (cpu, iowait)
+        
+        def sample(self):
+            return self.usage
+    
+    # 模拟网络共享：6个并发时吞吐量最高，更多并发反而因争用下降
+    now = [0.0]
+    controller = ConcurrencyController("测试", 1, 1, 16, sampler=FakeSampler(0.3, 0.05), clock=lambda: now[0])
+    for _ in range(40):
+        n = controller.value
+        rate = n if n <= 6 else 6 - (n - 6)
+        now[0] += controller.interval
+        controller.update(int(rate * controller.interval))
+    if controller.value != 6:
+        print(f"✗ 没有收敛到吞吐量最高的并发数: {controller.value} {controller.decisions[-3:]}")
+        return False
+    print(f"✓ 并发数收敛到 {controller.value} (调整 {sum(1 for d in controller.decisions if d['from'] != d['to'])} 次)")
+    
+    controller = ConcurrencyController("测试", 8, 1, 16, sampler=FakeSampler(0.2, 0.6), clock=lambda: now[0])
+    now[0] += controller.interval
+    controller.update(100)
+    if controller.value >= 8 or "I/O等待" not in controller.decisions[-1]["reason"]:
+        print(f"✗ I/O等待偏高时没有减少并发: {controller.decisions}")
+        return False
+    print("✓ I/O等待偏高时减少并发")
+    
+    lock = threading.Lock()
+    running = [0, 0]
+    
+    def work(item):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return item
+    
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        done = sorted(future.result() for _, future in iter_windowed(executor, work, range(30), lambda: 3))
+    if done != list(range(30)) or running[1] > 3:
+        print(f"✗ 窗口提交不正确: 最大并发 {running[1]}")
+        return False
+    print(f"✓ 同时在途的任务不超过窗口 (最大 {running[1]})")
+    
+    return True
+
+def test_scanner():
+    """测试目录扫描：排除规则、输出目录、目录列表缓存和处理顺序"""
+    print("\n测试目录扫描...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = os.path.join(temp_dir, "target")
+        for sub in ("", "a", "a/b", ".git", "node_modules/pkg", "$RECYCLE.BIN", "output", "tmp"):
+            os.makedirs(os.path.join(root_dir, sub), exist_ok=True)
+            with open(os.path.join(root_dir, sub, "doc.PDF"), 'wb') as f:
+                f.write(b"%PDF-1.4\n")
+        
+        # 让目录修改时间早于扫描开始，允许写入目录列表缓存
+        old = os.stat(root_dir).st_mtime - 10
+        for dirpath, _, _ in os.walk(root_dir):
+            os.utime(dirpath, (old, old))
+        
+        cache_path = os.path.join(temp_dir, "dir_listing.json.gz")
+        scanner = PDFScanner(SCAN_CONFIG["exclude_dirs"], exclude_globs=["tmp"], listing_cache_path=cache_path)
+        expected = sorted(os.path.join(root_dir, sub, "doc.PDF") for sub in ("", "a", "a/b"))
+        
+        found = sorted(scanner.scan(root_dir, exclude_paths=[os.path.join(root_dir, "output")]))
+        if found != expected:
+            print(f"✗ 扫描结果不正确: {found}")
+            return False
+        print("✓ 跳过系统目录、排除目录和输出目录")
+        
+        found = sorted(scanner.scan(root_dir, exclude_paths=[os.path.join(root_dir, "output")]))
+        if found != expected or scanner.stats["dirs_listed"] != 0:
+            print(f"✗ 目录列表缓存未生效: {scanner.stats}")
+            return False
+        
+        with open(os.path.join(root_dir, "a", "new.pdf"), 'wb') as f:
+            f.write(b"%PDF-1.4\n")
+        # 修改时间与缓存不同且早于扫描开始：重新列出后写入缓存，之后的扫描可以命中
+        os.utime(os.path.join(root_dir, "a"), (old + 5, old + 5))
+        found = scanner.scan(root_dir, exclude_paths=[os.path.join(root_dir, "output")])
+        if len(found) != 4 or scanner.stats["dirs_listed"] != 1:
+            print(f"✗ 目录变化后没有重新列出: {scanner.stats}")
+            return False
+        print("✓ 目录列表缓存只重新列出有变化的目录")
+        
+        # 按inode排序（缓存命中的目录也带有inode）；extent 顺序在不支持 FIEMAP 时退化为inode顺序
+        scanner.order = "inode"
+        found = scanner.scan(root_dir, exclude_paths=[os.path.join(root_dir, "output")])
+        if found != sorted(found, key=lambda p: os.stat(p).st_ino) or scanner.stats["dirs_listed"] != 0:
+            print(f"✗ 没有按inode排序: {found}")
+            return False
+        scanner.order = "extent"
+        if sorted(scanner.scan(root_dir, exclude_paths=[os.path.join(root_dir, "output")])) != sorted(found):
+            print("✗ 按物理位置排序后文件列表不一致")
+            return False
+        print("✓ 按inode和物理位置排序")
+        
+        scanner.order = "walk"
+        scanner.max_depth = 0
+        if scanner.scan(root_dir) != [os.path.join(root_dir, "doc.PDF")]:
+            print("✗ 最大深度限制未生效")
+            return False
+        print("✓ 最大深度限制生效")
+    
+    return True
+
+def test_archive_scanning():
+    """测试压缩包扫描：成员路径、成员列表缓存、从内存解析、超过上限时解压到临时文件、只解压选中的成员"""
+    print("\n测试压缩包扫描...")
+    
+    import io
+    import zipfile
+    from unittest import mock
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = os.path.join(temp_dir, "target")
+        os.makedirs(root_dir)
+        pdf_path = os.path.join(temp_dir, "GB-T 27930-2023.pdf")
+        write_test_pdf(pdf_path, 2, lines_per_page=5)
+        with open(pdf_path, 'rb') as f:
+            content = f.read()
+        shutil.copy(pdf_path, os.path.join(root_dir, "plain.pdf"))
+        archive_path = os.path.join(root_dir, "标准.zip")
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("GB/GB-T 27930-2023.pdf", content)
+            zf.writestr("说明.txt", "不是PDF")
+            zf.writestr("draft/skip.pdf", content)
+        old = time.time() - 10
+        for path in (archive_path, os.path.join(root_dir, "plain.pdf"), root_dir):
+            os.utime(path, (old, old))
+        
+        member = member_path(archive_path, "GB/GB-T 27930-2023.pdf")
+        cache_path = os.path.join(temp_dir, "dir_listing.json.gz")
+        scanner = PDFScanner(exclude_globs=["*draft/*"], listing_cache_path=cache_path, archive_globs=["*.zip"])
+        found = sorted(scanner.scan(root_dir))
+        if found != sorted([os.path.join(root_dir, "plain.pdf"), member]) or scanner.file_sizes[member] != len(content):
+            print(f"✗ 压缩包成员扫描结果不正确: {found}")
+            return False
+        with mock.patch("scanner.list_zip_members") as list_members:
+            if sorted(scanner.scan(root_dir)) != found or list_members.call_count != 0:
+                print("✗ 压缩包未变化时没有使用缓存的成员列表")
+                return False
+        print(f"✓ 扫描到压缩包成员: {os.path.relpath(member, root_dir)}")
+        
+        extractor = StandardFeatureExtractor(TextCache(os.path.join(temp_dir, "text")), use_metadata=False)
+        features = extractor.extract_pdf_features(member)
+        if features["content_features"].get("error") or not features["content_features"].get("text_length"):
+            print(f"✗ 从压缩包成员提取文本失败: {features['content_features']}")
+            return False
+        extractor.extract_pdf_features(member)
+        if extractor.text_cache.hits != 1:
+            print("✗ 压缩包成员的文本缓存未命中")
+            return False
+        print("✓ 从内存解析压缩包成员，文本缓存命中")
+        
+        limit = ARCHIVE_CONFIG["max_member_memory"]
+        ARCHIVE_CONFIG["max_member_memory"] = 1024
+        try:
+            with open_member(member) as f:
+                if isinstance(f, io.BytesIO) or f.read() != content:
+                    print("✗ 超过内存上限的成员没有解压到临时文件")
+                    return False
+        finally:
+            ARCHIVE_CONFIG["max_member_memory"] = limit
+        print("✓ 超过内存上限的成员解压到临时文件")
+        
+        target = os.path.join(temp_dir, "out.pdf")
+        method, written = FilePlacer("hardlink").place(member, target)
+        with open(target, 'rb') as f:
+            if method != "extract" or written != len(content) or f.read() != content:
+                print(f"✗ 输出压缩包成员不正确: {method}, {written}")
+                return False
+        print("✓ 输出时只解压选中的成员")
+    
+    return True
+
+def _acquire_opens(count):
+    """测试用：在工作进程中打开 count 次（按共享的限速器等待）"""
+    for _ in range(count):
+        throttle.acquire("open")
+    return count
+
+def test_throttle():
+    """测试I/O限速：令牌桶在多个进程之间共享，读取分块限速，用量写入汇总"""
+    print("\n测试I/O限速...")
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    io_throttle = IOThrottle({"open": 50}, burst_seconds=0.1)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=4, initializer=throttle.install, initargs=(io_throttle,)) as executor:
+        opened = sum(executor.map(_acquire_opens, [10] * 4))
+    elapsed = time.perf_counter() - start
+    summary = io_throttle.summary()
+    # 40 次打开，限额 50 次/秒，初始额度 5 次：至少 0.7 秒
+    if elapsed < 0.65 or summary["open"]["total"] != opened:
+        print(f"✗ 多进程共享限额不正确: {elapsed:.2f} 秒, {summary}")
+        return False
+    print(f"✓ 4 个进程合计 {opened} 次打开，限额 50 次/秒，用时 {elapsed:.2f} 秒")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "data.pdf")
+        content = os.urandom(512 * 1024)
+        with open(path, 'wb') as f:
+            f.write(content)
+        read_throttle = IOThrottle({"read": 1024 * 1024}, burst_seconds=0.1)
+        throttle.install(read_throttle)
+        try:
+            start = time.perf_counter()
+            data = read_file(path)
+            elapsed = time.perf_counter() - start
+            line = read_throttle.usage_line()
+        finally:
+            throttle.install(None)
+        if data != content or elapsed < 0.35 or "读取" not in line:
+            print(f"✗ 读取限速不正确: {elapsed:.2f} 秒, {line}")
+            return False
+        print(f"✓ 512 KB 按 1 MB/秒 读取用时 {elapsed:.2f} 秒 ({line})")
+    
+    return True
+
+def test_catalog():
+    """测试已知标准目录：各种写法的编号规范化、按编号查找版本、同一标准只保留最新版本"""
+    print("\n测试已知标准目录...")
+    
+    cases = {
+        "GB-T 18487.2-2017 电动汽车传导充电系统.pdf": "GB/T 18487.2-2017",
+        "GB-T 34657－2017 电动汽车传导充电互操作性测试解决方案.pdf": "GB/T 34657-2017",
+        "DB3401-T 289-2023 电动汽车充电站（桩）服务与管理规范.pdf": "DB3401/T 289-2023",
+        "DB13J_T 269-2018  电动汽车充电站及充电桩建设技术标准.pdf": "DB13J/T 269-2018",
+        "《电动汽车模块化充电仓技术要求》NBT 33027-2016.pdf": "NB/T 33027-2016",
+        "T-GAEPA002-2023 电动汽车超级充电设备与车辆之间的数字通讯协议.pdf": "T/GAEPA 002-2023",
+        "Q-GDW 354-2009 智能电能表功能规范.pdf": "Q/GDW 354-2009",
+        "GB XXXX-XXXX 电动汽车充电桩能效限定值及能效等级 .pdf": "None",
+    }
+    for filename, expected in cases.items():
+        if str(parse_code(filename)) != expected:
+            print(f"✗ 编号规范化不正确: {filename} -> {parse_code(filename)}")
+            return False
+    # 模型输入的文件名特征保持训练时的规则，规范化的编号单独保存在 catalog_code 中
+    extractor = StandardFeatureExtractor(use_metadata=False)
+    filename = "GB-T 18487.2-2017 电动汽车传导充电系统.pdf"
+    features = extractor.build_features_from_pages(f"/data/{filename}", ["正文"])
+    if features["filename_features"] != extractor.extract_filename_features(filename) \
+            or features["filename_features"]["standard_type"] is not None \
+            or features.get("catalog_code") != "GB/T 18487.2-2017":
+        print(f"✗ 文件名特征或规范化编号不正确: {features['filename_features']}, {features.get('catalog_code')}")
+        return False
+    print(f"✓ {len(cases)} 种写法的编号规范化正确")
+    
+    catalog = StandardCatalog.build([STANDARD_PDFS_DIR])
+    entry = catalog.lookup("GBT19596")
+    if entry is None or list(entry["versions"]) != ["2017"] or catalog.lookup("GB/T 99999") is not None:
+        print(f"✗ 按编号查找不正确: {entry}")
+        return False
+    parts = [e["key"] for e in catalog.with_prefix("GB/T 18487")]
+    if parts != ["GB/T 18487.2", "GB/T 18487.4"]:
+        print(f"✗ 按前缀列出不正确: {parts}")
+        return False
+    print(f"✓ 已知标准 {len(catalog)} 个，GBT19596 -> {entry['key']}，GB/T 18487 有 {len(parts)} 个部分")
+    
+    results = [{"file_path": f"/data/{name}.pdf", "is_standard": True, "catalog_code": code}
+               for name, code in [("a", "GB/T 27930-2015"), ("b", "GB/T 27930-2023"), ("c", "GB/T 27930.2-2024"),
+                                  ("d", "GB/T 27930"), ("e", "NB/T 33027-2016")]]
+    versions = superseded_versions(results, {"/data/a.pdf": 1000})
+    if len(versions) != 1 or versions[0]["code"] != "GB/T 27930-2023" \
+            or [s["file_path"] for s in versions[0]["superseded"]] != ["/data/a.pdf"] or versions[0]["bytes_saved"] != 1000:
+        print(f"✗ 旧版本筛选不正确: {versions}")
+        return False
+    print("✓ GB/T 27930-2015 被 2023 版替代，部分号不同和没有年份的文件保留")
+    
+    # 已知标准目录（保存的目录文件、参考目录）中已有更新版本时，本次只找到的旧版本同样跳过
+    with tempfile.TemporaryDirectory() as temp_dir:
+        reference_dir = os.path.join(temp_dir, "标准")
+        source_dir = os.path.join(temp_dir, "源")
+        output_dir = os.path.join(temp_dir, "输出")
+        os.makedirs(reference_dir)
+        os.makedirs(source_dir)
+        Path(reference_dir, "GB-T 27930-2023 通信协议.pdf").write_bytes(b"new")
+        results = []
+        for name, code in [("GB-T 27930-2015 通信协议.pdf", "GB/T 27930-2015"), ("NBT 33027-2016.pdf", "NB/T 33027-2016")]:
+            Path(source_dir, name).write_bytes(b"old")
+            results.append({"file_path": os.path.join(source_dir, name), "filename": name, "is_standard": True,
+                            "confidence": 0.9, "catalog_code": code})
+        
+        saved = dict(CATALOG_CONFIG)
+        CATALOG_CONFIG.update(reference_dirs=[reference_dir], catalog_file=os.path.join(temp_dir, "catalog.json"))
+        try:
+            StandardPredictor(MODEL_DIR).copy_standard_files(results, output_dir, dedup=False, mode="copy",
+                                                             latest_only=True)
+            catalog = StandardCatalog.load(CATALOG_CONFIG["catalog_file"])
+        finally:
+            CATALOG_CONFIG.clear()
+            CATALOG_CONFIG.update(saved)
+        copied = sorted(name for _, _, names in os.walk(output_dir) for name in names if name.endswith(".pdf"))
+        if copied != ["NBT 33027-2016.pdf"]:
+            print(f"✗ 已知的更新版本未用于旧版本筛选: {copied}")
+            return False
+        if sorted(catalog.get("GB/T 27930")["versions"]) != ["2015", "2023"] or catalog.get("NB/T 33027") is None:
+            print("✗ 已知标准目录未保存本次的标准文档")
+            return False
+        print("✓ 参考目录中已有 2023 版时跳过本次的 2015 版，已知标准目录已保存")
+    
+    return True
+
+def test_evaluation():
+    """测试评估：标签文件按文件名查找，精确率/召回率计算，各变体共用文本缓存"""
+    print("\n测试准确率与吞吐量评估...")
+    
+    metrics = score([{"file_path": "a", "is_standard": True}, {"file_path": "b", "is_standard": True},
+                     {"file_path": "c", "is_standard": False}, {"file_path": "d", "scanned": True}],
+                    {"a": "标准", "b": "说明书", "c": "国标", "d": "非标准"})
+    if (metrics["tp"], metrics["fp"], metrics["fn"], metrics["tn"]) != (1, 1, 1, 1) or metrics["precision"] != 0.5:
+        print(f"✗ 指标计算不正确: {metrics}")
+        return False
+    # 只有标准文件时误判数恒为0，不报告精确率
+    only_positive = score([{"file_path": "a", "is_standard": True}, {"file_path": "b", "is_standard": False}],
+                          {"a": "标准", "b": "国标"})
+    if only_positive["precision"] is not None or only_positive["f1"] is not None or only_positive["recall"] != 0.5:
+        print(f"✗ 没有非标准文件时不应报告精确率: {only_positive}")
+        return False
+    if parse_variant("p1:max_pages_to_extract=1,backend=forest") != ("p1", {"max_pages_to_extract": 1,
+                                                                           "backend": "forest"}):
+        print("✗ 变体解析不正确")
+        return False
+    print("✓ 混淆矩阵、精确率和变体解析正确")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = os.path.join(temp_dir, "corpus")
+        os.makedirs(os.path.join(corpus, "sub"))
+        for i in range(4):
+            write_test_pdf(os.path.join(corpus, "sub", f"doc{i}.pdf"), 3)
+        labels_path = os.path.join(temp_dir, "labels.csv")
+        with open(labels_path, 'w', encoding='utf-8') as f:
+            f.write("文件,标签\n" + "".join(f"doc{i}.pdf,{'标准' if i < 2 else '其他'}\n" for i in range(4))
+                    + "missing.pdf,标准\n")
+        labelled, missing = load_labels(labels_path, corpus)
+        if len(labelled) != 4 or missing != ["missing.pdf"]:
+            print(f"✗ 标签文件读取不正确: {labelled}, {missing}")
+            return False
+        # 多个标签文件合并，同一文件以先出现的标签为准
+        other_path = os.path.join(temp_dir, "other.csv")
+        with open(other_path, 'w', encoding='utf-8') as f:
+            f.write("doc0.pdf,说明书\ndoc3.pdf,说明书\n")
+        merged, _ = load_label_sets([(labels_path, corpus), (other_path, corpus)])
+        if len(merged) != 4 or dict(merged)[labelled[0][0]] != dict(labelled)[labelled[0][0]]:
+            print(f"✗ 多个标签文件合并不正确: {merged}")
+            return False
+        
+        text_cache = TextCache(os.path.join(temp_dir, "text_cache"))
+        reports = evaluate([("pages-1", {"max_pages_to_extract": 1}), ("pages-3", {"max_pages_to_extract": 3})],
+                           labelled, text_cache)
+        if any("failed" in report for report in reports):
+            print(f"✗ 变体运行失败: {reports}")
+            return False
+        # 页数多的变体先运行并写入缓存，页数少的变体全部命中
+        if reports[1]["cache_misses"] != 4 or reports[0]["cache_hits"] != 4 or reports[0]["files"] != 4:
+            print(f"✗ 文本缓存没有在变体之间共用: {reports}")
+            return False
+        print(f"✓ 2 个变体共解析 4 个文件: {reports[0]['files_per_second']:.1f} / "
+              f"{reports[1]['files_per_second']:.1f} 文件/秒")
+    
+    return True
+
+def test_category_model():
+    """测试文档类别模型：训练后批量预测，只覆盖部分类别的模型不使用，精确匹配规则仍优先于模型"""
+    print("\n测试文档类别模型...")
+    
+    texts = {"国标": "中华人民共和国国家标准 GB/T 发布 实施 范围 规范性引用文件 术语和定义 {}",
+             "说明书": "使用说明书 安装步骤 注意事项 操作方法 保修 产品外观 {}",
+             "规格书": "Datasheet electrical characteristics absolute maximum ratings package {}"}
+    # 其余类别的样本正文由类别名构成，保证每个类别都有可区分的 n-gram
+    all_texts = dict({category: f"{category}。{category}文档，{category}内容 {{}}" for category in CATEGORIES}, **texts)
+    
+    def make_examples(category_texts):
+        examples = [(f"/data/{category}/{i}.pdf", category) for category in category_texts for i in range(12)]
+        documents = {path: category_texts[category].format(i) for i, (path, category) in enumerate(examples)}
+        return examples, documents
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 按类别分好的目录：子目录名为类别，精确匹配规则中的文件以规则为准
+        os.makedirs(os.path.join(temp_dir, "sorted", "说明书"))
+        for name in ("a.pdf", "永联科技回复.pdf"):
+            Path(temp_dir, "sorted", "说明书", name).touch()
+        os.makedirs(os.path.join(temp_dir, "sorted", "未知类别"))
+        labels_path = os.path.join(temp_dir, "labels.csv")
+        Path(temp_dir, "GB-T 27930-2015.pdf").touch()
+        Path(temp_dir, "手册.pdf").touch()
+        Path(temp_dir, "datasheet.pdf").touch()
+        with open(labels_path, 'w', encoding='utf-8') as f:
+            f.write("文件,标签\nGB-T 27930-2015.pdf,标准\n手册.pdf,标准\ndatasheet.pdf,芯片数据手册\n")
+        collected, skipped = collect_examples([(labels_path, temp_dir)], [os.path.join(temp_dir, "sorted")])
+        collected = {os.path.basename(path): category for path, category in collected}
+        if collected != {"a.pdf": "说明书", "永联科技回复.pdf": "其他", "GB-T 27930-2015.pdf": "国标",
+                         "datasheet.pdf": "芯片数据手册"} or skipped != 1:
+            print(f"✗ 样本收集不正确: {collected}, 跳过 {skipped}")
+            return False
+        print("✓ 标签文件和分类目录的样本收集正确")
+        
+        examples, documents = make_examples(texts)
+        trainer = CategoryModelTrainer(text_source=documents.get)
+        info = trainer.train_model(examples, test_size=0.25)
+        model_dir = os.path.join(temp_dir, "model")
+        trainer.save_model(model_dir)
+        model, saved_info = load_category_model(model_dir)
+        if sorted(model.classes_) != sorted(texts) or saved_info["n_train"] != info["n_train"] \
+                or len(saved_info["missing_categories"]) != len(CATEGORIES) - len(texts):
+            print(f"✗ 模型保存/加载不正确: {model.classes_}")
+            return False
+        
+        batch = [(texts[category].format("x"), f"{category}.pdf") for category in texts]
+        predicted = [category for category, _ in model.predict(batch)]
+        if predicted != list(texts):
+            print(f"✗ 批量预测不正确: {predicted}")
+            return False
+        print(f"✓ 模型批量预测正确，留出集准确率: {info['accuracy']:.2f}")
+        
+        # 只覆盖部分类别的模型总会在已知类别中选一个，不能用于分类
+        document = ("新文件.pdf", all_texts["论文"].format("y"))
+        set_category_model(model)
+        try:
+            partial = classify_texts([document])
+        finally:
+            set_category_model(None)
+        if partial[0] != classify_by_rules(*document):
+            print(f"✗ 只覆盖部分类别的模型不应使用: {partial}")
+            return False
+        print("✓ 只覆盖部分类别的模型不使用，沿用关键词规则")
+        
+        examples, documents = make_examples(all_texts)
+        trainer = CategoryModelTrainer(text_source=documents.get)
+        trainer.train_model(examples, test_size=0.25)
+        margins = trainer.model.predict_margin([(all_texts["论文"].format("z"), "新文件.pdf")])
+        if margins[0][0] != "论文" or not 0.0 <= margins[0][2] <= margins[0][1]:
+            print(f"✗ 概率差计算不正确: {margins}")
+            return False
+        set_category_model(trainer.model)
+        try:
+            results = classify_texts([document, ("永联科技回复.pdf", all_texts["说明书"].format("z"))])
+        finally:
+            set_category_model(None)
+        if results[0][0] != "论文" or results[1][0] != "其他":
+            print(f"✗ 规则覆盖层与模型的组合不正确: {results}")
+            return False
+        print("✓ 精确匹配规则优先，其余文档由覆盖全部类别的模型分类")
+    
+    return True
+
+def test_priority():
+    """测试目录优先级：命中率高的目录和像标准编号的文件名先处理，时间预算到时停止提交并估计覆盖率"""
+    print("\n测试目录优先级...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stats_path = os.path.join(temp_dir, "dir_hit_rates.json")
+        history = DirectoryPriority(stats_path, prior_weight=2.0, default_rate=0.1, filename_boost=0.5)
+        history.update([{"file_path": f"/data/标准/{i}.pdf", "is_standard": i < 9} for i in range(10)]
+                       + [{"file_path": f"/data/照片/{i}.pdf", "is_standard": False} for i in range(20)])
+        history.save()
+        
+        history = DirectoryPriority(stats_path, prior_weight=2.0, default_rate=0.1, filename_boost=0.5)
+        files = ["/data/照片/a.pdf", "/data/其他/b.pdf", "/data/照片/GB 50016-2014.pdf", "/data/标准/新/c.pdf"]
+        scores = history.scores(files, lambda name: name.startswith("GB"))
+        ordered = prioritize(files, scores)
+        # 标准目录的新子目录沿用上级的高命中率；像标准编号的文件名提高估计值
+        if ordered[0] != "/data/标准/新/c.pdf" or ordered.index("/data/照片/GB 50016-2014.pdf") > 1 \
+                or ordered[-1] != "/data/照片/a.pdf":
+            print(f"✗ 排列顺序不正确: {ordered}, {scores}")
+            return False
+        print(f"✓ 按估计命中率排列: {[os.path.basename(path) for path in ordered]}")
+        
+        coverage = estimate_coverage(ordered[:2], scores)
+        if not 0.5 < coverage < 1.0 or estimate_coverage(ordered, scores) != 1.0:
+            print(f"✗ 覆盖率估计不正确: {coverage:.3f}")
+            return False
+        print(f"✓ 处理前 2 个文件估计覆盖 {coverage:.1%} 的标准文档")
+        
+        # 提前结束时目录中的文件可能没处理完，不降低原有记录
+        history.update([{"file_path": "/data/标准/0.pdf", "is_standard": True}], partial=True)
+        if history.dirs[os.path.normcase("/data/标准")] != [10, 9]:
+            print(f"✗ 部分结果覆盖了原有记录: {history.dirs}")
+            return False
+    
+    clock = iter([0.0, 1.0, 2.0, 3.0])
+    taken = list(until_deadline(range(10), 2.5, clock=lambda: next(clock)))
+    if taken != [0, 1, 2]:
+        print(f"✗ 到达时间预算后仍在产出: {taken}")
+        return False
+    if parse_duration("90m") != 5400 or parse_duration("1.5h") != 5400 or parse_duration("30") != 30:
+        print("✗ 时长解析不正确")
+        return False
+    print("✓ 时间预算到时停止提交新任务")
+    
+    return True
+
+def test_time_budget():
+    """测试时间预算：并行时任务逐个提交，单进程时已预读的文件到时不再处理，到时后不再开始新的文件"""
+    print("\n测试时间预算...")
+    
+    pdf_file = sorted(f for f in os.listdir(STANDARD_PDFS_DIR) if f.lower().endswith('.pdf'))[0]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = []
+        for i in range(24):
+            pdf_files.append(os.path.join(temp_dir, f"{i:02d}_{pdf_file}"))
+            shutil.copy2(os.path.join(STANDARD_PDFS_DIR, pdf_file), pdf_files[-1])
+        
+        predictor = StandardPredictor(MODEL_DIR)
+        predictor.load_model()
+        size_aware = PARALLEL_CONFIG["size_aware"]
+        # 每个文件单独作为一个任务（不打包成小文件批次）
+        PARALLEL_CONFIG["size_aware"] = False
+        try:
+            for workers, limit in ((2, 2 * 2), (1, PREFETCH_CONFIG["depth"])):
+                predictor.predict_batch_files(pdf_files, workers=workers, time_budget=0.05)
+                budget = predictor.last_run_metrics["budget"]
+                # 到时前提交的任务（并行时不超过进程数）或已开始的文件处理完即结束，不会处理完全部文件
+                if not budget["stopped_early"] or budget["files_processed"] >= limit:
+                    print(f"✗ {workers} 个进程时时间预算没有生效: 处理了 {budget['files_processed']}/{len(pdf_files)} 个文件")
+                    return False
+                print(f"✓ {workers} 个进程: 0.05 秒预算处理了 {budget['files_processed']}/{len(pdf_files)} 个文件")
+        finally:
+            PARALLEL_CONFIG["size_aware"] = size_aware
+    
+    return True
+
+def _write_index_rows(args):
+    """测试用：在子进程中写入一批索引记录"""
+    db_path, worker = args
+    index = ResultIndex(db_path)
+    for i in range(50):
+        index.upsert([{"file_path": f"/data/{worker}/{i}.pdf", "is_standard": True, "confidence": 0.9,
+                       "standard_type": "GB", "standard_code": f"{27930 + i}-2023", "year": "2023"}])
+    index.close()
+
+def test_result_index():
+    """测试结果索引的并发写入和查询"""
+    print("\n测试结果索引...")
+    
+    import multiprocessing
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "prediction_index.db")
+        with multiprocessing.Pool(4) as pool:
+            pool.map(_write_index_rows, [(db_path, worker) for worker in range(4)])
+        
+        index = ResultIndex(db_path)
+        if index.summary()["total_files"] != 200:
+            print(f"✗ 并发写入后记录数不正确: {index.summary()['total_files']}")
+            return False
+        print("✓ 4 个进程并发写入 200 条记录")
+        
+        rows = index.query(code="27930")
+        if len(rows) != 4 or any(row["standard_code"] != "27930-2023" for row in rows):
+            print(f"✗ 按标准编号查询结果不正确: {len(rows)}")
+            return False
+        if len(index.query(standard_type="GB", year="2023", limit=10)) != 10:
+            print("✗ 按类型和年份查询结果不正确")
+            return False
+        index.close()
+        print("✓ 按标准编号、类型和年份查询正确")
+    
+    return True
+
+def test_output_modes():
+    """测试输出方式：各方式放置的文件内容一致，链接不写入数据，不支持时退回复制，清单和统计写入输出目录"""
+    print("\n测试输出方式...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "GB-T 1-2024.pdf")
+        with open(source, 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+        with open(source, 'rb') as f:
+            content = f.read()
+        
+        predictor = StandardPredictor(MODEL_DIR)
+        results = [{"file_path": source, "filename": os.path.basename(source), "is_standard": True}]
+        for mode in OUTPUT_MODES:
+            output_dir = os.path.join(temp_dir, mode)
+            summary = predictor.copy_standard_files(results, output_dir, dedup=False, mode=mode)
+            target = os.path.join(output_dir, os.path.basename(source))
+            with open(os.path.join(output_dir, "output_manifest.jsonl"), 'r', encoding='utf-8') as f:
+                entry = json.loads(f.readline())
+            if entry["source"] != source or summary["source_bytes"] != len(content):
+                print(f"✗ {mode}: 清单或统计不正确: {entry}, {summary}")
+                return False
+            if mode == "manifest":
+                if os.path.lexists(target) or entry["target"] is not None:
+                    print("✗ manifest: 不应放置文件")
+                    return False
+                continue
+            with open(target, 'rb') as f:
+                if f.read() != content:
+                    print(f"✗ {mode}: 输出文件内容不一致")
+                    return False
+            method = entry["method"]
+            if method in ("hardlink", "symlink", "reflink") and summary["bytes_written"][method] != 0:
+                print(f"✗ {mode}: 链接不应计入写入字节")
+                return False
+            if method == "hardlink" and not os.path.samefile(source, target):
+                print("✗ hardlink: 不是同一个文件")
+                return False
+            if method == "symlink" and not os.path.islink(target):
+                print("✗ symlink: 不是符号链接")
+                return False
+            print(f"✓ {mode}: 实际方法 {method}, 写入 {summary['total_bytes_written']} 字节")
+        
+        # 跨文件系统时硬链接失败，退回复制，同一对设备之后不再尝试
+        import errno
+        from unittest import mock
+        placer = FilePlacer("hardlink")
+        with mock.patch("os.link", side_effect=OSError(errno.EXDEV, "Invalid cross-device link")) as link:
+            methods = [placer.place(source, os.path.join(temp_dir, f"cross_{i}.pdf"))[0] for i in range(3)]
+        if methods != ["copy"] * 3 or link.call_count != 1:
+            print(f"✗ 跨文件系统退回复制不正确: {methods}, os.link 调用 {link.call_count} 次")
+            return False
+        print("✓ 跨文件系统时硬链接退回复制")
+    
+    return True
+
 def test_predictor():
     """测试预测器"""
     print("\n测试预测器...")
@@ -180,6 +1381,12 @@ def test_full_pipeline():
                 print(f"✓ 单文件预测成功: {test_files[0]}")
                 print(f"  标准文档: {is_standard}")
                 print(f"  置信度: {confidence:.3f}")
+                
+                # 运行指标记录实际使用的进程数（"auto" 且只有一个文件时单进程处理）
+                predictor.predict_batch_files(test_pdf_files[:1], workers="auto")
+                if predictor.last_run_metrics["workers"] != 1:
+                    print(f"✗ 运行指标中的进程数不正确: {predictor.last_run_metrics['workers']}")
+                    return False
             
             return True
             
@@ -197,6 +1404,29 @@ def main():
         ("配置文件", test_config),
         ("特征提取器", test_extractor),
         ("模型训练器", test_trainer),
+        ("扁平化模型", test_flat_model),
+        ("哈希文本模型", test_text_model),
+        ("模型压缩", test_compaction),
+        ("特征存储", test_feature_store),
+        ("文本缓存", test_text_cache),
+        ("元数据快速通道", test_metadata_tier),
+        ("扫描件检测", test_scanned_detection),
+        ("分片扫描", test_sharding),
+        ("并行调度", test_scheduler),
+        ("近似重复检测", test_dedup),
+        ("日志", test_logging),
+        ("预读", test_prefetch),
+        ("自适应并发", test_autotune),
+        ("目录扫描", test_scanner),
+        ("压缩包扫描", test_archive_scanning),
+        ("I/O限速", test_throttle),
+        ("目录优先级", test_priority),
+        ("时间预算", test_time_budget),
+        ("已知标准目录", test_catalog),
+        ("准确率评估", test_evaluation),
+        ("文档类别模型", test_category_model),
+        ("结果索引", test_result_index),
+        ("输出方式", test_output_modes),
         ("预测器", test_predictor),
         ("完整流程", test_full_pipeline)
     ]
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import tempfile
+from typing import Dict, List, Any, Optional, Iterator, Callable
+from archive import is_member_path, member_identity
+
+
+def _is_within(path: str, root: str) -> bool:
+    """path 是否为 root 本身或位于 root 之下（按路径组成部分比较，/data/ab 不在 /data/a 之下）"""
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Windows 上位于不同驱动器
+        return False
+
+
+class TextCache:
+    """PDF提取文本的磁盘缓存
+
+    以文件身份（真实路径、大小、修改时间）和提取设置为键，保存逐页文本，
+    修改关键词配置后可直接从缓存重新计算特征，无需再次解析PDF。
+    每种提取设置的条目放在单独的子目录中，子目录下的 index.jsonl 逐行记录 (文件路径, 条目文件, 缓存时间)，
+    重新评分时按索引筛选条目，不必解压所有条目。
+    """
+
+    ENTRY_SUFFIX = ".json.z"
+    INDEX_NAME = "index.jsonl"
+
+    def __init__(self, cache_dir: str, compress_level: int = 6):
+        self.cache_dir = cache_dir
+        self.compress_level = compress_level
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_identity(pdf_path: str) -> Dict[str, Any]:
+        """文件身份：路径、大小和修改时间任一变化都视为新文件（压缩包成员另加成员的CRC）"""
+        if is_member_path(pdf_path):
+            return member_identity(pdf_path)
+        stat = os.stat(pdf_path)
+        return {
+            "path": os.path.realpath(pdf_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+
+    def make_key(self, identity: Dict[str, Any], settings: Dict[str, Any]) -> str:
+        """根据文件身份和提取设置计算缓存键"""
+        raw = json.dumps({"identity": identity, "settings": settings}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def settings_digest(settings: Dict[str, Any]) -> str:
+        """提取设置的摘要，作为该设置的条目子目录名"""
+        raw = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _entry_path(self, key: str, settings: Dict[str, Any]) -> str:
+        return os.path.join(self.cache_dir, self.settings_digest(settings), key[:2], key + self.ENTRY_SUFFIX)
+
+    def read_entry(self, entry_path: str) -> Optional[Dict[str, Any]]:
+        """读取一个缓存条目文件（损坏或已被删除时返回None）"""
+        try:
+            with open(entry_path, 'rb') as f:
+                return json.loads(zlib.decompress(f.read()).decode('utf-8'))
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def get(self, pdf_path: str, settings: Dict[str, Any], min_pages: int = 0,
+            accept: Callable[[Dict[str, Any]], bool] = None,
+            record_stats: bool = True) -> Optional[Dict[str, Any]]:
+        """读取缓存条目；缓存的页数不足 min_pages（且不是全文）时视为未命中，除非 accept(entry) 为真
+
+        record_stats 为 False 时不计入命中统计（用于预读前判断是否需要读取PDF）。
+        """
+        entry = self.peek(pdf_path, settings)
+        if entry is not None:
+            pages = entry.get("pages", [])
+            total_pages = entry.get("total_pages")
+            enough_pages = len(pages) >= min_pages or (total_pages is not None and len(pages) >= total_pages)
+            if not enough_pages and not (accept is not None and accept(entry)):
+                entry = None
+
+        if record_stats:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def peek(self, pdf_path: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取缓存条目但不计入命中统计（用于调度前估算处理开销）"""
+        try:
+            identity = self.file_identity(pdf_path)
+        except OSError:
+            return None
+        return self.read_entry(self._entry_path(self.make_key(identity, settings), settings))
+    
+    def put(self, pdf_path: str, settings: Dict[str, Any], pages: List[str],
+            total_pages: Optional[int], **extra):
+        """写入缓存条目并追加索引行（先写临时文件再原子替换，允许多进程、多线程并发写入同一个键）"""
+        identity = self.file_identity(pdf_path)
+        key = self.make_key(identity, settings)
+        entry = {
+            "file_path": pdf_path,
+            "identity": identity,
+            "settings": settings,
+            "pages": pages,
+            "total_pages": total_pages,
+            "cached_at": time.time()
+        }
+        entry.update(extra)
+
+        entry_path = self._entry_path(key, settings)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        data = zlib.compress(json.dumps(entry, ensure_ascii=False).encode('utf-8'), self.compress_level)
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(entry_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # 每行一次追加写入（O_APPEND），多个进程同时追加时各行不会交错
+        settings_dir = os.path.dirname(os.path.dirname(entry_path))
+        line = json.dumps({"file_path": pdf_path, "entry": os.path.relpath(entry_path, settings_dir),
+                           "cached_at": entry["cached_at"]}, ensure_ascii=False) + "\n"
+        with open(os.path.join(settings_dir, self.INDEX_NAME), 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def entry_paths(self, settings: Optional[Dict[str, Any]] = None,
+                    root_dir: Optional[str] = None) -> List[str]:
+        """符合条件的缓存条目文件（按文件路径排序）；同一文件有多个版本时只取最新的一个
+
+        只读取索引，不解压条目；返回的条目文件可能已被删除，由 read_entry 返回None。
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        if settings is not None:
+            settings_dirs = [os.path.join(self.cache_dir, self.settings_digest(settings))]
+        else:
+            settings_dirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+
+        root = os.path.abspath(root_dir) if root_dir else None
+        # {文件路径: (缓存时间, 条目文件)}
+        latest = {}
+
+        for settings_dir in settings_dirs:
+            try:
+                with open(os.path.join(settings_dir, self.INDEX_NAME), 'r', encoding='utf-8') as f:
+                    lines = list(f)
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 写入中断留下的不完整行
+                    continue
+                file_path = record["file_path"]
+                if root and not _is_within(os.path.abspath(file_path), root):
+                    continue
+
+                previous = latest.get(file_path)
+                if previous is None or record["cached_at"] > previous[0]:
+                    latest[file_path] = (record["cached_at"], os.path.join(settings_dir, record["entry"]))
+
+        return [latest[file_path][1] for file_path in sorted(latest)]
+
+    def iter_entries(self, settings: Optional[Dict[str, Any]] = None,
+                     root_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """逐个读取缓存条目（同 entry_paths 的筛选），每次只在内存中保留一个条目"""
+        for entry_path in self.entry_paths(settings, root_dir):
+            entry = self.read_entry(entry_path)
+            if entry is not None:
+                yield entry
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
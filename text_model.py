@@ -0,0 +1,272 @@
+import os
+import re
+import json
+import zlib
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from config import TEXT_MODEL_CONFIG
+
+# 哈希文本模型文件（位于模型目录中）
+TEXT_MODEL_FILES = {
+    "meta": "text_model.json",
+    "coef": "text_model_coef.npy"
+}
+
+# 文档类别模型文件（pdf_standard_classifier 的多类别模型，位于模型目录中）
+CATEGORY_MODEL_FILES = {
+    "meta": "category_model.json",
+    "coef": "category_model_coef.npy"
+}
+
+# 多项式滚动哈希的基数和混合常数（64位整数运算自然溢出）
+_BASE = np.uint64(0x100000001B3)
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+_SHIFT = np.uint64(33)
+
+# 文件名和正文的 n-gram 加不同的盐，同样的字符串在两处哈希到不同的位置
+_FIELD_SALT = {"text": 0x9E3779B97F4A7C15, "filename": 0xC2B2AE3D27D4EB4F}
+
+
+class NgramHasher:
+    """字符 n-gram 特征哈希：把文本映射为固定维度的稀疏向量，不需要词表，内存与语料规模无关
+
+    去掉空白并转为小写后取各长度的字符 n-gram，用NumPy向量化计算哈希；
+    特征值为 log(1 + 次数)，每个文档做L2归一化。训练和预测使用同一套参数即得到相同的向量。
+    """
+
+    def __init__(self, n_features: int = None, ngram_sizes: Sequence[int] = None, max_chars: int = None):
+        self.n_features = n_features or TEXT_MODEL_CONFIG["n_features"]
+        self.ngram_sizes = tuple(ngram_sizes or TEXT_MODEL_CONFIG["ngram_sizes"])
+        self.max_chars = max_chars or TEXT_MODEL_CONFIG["max_chars"]
+
+    def settings(self) -> Dict[str, Any]:
+        return {"n_features": self.n_features, "ngram_sizes": list(self.ngram_sizes), "max_chars": self.max_chars}
+
+    def _hash_field(self, text: str, salt: int) -> np.ndarray:
+        normalized = re.sub(r'\s+', '', text).lower()[:self.max_chars]
+        codes = np.frombuffer(normalized.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        hashes = []
+        for k in self.ngram_sizes:
+            count = len(codes) - k + 1
+            if count <= 0:
+                continue
+            h = np.full(count, np.uint64(salt + k), dtype=np.uint64)
+            for j in range(k):
+                h = h * _BASE + codes[j:j + count]
+            h ^= h >> _SHIFT
+            h *= _MIX
+            h ^= h >> _SHIFT
+            hashes.append(h % np.uint64(self.n_features))
+        if not hashes:
+            return np.empty(0, dtype=np.uint64)
+        return np.concatenate(hashes)
+
+    def transform_one(self, text: str, filename: str = "") -> Tuple[np.ndarray, np.ndarray]:
+        """单个文档的稀疏向量 (下标 int32, 特征值 float32)"""
+        buckets = np.concatenate([self._hash_field(text or "", _FIELD_SALT["text"]),
+                                  self._hash_field(filename or "", _FIELD_SALT["filename"])])
+        indices, counts = np.unique(buckets, return_counts=True)
+        values = np.log1p(counts.astype(np.float64))
+        norm = np.sqrt(np.dot(values, values))
+        if norm > 0:
+            values /= norm
+        return indices.astype(np.int32), values.astype(np.float32)
+
+    def transform(self, documents: Sequence[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """一批 (正文, 文件名) 的CSR矩阵组成部分 (indptr, indices, data)"""
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        all_indices = []
+        all_values = []
+        for i, (text, filename) in enumerate(documents):
+            indices, values = self.transform_one(text, filename)
+            all_indices.append(indices)
+            all_values.append(values)
+            indptr[i + 1] = indptr[i] + len(indices)
+        indices = np.concatenate(all_indices) if all_indices else np.empty(0, dtype=np.int32)
+        data = np.concatenate(all_values) if all_values else np.empty(0, dtype=np.float32)
+        return indptr, indices, data
+
+
+class HashedLinearModel:
+    """哈希特征上的线性分类器（逻辑回归），批量稀疏预测只需NumPy
+
+    系数向量以只读内存映射方式加载时，同一台机器上的所有预测进程共享同一份物理内存。
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: float, classes: Sequence[int], hasher: NgramHasher):
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.hasher = hasher
+
+    def decision_function(self, documents: Sequence[Tuple[str, str]]) -> np.ndarray:
+        indptr, indices, data = self.hasher.transform(documents)
+        rows = np.repeat(np.arange(len(documents)), np.diff(indptr))
+        weighted = self.coef[indices].astype(np.float64) * data
+        return np.bincount(rows, weights=weighted, minlength=len(documents)) + self.intercept
+
+    def predict_proba(self, documents: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """形状 (文档数, 2)，第二列为 classes_[1] 的概率"""
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(documents)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def save(self, model_dir: str, info: Optional[Dict[str, Any]] = None):
+        """保存系数（.npy，可内存映射）和元数据；元数据最后写入"""
+        os.makedirs(model_dir, exist_ok=True)
+        coef_path = os.path.join(model_dir, TEXT_MODEL_FILES["coef"])
+        temp_path = f"{coef_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.coef, dtype=np.float32))
+        os.replace(temp_path, coef_path)
+
+        meta = {
+            "hasher": self.hasher.settings(),
+            "intercept": self.intercept,
+            "classes": self.classes_.tolist(),
+            "model_info": info or {}
+        }
+        meta_path = os.path.join(model_dir, TEXT_MODEL_FILES["meta"])
+        temp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, meta_path)
+
+
+class HashedMultiClassModel:
+    """哈希特征上的多类别线性分类器（一对其余逻辑回归），一次调用为一批文档的所有类别打分
+
+    系数矩阵形状为 (哈希维度, 类别数)，每个非零特征取出一整行，按文档累加即得到全部类别的得分，
+    只需NumPy；以只读内存映射方式加载时多个进程共享同一份物理内存。
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: Sequence[float], classes: Sequence[str], hasher: NgramHasher):
+        self.coef = coef
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes_ = list(classes)
+        self.hasher = hasher
+
+    def decision_function(self, documents: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """形状 (文档数, 类别数) 的得分"""
+        indptr, indices, data = self.hasher.transform(documents)
+        scores = np.tile(self.intercept, (len(documents), 1))
+        nonempty = np.flatnonzero(np.diff(indptr))
+        if len(nonempty):
+            weighted = self.coef[indices].astype(np.float64) * data[:, None]
+            # 每个文档的非零特征在 indices 中连续存放，按起始位置分段求和
+            scores[nonempty] += np.add.reduceat(weighted, indptr[nonempty], axis=0)
+        return scores
+
+    def predict_proba(self, documents: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """各类别的概率（每个类别的逻辑回归概率按行归一化，与 scikit-learn 的一对其余模型相同）"""
+        probabilities = 1.0 / (1.0 + np.exp(-self.decision_function(documents)))
+        totals = probabilities.sum(axis=1, keepdims=True)
+        return np.divide(probabilities, totals, out=np.full_like(probabilities, 1.0 / len(self.classes_)),
+                         where=totals > 0)
+
+    def predict(self, documents: Sequence[Tuple[str, str]]) -> List[Tuple[str, float]]:
+        """每个文档的 (最可能的类别, 概率)"""
+        if not documents:
+            return []
+        probabilities = self.predict_proba(documents)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes_[j], float(probabilities[i, j])) for i, j in enumerate(best)]
+
+    def predict_margin(self, documents: Sequence[Tuple[str, str]]) -> List[Tuple[str, float, float]]:
+        """每个文档的 (最可能的类别, 概率, 与第二可能的类别的概率差)"""
+        if not documents:
+            return []
+        probabilities = self.predict_proba(documents)
+        top_two = np.sort(probabilities, axis=1)[:, -2:] if len(self.classes_) > 1 else None
+        best = probabilities.argmax(axis=1)
+        return [(self.classes_[j], float(probabilities[i, j]),
+                 float(top_two[i, 1] - top_two[i, 0]) if top_two is not None else 1.0)
+                for i, j in enumerate(best)]
+
+    def save(self, model_dir: str, info: Optional[Dict[str, Any]] = None):
+        """保存系数矩阵（.npy，可内存映射）和元数据；元数据最后写入"""
+        os.makedirs(model_dir, exist_ok=True)
+        coef_path = os.path.join(model_dir, CATEGORY_MODEL_FILES["coef"])
+        temp_path = f"{coef_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.coef, dtype=np.float32))
+        os.replace(temp_path, coef_path)
+
+        meta = {
+            "hasher": self.hasher.settings(),
+            "intercept": self.intercept.tolist(),
+            "classes": self.classes_,
+            "model_info": info or {}
+        }
+        meta_path = os.path.join(model_dir, CATEGORY_MODEL_FILES["meta"])
+        temp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, meta_path)
+
+
+def category_model_exists(model_dir: str) -> bool:
+    """模型目录中是否有完整的文档类别模型"""
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in CATEGORY_MODEL_FILES.values())
+
+
+def load_category_model(model_dir: str, mmap: bool = True) -> Tuple[HashedMultiClassModel, Dict[str, Any]]:
+    """加载文档类别模型，返回 (模型, 训练时记录的模型信息)"""
+    with open(os.path.join(model_dir, CATEGORY_MODEL_FILES["meta"]), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    coef = np.load(os.path.join(model_dir, CATEGORY_MODEL_FILES["coef"]), mmap_mode="r" if mmap else None)
+    hasher = NgramHasher(**meta["hasher"])
+    return HashedMultiClassModel(coef, meta["intercept"], meta["classes"], hasher), meta.get("model_info", {})
+
+
+def text_model_exists(model_dir: str) -> bool:
+    """模型目录中是否有完整的哈希文本模型"""
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in TEXT_MODEL_FILES.values())
+
+
+def load_text_model(model_dir: str, mmap: bool = True) -> Tuple[HashedLinearModel, Dict[str, Any]]:
+    """加载哈希文本模型，返回 (模型, 训练时记录的模型信息)"""
+    with open(os.path.join(model_dir, TEXT_MODEL_FILES["meta"]), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    coef = np.load(os.path.join(model_dir, TEXT_MODEL_FILES["coef"]), mmap_mode="r" if mmap else None)
+    hasher = NgramHasher(**meta["hasher"])
+    return HashedLinearModel(coef, meta["intercept"], meta["classes"], hasher), meta.get("model_info", {})
+
+
+def document_parts(feature: Dict[str, Any]) -> Tuple[str, str]:
+    """模型输入：(正文, 文件名)；正文取特征中保留的文本"""
+    filename = feature.get("filename_features", {}).get("filename") or os.path.basename(feature.get("file_path", ""))
+    return feature.get("text", ""), filename
+
+
+def split_is_holdout(file_path: str, holdout: float) -> bool:
+    """按文件路径哈希确定性地划分留出集（无需把样本全部读入内存再随机划分）"""
+    return zlib.crc32(file_path.encode('utf-8')) % 10000 < holdout * 10000
+
+
+def evaluation_metrics(counts: Dict[str, int]) -> Dict[str, Any]:
+    """由混淆矩阵计数 (tp, fp, tn, fn) 计算准确率、精确率、召回率和F1"""
+    tp, fp, tn, fn = counts["tp"], counts["fp"], counts["tn"], counts["fn"]
+    total = tp + fp + tn + fn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "confusion": dict(counts)
+    }
+
+
+def update_confusion(counts: Dict[str, int], y_true: Sequence[int], y_pred: Sequence[int]):
+    """累加一批预测的混淆矩阵计数"""
+    for actual, predicted in zip(y_true, y_pred):
+        if predicted == 1:
+            counts["tp" if actual == 1 else "fp"] += 1
+        else:
+            counts["fn" if actual == 1 else "tn"] += 1
+
+
+def new_confusion() -> Dict[str, int]:
+    return {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+
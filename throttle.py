@@ -0,0 +1,150 @@
+import time
+import multiprocessing
+from typing import Dict, Any, BinaryIO, Optional
+from config import THROTTLE_CONFIG
+
+# 限速项：read 读取源文件的字节数，open 打开源文件的次数，copy 输出标准文档写入的字节数
+BUCKETS = ("read", "open", "copy")
+_CONFIG_KEYS = {"read": "read_bytes_per_second", "open": "opens_per_second", "copy": "copy_bytes_per_second"}
+_UNITS = {"read": "MB/秒", "open": "次/秒", "copy": "MB/秒"}
+_NAMES = {"read": "读取", "open": "打开", "copy": "复制"}
+
+# 共享数组中每个限速项占的位置：令牌数、上次补充的时刻、累计用量、累计等待秒数
+_FIELDS = 4
+
+# 当前进程使用的限速器（主进程由 install 设置，工作进程在初始化时设置）
+_current = None
+
+
+class IOThrottle:
+    """跨进程共享的令牌桶限速：令牌按每秒限额补充，最多积累 burst_seconds 秒的量
+
+    状态保存在共享内存中，主进程创建后作为进程池初始化参数传给工作进程，所有进程和线程共用同一组令牌桶。
+    令牌不足时先扣成负数再等待相应的时间（一次读取超过桶容量的大块也能正确限速）。
+    """
+
+    def __init__(self, limits: Dict[str, Optional[float]], burst_seconds: float = None):
+        self.limits = {name: limits.get(name) for name in BUCKETS}
+        self.burst_seconds = burst_seconds or THROTTLE_CONFIG["burst_seconds"]
+        self._state = multiprocessing.RawArray('d', len(BUCKETS) * _FIELDS)
+        self._lock = multiprocessing.Lock()
+        now = time.monotonic()
+        for i, name in enumerate(BUCKETS):
+            self._state[i * _FIELDS] = self._capacity(name)
+            self._state[i * _FIELDS + 1] = now
+        self.start = now
+        self._last_report = (now, self._totals())
+
+    @classmethod
+    def from_config(cls) -> Optional["IOThrottle"]:
+        """按 THROTTLE_CONFIG 创建；没有配置任何限额时返回None"""
+        limits = {name: THROTTLE_CONFIG[key] for name, key in _CONFIG_KEYS.items()}
+        if all(limit is None for limit in limits.values()):
+            return None
+        return cls(limits)
+
+    def _capacity(self, name: str) -> float:
+        limit = self.limits[name]
+        return limit * self.burst_seconds if limit else 0.0
+
+    def limited(self, name: str) -> bool:
+        return self.limits[name] is not None
+
+    def acquire(self, name: str, amount: float = 1.0) -> float:
+        """消耗 amount 个令牌，不足时等待；返回等待的秒数（该项未限速时不等待）"""
+        limit = self.limits[name]
+        if limit is None or amount <= 0:
+            return 0.0
+        base = BUCKETS.index(name) * _FIELDS
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self._capacity(name), self._state[base] + (now - self._state[base + 1]) * limit) - amount
+            wait = -tokens / limit if tokens < 0 else 0.0
+            self._state[base] = tokens
+            self._state[base + 1] = now
+            self._state[base + 2] += amount
+            self._state[base + 3] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _totals(self):
+        return [self._state[i * _FIELDS + 2] for i in range(len(BUCKETS))]
+
+    def usage_line(self) -> str:
+        """上次调用以来（所有进程合计）各限速项的用量与限额，用于进度汇总"""
+        now = time.monotonic()
+        totals = self._totals()
+        last_time, last_totals = self._last_report
+        self._last_report = (now, totals)
+        elapsed = max(now - last_time, 1e-9)
+        parts = []
+        for i, name in enumerate(BUCKETS):
+            limit = self.limits[name]
+            if limit is None:
+                continue
+            rate = (totals[i] - last_totals[i]) / elapsed
+            parts.append(f"{_NAMES[name]} {self._format(name, rate)}/{self._format(name, limit)} {_UNITS[name]} "
+                         f"({rate / limit:.0%})")
+        return "限速 " + ", ".join(parts)
+
+    @staticmethod
+    def _format(name: str, value: float) -> str:
+        return f"{value / 1024 / 1024:.2f}" if name != "open" else f"{value:.0f}"
+
+    def summary(self) -> Dict[str, Any]:
+        """各限速项的限额、累计用量、平均速率（对限额的占比）和累计等待时间（写入运行指标）"""
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        summary = {}
+        for i, name in enumerate(BUCKETS):
+            limit = self.limits[name]
+            if limit is None:
+                continue
+            total = self._state[i * _FIELDS + 2]
+            summary[name] = {"limit": limit, "total": total, "rate": total / elapsed,
+                             "utilization": total / elapsed / limit, "wait_seconds": self._state[i * _FIELDS + 3]}
+        return summary
+
+
+def install(throttle: Optional[IOThrottle]):
+    """设置当前进程使用的限速器（None 为不限速）"""
+    global _current
+    _current = throttle
+
+
+def current() -> Optional[IOThrottle]:
+    return _current
+
+
+def acquire(name: str, amount: float = 1.0) -> float:
+    """按当前限速器消耗令牌；未设置限速器时不做任何事"""
+    if _current is None:
+        return 0.0
+    return _current.acquire(name, amount)
+
+
+def limited(name: str) -> bool:
+    return _current is not None and _current.limited(name)
+
+
+def copy_stream(src: BinaryIO, dst: BinaryIO, name: str = "copy") -> int:
+    """分块复制文件内容，每块按 name 项限速，返回复制的字节数"""
+    chunk_bytes = THROTTLE_CONFIG["chunk_bytes"]
+    copied = 0
+    while True:
+        chunk = src.read(chunk_bytes)
+        if not chunk:
+            return copied
+        acquire(name, len(chunk))
+        dst.write(chunk)
+        copied += len(chunk)
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """一行汇总：各限速项的平均速率、占限额的比例和累计等待时间"""
+    parts = []
+    for name, item in summary.items():
+        parts.append(f"{_NAMES[name]} 平均 {IOThrottle._format(name, item['rate'])}/"
+                     f"{IOThrottle._format(name, item['limit'])} {_UNITS[name]} ({item['utilization']:.0%}), "
+                     f"等待 {item['wait_seconds']:.1f} 秒")
+    return "; ".join(parts)
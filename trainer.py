@@ -2,29 +2,40 @@ import os
 import json
 import pickle
 import numpy as np
-from typing import Dict, List, Any, Tuple
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.preprocessing import StandardScaler
-import joblib
+from typing import Dict, List, Any, Tuple, Optional, Callable
+from feature_store import FeatureStore
+from flat_forest import FlatForest, flat_model_exists, load_flat_model
+from text_model import (NgramHasher, HashedLinearModel, TEXT_MODEL_FILES, load_text_model, document_parts,
+                        split_is_holdout, evaluation_metrics, update_confusion, new_confusion)
+from config import MODEL_CONFIG, TEXT_MODEL_CONFIG
+
+# scikit-learn 和 joblib 只在训练和读写 .pkl 模型时导入：预测进程加载扁平化模型时无需导入
+
+# 模型类型：forest 为手工特征上的随机森林，text 为字符 n-gram 哈希特征上增量训练的线性模型
+MODEL_BACKENDS = ("forest", "text")
 
 class StandardModelTrainer:
     """标准文档识别模型训练器"""
     
+    # 预测时不需要特征中保留正文
+    needs_text = False
+    
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.feature_names = []
         self.model_info = {}
     
     def load_features(self, features_path: str) -> List[Dict[str, Any]]:
-        """加载特征数据"""
+        """加载特征数据（.npz 为列式特征存储，其余按JSON加载）"""
         if not os.path.exists(features_path):
             raise FileNotFoundError(f"特征文件不存在: {features_path}")
         
-        with open(features_path, 'r', encoding='utf-8') as f:
-            features = json.load(f)
+        if features_path.endswith(".npz"):
+            features = FeatureStore(features_path).load()
+        else:
+            with open(features_path, 'r', encoding='utf-8') as f:
+                features = json.load(f)
         
         print(f"加载了 {len(features)} 个文件的特征")
         return features
@@ -99,6 +110,12 @@ class StandardModelTrainer:
         
         return vector
     
+    def get_feature_groups(self) -> List[List[int]]:
+        """特征向量中的列分组：标准类型的 one-hot 编码为一组，其余每列单独一组（生成蒸馏样本时整组替换）"""
+        names = self.get_feature_names()
+        one_hot = [i for i, name in enumerate(names) if name.startswith("std_type_")]
+        return [one_hot] + [[i] for i, name in enumerate(names) if i not in one_hot]
+    
     def get_feature_names(self) -> List[str]:
         """获取特征名称列表"""
         feature_names = []
@@ -120,6 +137,11 @@ class StandardModelTrainer:
     
     def train_model(self, features: List[Dict[str, Any]], test_size: float = 0.2) -> Dict[str, Any]:
         """训练模型"""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, accuracy_score
+        from sklearn.preprocessing import StandardScaler
+        
         print("开始训练标准文档识别模型...")
         
         # 提取特征向量
@@ -136,6 +158,7 @@ class StandardModelTrainer:
         self.feature_names = self.get_feature_names()
         
         # 数据标准化
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # 分割训练集和测试集
@@ -185,7 +208,9 @@ class StandardModelTrainer:
         return self.model_info
     
     def save_model(self, model_dir: str):
-        """保存模型"""
+        """保存模型（同时保存可内存映射的扁平化模型，供预测进程共享）"""
+        import joblib
+        
         os.makedirs(model_dir, exist_ok=True)
         
         # 保存模型
@@ -196,6 +221,9 @@ class StandardModelTrainer:
         scaler_path = os.path.join(model_dir, "scaler.pkl")
         joblib.dump(self.scaler, scaler_path)
         
+        # 保存扁平化模型
+        FlatForest.from_sklearn(self.model).save(model_dir, self.scaler)
+        
         # 保存特征名称
         feature_names_path = os.path.join(model_dir, "feature_names.json")
         with open(feature_names_path, 'w', encoding='utf-8') as f:
@@ -212,15 +240,34 @@ class StandardModelTrainer:
         print(f"  - 特征名称: {feature_names_path}")
         print(f"  - 模型信息: {model_info_path}")
     
-    def load_model(self, model_dir: str):
-        """加载模型"""
-        # 加载模型
-        model_path = os.path.join(model_dir, "standard_classifier.pkl")
-        self.model = joblib.load(model_path)
-        
-        # 加载标准化器
-        scaler_path = os.path.join(model_dir, "scaler.pkl")
-        self.scaler = joblib.load(scaler_path)
+    def load_model(self, model_dir: str, mmap: bool = None):
+        """加载模型
+        
+        mmap 为 True（默认取 MODEL_CONFIG["mmap_model"]）时加载扁平化模型并以只读内存映射方式打开，
+        多个预测进程共享同一份内存；只有 .pkl 模型时先转换一次。
+        """
+        if mmap is None:
+            mmap = MODEL_CONFIG["mmap_model"]
+        
+        if mmap and not flat_model_exists(model_dir):
+            self._convert_to_flat(model_dir)
+        
+        if mmap and flat_model_exists(model_dir):
+            flat = load_flat_model(model_dir, mmap=True)
+            self.model = flat["model"]
+            self.scaler = flat["scaler"]
+            compaction = flat["compaction"]
+        else:
+            import joblib
+            
+            compaction = None
+            # 加载模型
+            model_path = os.path.join(model_dir, "standard_classifier.pkl")
+            self.model = joblib.load(model_path)
+            
+            # 加载标准化器
+            scaler_path = os.path.join(model_dir, "scaler.pkl")
+            self.scaler = joblib.load(scaler_path)
         
         # 加载特征名称
         feature_names_path = os.path.join(model_dir, "feature_names.json")
@@ -233,21 +280,216 @@ class StandardModelTrainer:
             self.model_info = json.load(f)
         
         print(f"模型已从 {model_dir} 加载")
+        if compaction:
+            # 扁平化模型是压缩后的变体（.pkl 仍为原模型）
+            self.model_info["compaction"] = compaction
+            print(f"使用压缩模型: {compaction['variant']} ({compaction['trees']} 棵树)")
+    
+    def _convert_to_flat(self, model_dir: str):
+        """由 .pkl 模型生成扁平化模型（模型目录不可写时继续使用 .pkl 模型）"""
+        import joblib
+        
+        model_path = os.path.join(model_dir, "standard_classifier.pkl")
+        if not os.path.exists(model_path):
+            return
+        try:
+            model = joblib.load(model_path)
+            scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+            FlatForest.from_sklearn(model).save(model_dir, scaler)
+            print(f"已生成扁平化模型: {model_dir}")
+        except OSError as e:
+            print(f"生成扁平化模型失败，使用 .pkl 模型: {e}")
     
     def predict(self, feature: Dict[str, Any]) -> Tuple[int, float]:
-        """预测单个文件"""
+        """预测单个文件，返回 (类别, 标准文档的概率)"""
+        return self.predict_batch([feature])[0]
+    
+    def predict_batch(self, features: List[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        """批量预测（整批只遍历一次森林）；模型开启提前结束时逐个样本在结论确定后停止遍历"""
         if self.model is None:
             raise ValueError("模型未加载，请先调用 load_model()")
+        if not features:
+            return []
+        
+        X_scaled = self.scaler.transform(np.array([self._build_feature_vector(f) for f in features]))
+        if getattr(self.model, "early_exit", False):
+            # 提前结束：只保证与 min_confidence 比较的结论和完整遍历相同
+            positive, _ = self.model.predict_decided(X_scaled, MODEL_CONFIG["min_confidence"],
+                                                     MODEL_CONFIG["early_exit_chunk"])
+            return [(int(p >= MODEL_CONFIG["min_confidence"]), float(p)) for p in positive]
+        probabilities = self.model.predict_proba(X_scaled)
+        predictions = self.model.classes_[np.argmax(probabilities, axis=1)]
+        return [(int(p), float(prob[1])) for p, prob in zip(predictions, probabilities)]
+
+
+class HashedTextModelTrainer:
+    """哈希文本模型训练器：正文和文件名的字符 n-gram 哈希到固定维度的稀疏空间，用SGD逻辑回归增量训练
+    
+    训练时按批次从文本缓存（未命中时解析PDF）读取正文，每批哈希后调用 partial_fit，
+    内存占用只取决于批次大小和哈希维度，与语料规模无关。留出集按文件路径哈希划分。
+    """
+    
+    # 预测时需要特征中保留正文（由预测器设置提取器的 keep_text）
+    needs_text = True
+    
+    def __init__(self, text_source: Callable[[str], Optional[str]] = None):
+        self.model = None
+        self.hasher = NgramHasher()
+        self.text_source = text_source
+        self.model_info = {}
+    
+    def _default_text_source(self) -> Callable[[str], Optional[str]]:
+        """按文件路径取前几页正文：优先读取文本缓存，未命中时解析PDF（结果写入缓存）"""
+        from extractor import StandardFeatureExtractor
+        from text_cache import TextCache
+        from config import CACHE_CONFIG
+        
+        text_cache = TextCache(CACHE_CONFIG["text_cache_dir"], CACHE_CONFIG["compress_level"]) \
+            if CACHE_CONFIG["enabled"] else None
+        extractor = StandardFeatureExtractor(text_cache, use_metadata=False)
+        
+        def read_text(file_path: str) -> Optional[str]:
+            if not os.path.exists(file_path) and "\\" in file_path:
+                # 在Windows上提取的特征文件拿到其他系统上训练
+                file_path = file_path.replace("\\", "/")
+            try:
+                return "".join(page + "\n" for page in extractor.extract_pages_text(file_path))
+            except Exception as e:
+                print(f"读取正文失败，跳过 {file_path}: {e}")
+                return None
+        
+        return read_text
+    
+    @staticmethod
+    def load_labelled(features_path: str) -> List[Tuple[str, str, int]]:
+        """读取 (文件路径, 文件名, 标签)；特征存储只读取数值列和字符串列，不加载段落文本"""
+        if not os.path.exists(features_path):
+            raise FileNotFoundError(f"特征文件不存在: {features_path}")
         
-        # 构建特征向量
-        feature_vector = self._build_feature_vector(feature)
-        X = np.array([feature_vector])
+        records = []
+        if features_path.endswith(".npz"):
+            columns = FeatureStore(features_path).load_columns()
+            for path, filename, error, label in zip(columns["file_path"], columns["filename"],
+                                                    columns["error"], columns["is_standard"]):
+                if not error:
+                    records.append((path, filename or os.path.basename(path), int(label)))
+        else:
+            with open(features_path, 'r', encoding='utf-8') as f:
+                features = json.load(f)
+            for feature in features:
+                if "error" not in feature.get("content_features", {}):
+                    records.append((feature["file_path"], document_parts(feature)[1], int(bool(feature["is_standard"]))))
+        return records
+    
+    def _iter_batches(self, records: List[Tuple[str, str, int]], batch_size: int, read_text, unreadable: set):
+        """逐批读取正文并哈希，产出 (CSR矩阵, 标签数组)；读取失败的文件记入 unreadable，之后不再读取"""
+        from scipy.sparse import csr_matrix
+        
+        for start in range(0, len(records), batch_size):
+            documents = []
+            labels = []
+            for path, filename, label in records[start:start + batch_size]:
+                if path in unreadable:
+                    continue
+                text = read_text(path)
+                if text is None:
+                    unreadable.add(path)
+                    continue
+                documents.append((text, filename))
+                labels.append(label)
+            if not documents:
+                continue
+            indptr, indices, data = self.hasher.transform(documents)
+            X = csr_matrix((data, indices, indptr), shape=(len(documents), self.hasher.n_features))
+            yield X, np.array(labels)
+    
+    def train_model(self, features_path: str, test_size: float = 0.2) -> Dict[str, Any]:
+        """流式训练：每轮按随机顺序逐批 partial_fit，训练后在留出集上评估"""
+        from sklearn.linear_model import SGDClassifier
         
-        # 标准化
-        X_scaled = self.scaler.transform(X)
+        print("开始训练哈希文本模型...")
         
-        # 预测
-        prediction = self.model.predict(X_scaled)[0]
-        probability = self.model.predict_proba(X_scaled)[0]
+        records = self.load_labelled(features_path)
+        if not records:
+            raise ValueError("没有有效的训练数据")
         
-        return prediction, probability[1]  # 返回标准文档的概率
+        train = [r for r in records if not split_is_holdout(r[0], test_size)]
+        test = [r for r in records if split_is_holdout(r[0], test_size)]
+        n_positive = sum(r[2] for r in train)
+        print(f"训练样本: {len(train)} (标准文档 {n_positive}), 留出样本: {len(test)}")
+        print(f"哈希维度: {self.hasher.n_features}, n-gram: {list(self.hasher.ngram_sizes)}")
+        
+        # partial_fit 不支持 class_weight='balanced'，按训练集标签计数给出同样的权重
+        class_weight = {label: len(train) / (2 * count)
+                        for label, count in ((0, len(train) - n_positive), (1, n_positive)) if count}
+        model = SGDClassifier(loss="log_loss", alpha=TEXT_MODEL_CONFIG["alpha"], random_state=42,
+                              class_weight=class_weight)
+        
+        read_text = self.text_source or self._default_text_source()
+        batch_size = TEXT_MODEL_CONFIG["batch_size"]
+        rng = np.random.RandomState(42)
+        unreadable = set()
+        trained = 0
+        for epoch in range(TEXT_MODEL_CONFIG["epochs"]):
+            order = [train[i] for i in rng.permutation(len(train))]
+            trained = 0
+            for X, y in self._iter_batches(order, batch_size, read_text, unreadable):
+                model.partial_fit(X, y, classes=np.array([0, 1]))
+                trained += len(y)
+            print(f"  第 {epoch + 1} 轮: {trained} 个样本")
+        
+        if trained == 0:
+            raise ValueError("没有能读取正文的训练样本")
+        
+        self.model = HashedLinearModel(model.coef_[0].astype(np.float32), model.intercept_[0],
+                                       model.classes_, self.hasher)
+        
+        counts = new_confusion()
+        for X, y in self._iter_batches(test, batch_size, read_text, unreadable):
+            update_confusion(counts, y.tolist(), model.predict(X).tolist())
+        metrics = evaluation_metrics(counts)
+        
+        self.model_info = dict(metrics, backend="text", n_samples=len(records), n_train=trained,
+                               n_test=sum(counts.values()), n_unreadable=len(unreadable), test_size=test_size,
+                               epochs=TEXT_MODEL_CONFIG["epochs"], hasher=self.hasher.settings())
+        print(f"模型训练完成，留出集准确率: {metrics['accuracy']:.4f}, "
+              f"精确率: {metrics['precision']:.4f}, 召回率: {metrics['recall']:.4f}")
+        return self.model_info
+    
+    def save_model(self, model_dir: str):
+        """保存系数（可内存映射的 .npy）和元数据"""
+        self.model.save(model_dir, self.model_info)
+        print(f"哈希文本模型已保存到: {model_dir}")
+        for name in TEXT_MODEL_FILES.values():
+            print(f"  - {os.path.join(model_dir, name)}")
+    
+    def load_model(self, model_dir: str, mmap: bool = None):
+        """加载模型（mmap 默认取 MODEL_CONFIG["mmap_model"]，多个预测进程共享系数向量）"""
+        if mmap is None:
+            mmap = MODEL_CONFIG["mmap_model"]
+        self.model, self.model_info = load_text_model(model_dir, mmap=mmap)
+        self.hasher = self.model.hasher
+        print(f"哈希文本模型已从 {model_dir} 加载")
+    
+    def predict(self, feature: Dict[str, Any]) -> Tuple[int, float]:
+        """预测单个文件（特征中需保留正文 text）"""
+        return self.predict_batch([feature])[0]
+    
+    def predict_batch(self, features: List[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        """批量稀疏预测：整批哈希后一次计算"""
+        if self.model is None:
+            raise ValueError("模型未加载，请先调用 load_model()")
+        if not features:
+            return []
+        probabilities = self.model.predict_proba([document_parts(f) for f in features])[:, 1]
+        return [(int(p >= 0.5), float(p)) for p in probabilities]
+
+
+def create_trainer(backend: str = None):
+    """按模型类型创建训练器（默认取 MODEL_CONFIG["backend"]）"""
+    backend = backend or MODEL_CONFIG["backend"]
+    if backend == "forest":
+        return StandardModelTrainer()
+    if backend == "text":
+        return HashedTextModelTrainer()
+    raise ValueError(f"未知的模型类型: {backend}，可选: {', '.join(MODEL_BACKENDS)}")
@@ -0,0 +1,173 @@
+import sys
+import json
+import time
+import logging
+from typing import Callable, Dict, Any, Optional
+from config import LOG_CONFIG
+
+# 各模块日志记录器的公共前缀
+LOGGER_NAMESPACE = "pdf_standard"
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines 格式：每条日志一行，附带 extra={"fields": {...}} 中的结构化字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip()
+        }
+        data.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """写到当前的 sys.stdout（与 print 相同，输出被重定向或捕获时仍然有效）"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def setup_logging(level: str = None, json_file: Optional[str] = None, json_level: str = None):
+    """配置日志：控制台只输出消息文本；指定 json_file 时另写一份 JSON Lines 日志
+
+    未指定的参数取 LOG_CONFIG；重复调用会替换之前的配置（工作进程用父进程的配置重新初始化）。
+    """
+    level = level or LOG_CONFIG["level"]
+    json_file = json_file if json_file is not None else LOG_CONFIG["json_file"]
+    json_level = json_level or LOG_CONFIG["json_level"]
+
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.propagate = False
+
+    console = _StdoutHandler()
+    console.setFormatter(logging.Formatter("%(message)s"))
+    console.setLevel(level)
+    root.addHandler(console)
+    levels = [console.level]
+
+    if json_file:
+        sink = logging.FileHandler(json_file, encoding="utf-8")
+        sink.setFormatter(JsonFormatter())
+        sink.setLevel(json_level)
+        root.addHandler(sink)
+        levels.append(sink.level)
+
+    # 记录器级别取各输出中最低的级别，逐文件的 DEBUG 日志在都不需要时不会被格式化
+    root.setLevel(min(levels))
+
+
+def logging_settings() -> Dict[str, Any]:
+    """当前的日志设置（传给工作进程的 setup_logging）"""
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    settings = {"level": LOG_CONFIG["level"], "json_file": "", "json_level": LOG_CONFIG["json_level"]}
+    for handler in root.handlers:
+        if isinstance(handler, logging.FileHandler):
+            settings["json_file"] = handler.baseFilename
+            settings["json_level"] = logging.getLevelName(handler.level)
+        else:
+            settings["level"] = logging.getLevelName(handler.level)
+    return settings
+
+
+def get_logger(name: str) -> logging.Logger:
+    """模块日志记录器；尚未配置日志时按 LOG_CONFIG 配置"""
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    if not root.handlers:
+        setup_logging()
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+
+def format_duration(seconds: float) -> str:
+    """把秒数格式化为 1时02分03秒 / 2分03秒 / 3.0秒"""
+    if seconds < 60:
+        return f"{seconds:.1f}秒"
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}分{seconds:02d}秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}时{minutes:02d}分{seconds:02d}秒"
+
+
+class ProgressReporter:
+    """限频的进度汇总：最多每 interval 秒输出一行（文件/秒、字节/秒、预计剩余时间），结束时输出总结
+
+    代替逐文件输出和进度条，文件很多时终端输出量与文件数无关。
+    """
+
+    def __init__(self, logger: logging.Logger, total: int, desc: str,
+                 total_bytes: int = 0, interval: float = None, status: Callable[[], str] = None):
+        self.logger = logger
+        self.total = total
+        self.desc = desc
+        self.total_bytes = total_bytes
+        self.interval = LOG_CONFIG["progress_interval"] if interval is None else interval
+        # 附加在每行进度后的状态（如当前的限速用量）
+        self.status = status
+        self.done = 0
+        self.done_bytes = 0
+        self._start = time.perf_counter()
+        self._last_report = self._start
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def update(self, n: int = 1, nbytes: int = 0):
+        self.done += n
+        self.done_bytes += nbytes
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval and self.done < self.total:
+            self._last_report = now
+            self._report(now - self._start)
+
+    def _report(self, elapsed: float):
+        files_per_second = self.done / elapsed if elapsed > 0 else 0.0
+        bytes_per_second = self.done_bytes / elapsed if elapsed > 0 else 0.0
+        if self.total_bytes and self.done_bytes:
+            # 已知文件大小时按字节估算剩余时间，大小悬殊的文件也较准确
+            eta = (self.total_bytes - self.done_bytes) / bytes_per_second
+        else:
+            eta = (self.total - self.done) / files_per_second if files_per_second > 0 else 0.0
+
+        message = (f"{self.desc}: {self.done}/{self.total} ({self.done / max(self.total, 1):.1%}), "
+                   f"{files_per_second:.1f} 文件/秒")
+        if self.done_bytes:
+            message += f", {bytes_per_second / 1024 / 1024:.1f} MB/秒"
+        message += f", 预计剩余 {format_duration(max(0.0, eta))}"
+        if self.status is not None:
+            message += f"; {self.status()}"
+
+        self.logger.info(message, extra={"fields": {
+            "event": "progress", "desc": self.desc, "done": self.done, "total": self.total,
+            "files_per_second": files_per_second, "bytes_per_second": bytes_per_second, "eta_seconds": eta
+        }})
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        elapsed = time.perf_counter() - self._start
+        files_per_second = self.done / elapsed if elapsed > 0 else 0.0
+        message = f"{self.desc}: 完成 {self.done} 个文件, 用时 {format_duration(elapsed)}, {files_per_second:.1f} 文件/秒"
+        if self.done_bytes:
+            message += f", {self.done_bytes / elapsed / 1024 / 1024:.1f} MB/秒"
+        self.logger.info(message, extra={"fields": {
+            "event": "progress_done", "desc": self.desc, "done": self.done, "seconds": elapsed,
+            "files_per_second": files_per_second, "bytes": self.done_bytes
+        }})